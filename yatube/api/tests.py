@@ -0,0 +1,147 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.feed_inbox import backfill_inbox
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание',
+            creator=cls.author
+        )
+        Post.objects.bulk_create(
+            Post(
+                author=cls.author,
+                title=f'Пост {i}',
+                text=f'Текст {i}',
+                group=cls.group if i % 2 else None
+            )
+            for i in range(15)
+        )
+        cls.post = Post.objects.order_by('-created', '-pk').first()
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.reader, text=f'Комментарий {i}')
+            for i in range(25)
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        backfill_inbox(cls.reader.pk, cls.author.pk)
+        # bulk_create не отправляет сигналы, статистику собираем заново
+        AuthorStats.rebuild([cls.author.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def walk(self, client, url, **params):
+        '''Все элементы ленты по ссылкам next'''
+        data = client.get(url, params).json()
+        results = data['results']
+        while data['next']:
+            data = client.get(data['next']).json()
+            results.extend(data['results'])
+        return results
+
+    def test_feeds_walk_all_posts_newest_first(self):
+        """Ленты API обходят все свои посты по курсору."""
+        all_ids = list(
+            Post.objects.order_by('-created', '-pk').values_list('pk', flat=True)
+        )
+        group_ids = list(
+            Post.objects.filter(group=self.group)
+            .order_by('-created', '-pk').values_list('pk', flat=True)
+        )
+        feeds = {
+            reverse('api:index'): all_ids,
+            reverse('api:group', args=[self.group.slug]): group_ids,
+            reverse('api:profile', args=[self.author.username]): all_ids,
+            reverse('api:follow'): all_ids,
+        }
+        for url, expected in feeds.items():
+            with self.subTest(url=url):
+                results = self.walk(self.client, url)
+                self.assertEqual([post['id'] for post in results], expected)
+
+    def test_sparse_fieldsets(self):
+        """?fields= оставляет в ответе только запрошенные поля."""
+        response = self.guest.get(
+            reverse('api:index'), {'fields': 'id,author,likes'}
+        )
+        for post in response.json()['results']:
+            self.assertEqual(set(post), {'id', 'author', 'likes'})
+        self.assertEqual(post['author'], 'author')
+        # Курсор работает и без created в ответе
+        self.assertEqual(
+            len(self.walk(self.guest, reverse('api:index'), fields='title')),
+            15
+        )
+        response = self.guest.get(reverse('api:index'), {'fields': 'secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['detail'])
+
+    def test_list_query_count(self):
+        """Страница ленты - версии ключей и один запрос постов без объектов."""
+        with self.assertNumQueries(2):
+            self.guest.get(reverse('api:index'))
+
+    def test_post_detail_with_comments(self):
+        """Пост отдается с первой страницей комментариев."""
+        data = self.guest.get(
+            reverse('api:post', args=[self.post.pk]), {'fields': 'title'}
+        ).json()
+        self.assertEqual(data['post'], {'title': self.post.title})
+        comments = data['comments']
+        self.assertEqual(len(comments['results']), 20)
+        self.assertEqual(
+            set(comments['results'][0]), {'id', 'text', 'created', 'author'}
+        )
+        rest = self.guest.get(comments['next']).json()
+        self.assertEqual(len(rest['results']), 5)
+        self.assertIsNone(rest['next'])
+
+    def test_profile_and_group_context(self):
+        """Профиль и группа отдаются вместе с постами."""
+        profile = self.guest.get(
+            reverse('api:profile', args=[self.author.username])
+        ).json()['profile']
+        self.assertEqual(profile['posts'], 15)
+        self.assertEqual(profile['followers'], 1)
+        group = self.guest.get(
+            reverse('api:group', args=[self.group.slug])
+        ).json()['group']
+        self.assertEqual(group['description'], 'Описание')
+
+    def test_errors_are_json(self):
+        """Ошибки API возвращаются в JSON с нужным кодом."""
+        cases = {
+            reverse('api:follow'): 401,
+            reverse('api:post', args=[self.post.pk + 100]): 404,
+            reverse('api:group', args=['missing']): 404,
+            reverse('api:profile', args=['missing']): 404,
+        }
+        for url, status in cases.items():
+            with self.subTest(url=url):
+                response = self.guest.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+        response = self.guest.get(reverse('api:index'), {'cursor': 'broken'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_conditional_get(self):
+        """API отвечает 304 на совпадающий If-None-Match."""
+        url = reverse('api:index')
+        response = self.guest.get(url)
+        again = self.guest.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
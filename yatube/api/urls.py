@@ -0,0 +1,21 @@
+from django.urls import path
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('v1/posts/', views.IndexApiView.as_view(), name='index'),
+    path('v1/posts/<int:post_id>/', views.PostApiView.as_view(), name='post'),
+    path(
+        'v1/posts/<int:post_id>/comments/',
+        views.CommentsApiView.as_view(),
+        name='comments'
+    ),
+    path('v1/groups/<slug:slug>/', views.GroupApiView.as_view(), name='group'),
+    path(
+        'v1/profiles/<str:username>/',
+        views.ProfileApiView.as_view(),
+        name='profile'
+    ),
+    path('v1/follow/', views.FollowApiView.as_view(), name='follow'),
+]
@@ -0,0 +1,255 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse, QueryDict
+from django.urls import reverse
+from django.views import View
+
+from core.paginator.cursor_paginator import CursorPaginator, InvalidCursor
+from posts.feed_inbox import FollowFeedPaginator
+from posts.mixins import ConditionalGetMixin
+from posts.models import Comment, Group, Post, User
+from posts.page_cache import post_surrogate_keys
+
+# Публичное имя поля и путь к нему для values()
+POST_FIELDS = {
+    'id': 'pk',
+    'title': 'title',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'likes': 'like_count',
+    'comments': 'comment_count',
+}
+COMMENT_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+# Ключ курсора выбирается всегда, даже если поле не запрошено
+CURSOR_FIELDS = ('created', 'pk')
+
+
+class ApiError(Exception):
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+class ValuesSerializer:
+    '''
+    Отдает строки values() под публичными именами полей.
+    Выбираются только запрошенные через ?fields= поля, строка
+    переименовывается на месте, без создания объектов моделей.
+    '''
+    def __init__(self, available, fields=None):
+        names = [name.strip() for name in (fields or '').split(',')]
+        names = [name for name in names if name]
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise ApiError('Неизвестные поля: ' + ', '.join(unknown))
+        self.lookups = [available[name] for name in names or available]
+        self.renames = [
+            (lookup, name) for name, lookup in available.items()
+            if lookup in self.lookups and lookup != name
+        ]
+        self.extra = [
+            lookup for lookup in CURSOR_FIELDS if lookup not in self.lookups
+        ]
+
+    def rows(self, queryset):
+        return queryset.values(*self.lookups, *self.extra)
+
+    def serialize(self, row):
+        for lookup in self.extra:
+            del row[lookup]
+        for lookup, name in self.renames:
+            row[name] = row.pop(lookup)
+        if 'image' in row:
+            row['image'] = row['image'] and default_storage.url(row['image'])
+        return row
+
+
+class ApiView(ConditionalGetMixin, View):
+    '''Базовое представление API: только чтение, ошибки в JSON'''
+    http_method_names = ['get', 'head', 'options']
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse({'detail': e.detail}, status=e.status)
+        except Http404 as e:
+            return JsonResponse({'detail': str(e) or 'Не найдено'}, status=404)
+
+    def page_url(self, cursor, path=None):
+        '''Ссылка на соседнюю страницу; чужой path получает только курсор'''
+        if cursor is None:
+            return None
+        query = QueryDict(mutable=True) if path else self.request.GET.copy()
+        query['cursor'] = cursor
+        return self.request.build_absolute_uri(
+            (path or self.request.path) + '?' + query.urlencode()
+        )
+
+    def paginate(self, paginator, serializer, cursor=None, path=None):
+        try:
+            page = paginator.page(cursor)
+        except InvalidCursor as e:
+            raise ApiError(str(e))
+        # Курсоры считаются до того, как из строк уберут ключ
+        return {
+            'next': self.page_url(page.next_cursor, path),
+            'previous': self.page_url(page.previous_cursor, path),
+            'results': [serializer.serialize(row) for row in page.object_list],
+        }
+
+
+class PostListApiView(ApiView):
+    '''Лента постов с keyset-пагинацией'''
+    def get_queryset(self):
+        return Post.objects.all()
+
+    def get_paginator(self, queryset):
+        return CursorPaginator(queryset, settings.POSTS_PER_PAGE)
+
+    def get_context(self):
+        return {}
+
+    def get(self, request, *args, **kwargs):
+        data = self.get_context()
+        serializer = ValuesSerializer(POST_FIELDS, request.GET.get('fields'))
+        data.update(self.paginate(
+            self.get_paginator(serializer.rows(self.get_queryset())),
+            serializer,
+            request.GET.get('cursor')
+        ))
+        return JsonResponse(data)
+
+
+class IndexApiView(PostListApiView):
+    '''Все посты'''
+    def get_surrogate_keys(self):
+        return ['index']
+
+
+class GroupApiView(PostListApiView):
+    '''Группа и ее посты'''
+    def get_surrogate_keys(self):
+        return [f'group:{self.kwargs["slug"]}']
+
+    def get_context(self):
+        self.group = Group.objects.filter(slug=self.kwargs['slug']).values(
+            'pk', 'title', 'slug', 'description'
+        ).first()
+        if self.group is None:
+            raise Http404('Группа не найдена')
+        return {'group': {
+            'title': self.group['title'],
+            'slug': self.group['slug'],
+            'description': self.group['description'],
+        }}
+
+    def get_queryset(self):
+        return Post.objects.filter(group_id=self.group['pk'])
+
+
+class ProfileApiView(PostListApiView):
+    '''Автор, его статистика и посты'''
+    def get_surrogate_keys(self):
+        return [f'author:{self.kwargs["username"]}']
+
+    def get_context(self):
+        self.author = User.objects.filter(
+            username=self.kwargs['username']
+        ).values(
+            'pk', 'username', 'first_name', 'last_name',
+            'stats__posts_count', 'stats__followers_count',
+            'stats__following_count', 'stats__likes_received'
+        ).first()
+        if self.author is None:
+            raise Http404('Автор не найден')
+        return {'profile': {
+            'username': self.author['username'],
+            'first_name': self.author['first_name'],
+            'last_name': self.author['last_name'],
+            'posts': self.author['stats__posts_count'] or 0,
+            'followers': self.author['stats__followers_count'] or 0,
+            'following': self.author['stats__following_count'] or 0,
+            'likes': self.author['stats__likes_received'] or 0,
+        }}
+
+    def get_queryset(self):
+        return Post.objects.filter(author_id=self.author['pk'])
+
+
+class FollowApiView(PostListApiView):
+    '''Лента подписок текущего пользователя'''
+    def get_surrogate_keys(self):
+        if not self.request.user.is_authenticated:
+            return None
+        return ['index', f'author:{self.request.user.username}']
+
+    def get_context(self):
+        if not self.request.user.is_authenticated:
+            raise ApiError('Требуется авторизация', status=401)
+        return {}
+
+    def get_paginator(self, queryset):
+        return FollowFeedPaginator(
+            self.request.user, settings.POSTS_PER_PAGE, queryset
+        )
+
+
+class CommentsApiView(ApiView):
+    '''Страница комментариев к посту'''
+    def get_surrogate_keys(self):
+        return [f'post:{self.kwargs["post_id"]}']
+
+    def get(self, request, *args, **kwargs):
+        post_id = self.kwargs['post_id']
+        if not Post.objects.filter(pk=post_id).exists():
+            raise Http404('Пост не найден')
+        serializer = ValuesSerializer(COMMENT_FIELDS, request.GET.get('fields'))
+        return JsonResponse(self.paginate(
+            CursorPaginator(
+                serializer.rows(Comment.objects.filter(post_id=post_id)),
+                settings.COMMENTS_PER_PAGE
+            ),
+            serializer,
+            request.GET.get('cursor')
+        ))
+
+
+class PostApiView(ApiView):
+    '''Пост с первой страницей комментариев'''
+    def get_surrogate_keys(self):
+        if not hasattr(self, '_surrogate_keys'):
+            post_id = self.kwargs['post_id']
+            row = Post.objects.filter(pk=post_id).values_list(
+                'author__username', 'group__slug'
+            ).first()
+            self._surrogate_keys = row and post_surrogate_keys(post_id, *row)
+        return self._surrogate_keys
+
+    def get(self, request, *args, **kwargs):
+        post_id = self.kwargs['post_id']
+        serializer = ValuesSerializer(POST_FIELDS, request.GET.get('fields'))
+        post = serializer.rows(Post.objects.filter(pk=post_id)).first()
+        if post is None:
+            raise Http404('Пост не найден')
+        comments = ValuesSerializer(COMMENT_FIELDS)
+        return JsonResponse({
+            'post': serializer.serialize(post),
+            'comments': self.paginate(
+                CursorPaginator(
+                    comments.rows(Comment.objects.filter(post_id=post_id)),
+                    settings.COMMENTS_PER_PAGE
+                ),
+                comments,
+                path=reverse('api:comments', kwargs={'post_id': post_id})
+            ),
+        })
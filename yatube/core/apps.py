@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import checks  # noqa: F401
+        from .slow_queries import install_slow_query_log
+        from .sqlite import configure_sqlite
+        connection_created.connect(configure_sqlite)
+        connection_created.connect(install_slow_query_log)
@@ -0,0 +1,236 @@
+import gc
+import math
+import time
+from contextlib import ExitStack
+from importlib import import_module
+from statistics import median
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlencode, urlsafe_base64_encode
+
+from core.sql import QueryRecorder
+from posts.models import AuthorStats, Comment, Post
+
+User = get_user_model()
+
+# Приложения, все страницы которых должны быть в наборе замеров
+BENCHMARK_APPS = ('posts', 'users', 'about')
+
+# Страница: имя URL, от чьего имени запрашивается (None - аноним),
+# аргументы URL как имена подготовленных объектов, параметры запроса
+# и ожидаемый код ответа
+PAGES = (
+    ('posts:index', 'reader', {}, {}, 200),
+    ('posts:group_list', 'reader', {'slug': 'group_slug'}, {}, 200),
+    ('posts:profile', 'reader', {'username': 'author_username'}, {}, 200),
+    ('posts:search', 'reader', {}, {'q': 'море'}, 200),
+    ('posts:post_detail', 'reader', {'post_id': 'post_id'}, {}, 200),
+    ('posts:comments', 'reader', {'post_id': 'post_id'}, {}, 200),
+    ('posts:follow_index', 'reader', {}, {}, 200),
+    ('posts:post_create', 'reader', {}, {}, 200),
+    ('posts:group_create', 'reader', {}, {}, 200),
+    ('posts:post_edit', 'owner', {'post_id': 'post_id'}, {}, 200),
+    ('posts:post_delete', 'owner', {'post_id': 'post_id'}, {}, 200),
+    ('posts:delete_comment', 'commenter', {
+        'post_id': 'post_id', 'comment_id': 'comment_id'
+    }, {}, 200),
+    ('posts:group_delete', 'creator', {'slug': 'group_slug'}, {}, 200),
+    ('users:signup', None, {}, {}, 200),
+    ('users:login', None, {}, {}, 200),
+    ('users:password_change', 'reader', {}, {}, 200),
+    ('users:password_change_done', 'reader', {}, {}, 200),
+    ('users:password_reset_form', None, {}, {}, 200),
+    ('users:password_reset_done', None, {}, {}, 200),
+    ('users:password_reset_confirm', None, {
+        'uidb64': 'reader_uidb64', 'token': 'reader_token'
+    }, {}, 302),
+    ('users:password_reset_complete', None, {}, {}, 200),
+    ('about:author', None, {}, {}, 200),
+    ('about:tech', None, {}, {}, 200),
+)
+
+# Страницы без замеров и причина
+SKIPPED = {
+    'posts:add_comment': 'только POST, GET не отдает страницу',
+    'posts:profile_follow': 'GET меняет данные',
+    'posts:profile_unfollow': 'GET меняет данные',
+    'posts:like_unlike_post': 'только POST, меняет данные',
+    'posts:live_counts': 'бесконечный поток событий',
+    'users:logout': 'завершает сессию',
+}
+
+METRICS = ('p50_ms', 'p95_ms', 'queries', 'sql_ms', 'bytes')
+# Метрики времени, изменения которых меньше этого порога считаются шумом
+MIN_DELTA_MS = 5.0
+CLIENT_ADDR = '192.0.2.1'
+
+
+def url_names(apps=BENCHMARK_APPS):
+    '''Имена всех URL приложений с пространством имен'''
+    names = []
+    for app in apps:
+        urls = import_module(f'{app}.urls')
+        names.extend(
+            f'{urls.app_name}:{pattern.name}'
+            for pattern in urls.urlpatterns if pattern.name
+        )
+    return names
+
+
+def percentile(values, percent):
+    '''Перцентиль по ближайшему рангу'''
+    values = sorted(values)
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+def prepare_fixtures():
+    '''
+    Объекты засеянной базы, на которых меряются страницы:
+    самый популярный автор, группа последнего поста, самый обсуждаемый
+    пост и читатель с наибольшим числом подписок
+    '''
+    author = AuthorStats.objects.filter(posts_count__gt=0).order_by(
+        '-followers_count', 'pk'
+    ).values_list('user__username', flat=True).first()
+    reader = User.objects.filter(
+        pk__in=AuthorStats.objects.order_by('-following_count', 'pk')
+        .values('user_id')[:1]
+    ).first()
+    post = Post.objects.order_by('-comment_count', '-pk').first()
+    comment = Comment.objects.filter(post=post).order_by('-pk').first()
+    grouped = Post.objects.exclude(group=None).select_related(
+        'group__creator'
+    ).order_by('-pk').first()
+    group = grouped and grouped.group
+    if not all((author, reader, post, comment, group)):
+        raise ValueError(
+            'База пуста: заполните ее командой seed_yatube'
+        )
+    return {
+        'author_username': author,
+        'group_slug': group.slug,
+        'post_id': post.pk,
+        'comment_id': comment.pk,
+        'reader_uidb64': urlsafe_base64_encode(force_bytes(reader.pk)),
+        'users': {
+            'reader': reader,
+            'owner': post.author,
+            'commenter': comment.author,
+            'creator': group.creator,
+        },
+    }
+
+
+def make_clients(users):
+    '''
+    Клиенты для каждой роли.
+    Адрес не из INTERNAL_IPS, чтобы debug_toolbar не встраивался в страницы.
+    '''
+    clients = {}
+    for role, user in users.items():
+        clients[role] = Client(REMOTE_ADDR=CLIENT_ADDR)
+        clients[role].force_login(user)
+    return clients
+
+
+def page_url(name, kwargs, query, fixtures):
+    '''Адрес страницы из PAGES с аргументами из подготовленных объектов'''
+    url = reverse(name, kwargs={
+        arg: fixtures[fixture] for arg, fixture in kwargs.items()
+    })
+    if query:
+        url = f'{url}?{urlencode(query)}'
+    return url
+
+
+def measure(client, url, iterations, warmup=1):
+    '''Время ответа, число и время запросов и размер страницы'''
+    for _ in range(warmup):
+        client.get(url)
+    # Мусор предыдущих страниц не должен собираться во время замеров
+    gc.collect()
+    timings = []
+    sql_timings = []
+    queries = 0
+    for _ in range(iterations):
+        recorder = QueryRecorder()
+        # Запросы к репликам и другим базам тоже входят в замер
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - start)
+        sql_timings.append(recorder.time)
+        queries = max(queries, recorder.count)
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 95) * 1000, 2),
+        'queries': queries,
+        'sql_ms': round(median(sql_timings) * 1000, 2),
+        'bytes': len(response.content),
+    }
+
+
+def run_benchmark(iterations, warmup=1, only=None):
+    '''Замеры всех страниц PAGES; only ограничивает набор именами URL'''
+    fixtures = prepare_fixtures()
+    clients = make_clients(fixtures['users'])
+    # Токен зависит от времени входа, поэтому выдается после force_login
+    fixtures['reader_token'] = default_token_generator.make_token(
+        User.objects.get(pk=fixtures['users']['reader'].pk)
+    )
+    results = {}
+    for name, role, kwargs, query, expected in PAGES:
+        if only and name not in only:
+            continue
+        url = page_url(name, kwargs, query, fixtures)
+        # Аноним на каждой странице свой: сессия одной страницы
+        # не должна добавлять запросы другой
+        client = clients[role] if role else Client(REMOTE_ADDR=CLIENT_ADDR)
+        result = measure(client, url, iterations, warmup)
+        result['url'] = url
+        result['expected_status'] = expected
+        results[name] = result
+    return results
+
+
+def compare(results, baseline, threshold, min_delta_ms=MIN_DELTA_MS):
+    '''
+    Регрессии относительно эталона.
+    Время и размер страницы сравниваются с допуском threshold (доля),
+    число запросов - строго: любой лишний запрос это регрессия.
+    '''
+    regressions = []
+    for name, result in results.items():
+        if result['status'] != result['expected_status']:
+            regressions.append(
+                f'{name}: код ответа {result["status"]}, '
+                f'ожидался {result["expected_status"]}'
+            )
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric in METRICS:
+            old, new = reference.get(metric), result[metric]
+            if old is None:
+                continue
+            if metric == 'queries':
+                regressed = new > old
+            elif metric.endswith('_ms'):
+                regressed = (
+                    new > old * (1 + threshold)
+                    and new - old >= min_delta_ms
+                )
+            else:
+                regressed = new > old * (1 + threshold)
+            if regressed:
+                change = f' ({(new - old) / old:+.0%})' if old else ''
+                regressions.append(f'{name}: {metric} {old} -> {new}{change}')
+    return regressions
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Кэши, которые видит только свой процесс
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    '''
+    Сброс кэшированных страниц и фрагментов ленты удаляет ключи только
+    в кэше своего процесса: при нескольких рабочих процессах остальные
+    отдавали бы устаревшие страницы до конца срока их жизни
+    '''
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.WEB_WORKERS > 1 and backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f'Кэш {backend} не общий для {settings.WEB_WORKERS} '
+            f'рабочих процессов.',
+            hint=(
+                'Подключите общий кэш (memcached, redis) в CACHES '
+                'или запускайте один рабочий процесс.'
+            ),
+            id='core.E001',
+        )]
+    return []
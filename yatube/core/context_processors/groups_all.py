@@ -1,11 +1,39 @@
-import datetime
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils.functional import SimpleLazyObject
 
+from core.db_router import reads_from_replica
 from posts.models import Group
 
+GROUPS_DIRECTORY_KEY = 'core:groups_directory'
+
+
+def get_groups_directory():
+    """Самые активные группы с числом постов, кэшируется целиком."""
+    directory = cache.get(GROUPS_DIRECTORY_KEY)
+    if directory is None:
+        directory = list(
+            Group.objects.annotate(posts_count=Count('posts'))
+            .order_by('-posts_count', 'title')
+            .values('title', 'slug', 'posts_count')
+            [:settings.GROUPS_DIRECTORY_SIZE]
+        )
+        # Справочник из отстающей реплики не кэшируется
+        if not reads_from_replica():
+            cache.set(
+                GROUPS_DIRECTORY_KEY, directory,
+                settings.GROUPS_DIRECTORY_TIMEOUT
+            )
+    return directory
+
+
+def invalidate_groups_directory():
+    cache.delete(GROUPS_DIRECTORY_KEY)
+
 
 def groups_all(request):
-    """Добавляет переменную с текущим годом."""
+    """Добавляет ленивый справочник групп: запрос только при обращении."""
     return {
-        'groups_all': Group.objects.all()
+        'groups_all': SimpleLazyObject(get_groups_directory)
     }
-
@@ -0,0 +1,127 @@
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Приложения, чтение моделей которых можно отдать реплике. Сессии
+# и пользователи запроса всегда читаются из основной базы: реплика
+# могла еще не получить только что созданную сессию
+REPLICA_APPS = ('posts',)
+SAFE_METHODS = ('GET', 'HEAD')
+
+_local = threading.local()
+
+
+class PrimaryReplicaRouter:
+    '''
+    Чтение моделей REPLICA_APPS из представлений с replica_reads = True
+    уходит в случайную реплику из DATABASE_REPLICAS. Запись, в том числе
+    объектов, прочитанных из реплики, идет в основную базу; после первой
+    записи моделей REPLICA_APPS запрос до конца читает из основной базы.
+    Записи других приложений (сессии, хранилище миниатюр) не влияют
+    на чтение из реплики. В остальных случаях решение остается за Django:
+    база объекта-подсказки или default.
+    '''
+    def db_for_read(self, model, **hints):
+        if (getattr(_local, 'replica', None)
+                and model._meta.app_label in REPLICA_APPS):
+            return _local.replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in REPLICA_APPS:
+            _local.replica = None
+            _local.wrote = True
+        instance = hints.get('instance')
+        if (instance is not None
+                and instance._state.db in settings.DATABASE_REPLICAS):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики - копии основной базы, схему получают вместе с данными
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def reads_from_replica():
+    '''
+    Чтение текущего запроса идет в реплику. Реплика может отставать
+    от уже сброшенных кэшей: ее данные не кэшируются и не получают
+    валидаторов, иначе устаревшая страница переживет сброс.
+    '''
+    return bool(getattr(_local, 'replica', None))
+
+
+def read_from_primary():
+    '''Отправляет оставшееся чтение текущего запроса в основную базу'''
+    _local.replica = None
+
+
+def pinned_to_primary(request):
+    '''Пользователь недавно писал и должен видеть свои изменения'''
+    try:
+        until = float(request.COOKIES.get(settings.REPLICA_PIN_COOKIE, 0))
+    except ValueError:
+        return False
+    return until > time.time()
+
+
+class ReplicaRoutingMiddleware:
+    '''
+    Включает чтение из реплики для GET и HEAD к представлениям
+    с replica_reads = True. Если запрос записал модели REPLICA_APPS,
+    ответ ставит cookie REPLICA_PIN_COOKIE: следующие REPLICA_PIN_SECONDS
+    секунд этот пользователь читает из основной базы и видит свои изменения,
+    даже если реплика отстает.
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.replica, _local.wrote = None, False
+        try:
+            response = self.get_response(request)
+            if _local.wrote:
+                pin = settings.REPLICA_PIN_SECONDS
+                response.set_cookie(
+                    settings.REPLICA_PIN_COOKIE, str(time.time() + pin),
+                    max_age=pin, httponly=True, samesite='Lax'
+                )
+            return response
+        finally:
+            _local.replica, _local.wrote = None, False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if (settings.DATABASE_REPLICAS
+                and request.method in SAFE_METHODS
+                and getattr(view_class, 'replica_reads', False)
+                and not pinned_to_primary(request)):
+            _local.replica = random.choice(settings.DATABASE_REPLICAS)
+
+
+def sync_replica(alias, source=DEFAULT_DB_ALIAS):
+    '''
+    Копирует основную базу SQLite в файл реплики через backup API.
+    Заменяет репликацию при локальной проверке: до следующей
+    синхронизации реплика отстает от основной базы.
+    '''
+    connections[alias].close()
+    connection = connections[source]
+    connection.ensure_connection()
+    target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
@@ -0,0 +1,131 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import PAGES, compare, run_benchmark
+from posts.models import Comment, FeedEntry, Follow, Group, Post, User
+
+
+def dataset_size():
+    '''Объем данных, на котором сняты замеры'''
+    return {
+        'users': User.objects.count(),
+        'groups': Group.objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+        'likes': Post.liked.through.objects.count(),
+        # Без seed_yatube --with-feed лента подписок пуста
+        'feed_entries': FeedEntry.objects.count(),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет страницы posts, users и about на заполненной базе '
+        '(manage.py seed_yatube): p50/p95 времени ответа, число и время '
+        'SQL-запросов, размер ответа. Сравнивает с эталоном в JSON и '
+        'завершается ошибкой при регрессии.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=20,
+            help='Количество замеряемых запросов каждой страницы'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=2,
+            help='Количество запросов для прогрева перед замерами'
+        )
+        parser.add_argument(
+            '--baseline', default=settings.BENCHMARK_BASELINE,
+            help='Файл эталонных замеров'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=settings.BENCHMARK_THRESHOLD,
+            help='Допустимый прирост времени и размера, доля (0.2 = 20%%)'
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Записать результаты как новый эталон'
+        )
+        parser.add_argument(
+            '--only', nargs='+', metavar='URL_NAME',
+            choices=[page[0] for page in PAGES],
+            help='Замерить только эти страницы'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            results = run_benchmark(
+                options['iterations'], options['warmup'], options['only']
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        baseline = self.load_baseline(options['baseline'])
+        dataset = dataset_size()
+        self.report(results, baseline.get('pages', {}))
+        if options['update_baseline']:
+            self.save_baseline(options, baseline, results, dataset)
+            return
+        if baseline.get('dataset', dataset) != dataset:
+            self.stdout.write(self.style.WARNING(
+                'Эталон снят на другом объеме данных: '
+                f'{baseline["dataset"]}, сейчас {dataset}'
+            ))
+        regressions = compare(
+            results, baseline.get('pages', {}), options['threshold']
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессии производительности:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def load_baseline(self, path):
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_baseline(self, options, baseline, results, dataset):
+        pages = baseline.get('pages', {}) if options['only'] else {}
+        pages.update({
+            name: {
+                key: value for key, value in result.items()
+                if key not in ('status', 'expected_status')
+            }
+            for name, result in results.items()
+        })
+        os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+        with open(options['baseline'], 'w', encoding='utf-8') as f:
+            json.dump(
+                {
+                    'dataset': dataset,
+                    'iterations': options['iterations'],
+                    'pages': pages,
+                },
+                f, ensure_ascii=False, indent=2, sort_keys=True
+            )
+            f.write('\n')
+        self.stdout.write(self.style.SUCCESS(
+            f'Эталон записан в {options["baseline"]}'
+        ))
+
+    def report(self, results, baseline):
+        self.stdout.write(
+            f'{"страница":<32}{"код":>5}{"p50 мс":>10}{"p95 мс":>10}'
+            f'{"запросы":>9}{"SQL мс":>9}{"байты":>9}'
+        )
+        for name, result in results.items():
+            reference = baseline.get(name, {})
+            queries = str(result['queries'])
+            if reference.get('queries') not in (None, result['queries']):
+                queries += f' ({reference["queries"]})'
+            self.stdout.write(
+                f'{name:<32}{result["status"]:>5}{result["p50_ms"]:>10}'
+                f'{result["p95_ms"]:>10}{queries:>9}{result["sql_ms"]:>9}'
+                f'{result["bytes"]:>9}'
+            )
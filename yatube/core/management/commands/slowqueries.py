@@ -0,0 +1,104 @@
+import json
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import percentile
+from core.slow_queries import log_files
+
+SORT_KEYS = {
+    'total': lambda stats: stats['total'],
+    'count': lambda stats: stats['count'],
+    'p95': lambda stats: stats['p95'],
+}
+
+
+def aggregate(lines, view=None, slow_only=False):
+    '''Сводка записей журнала по отпечаткам запросов'''
+    groups = defaultdict(
+        lambda: {'timings': [], 'views': Counter(), 'max': -1}
+    )
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if view and record.get('view') != view:
+            continue
+        if slow_only and not record.get('slow'):
+            continue
+        group = groups[record['fingerprint']]
+        # Пример - параметры самого долгого выполнения
+        if record['ms'] > group['max']:
+            group['max'] = record['ms']
+            group['example'] = record.get('params')
+        group['timings'].append(record['ms'])
+        group['views'][record.get('view') or record.get('path') or '-'] += 1
+    summary = []
+    for fingerprint, group in groups.items():
+        timings = group['timings']
+        summary.append({
+            'fingerprint': fingerprint,
+            'count': len(timings),
+            'total': sum(timings),
+            'p95': percentile(timings, 95),
+            'max': group['max'],
+            'views': group['views'],
+            'example': group['example'],
+        })
+    return summary
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка журнала медленных запросов по отпечаткам: количество, '
+        'суммарное время, p95 и пример параметров'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', default=None,
+            help='Файл журнала (по умолчанию SLOW_QUERY_LOG_FILE)'
+        )
+        parser.add_argument(
+            '--top', type=int, default=20,
+            help='Сколько отпечатков показать'
+        )
+        parser.add_argument(
+            '--sort', choices=sorted(SORT_KEYS), default='total',
+            help='Порядок: суммарное время, количество или p95'
+        )
+        parser.add_argument(
+            '--view', default=None,
+            help='Только запросы этого представления, например posts:index'
+        )
+        parser.add_argument(
+            '--slow-only', action='store_true',
+            help='Только запросы дольше порога, без случайной выборки'
+        )
+
+    def handle(self, *args, **options):
+        files = log_files(options['file'])
+        if not files:
+            raise CommandError('Журнал медленных запросов пуст')
+        summary = aggregate(
+            self.read_lines(files), options['view'], options['slow_only']
+        )
+        summary.sort(key=SORT_KEYS[options['sort']], reverse=True)
+        for stats in summary[:options['top']]:
+            views = ', '.join(
+                f'{name} ({count})'
+                for name, count in stats['views'].most_common(3)
+            )
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{stats["count"]} раз, всего {stats["total"]:.1f} мс, '
+                f'p95 {stats["p95"]:.1f} мс, максимум {stats["max"]:.1f} мс'
+            ))
+            self.stdout.write(f'  {stats["fingerprint"]}')
+            self.stdout.write(f'  представления: {views}')
+            self.stdout.write(f'  пример параметров: {stats["example"]}')
+
+    def read_lines(self, files):
+        for name in files:
+            with open(name, encoding='utf-8') as f:
+                yield from f
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+
+from core.stress import MODES, run_stress
+
+
+class Command(BaseCommand):
+    help = (
+        'Смешанная нагрузка на SQLite: потоки читают страницы, ставят '
+        'лайки и пишут комментарии. Сравнивает пропускную способность '
+        'и ошибки "database is locked" в журнале отката и в режиме проекта '
+        '(WAL и прагмы SQLITE_*). Нагрузка идет на временную копию '
+        'основной базы, рабочая база не меняется.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seconds', type=float, default=5,
+            help='Длительность прогона в каждом режиме'
+        )
+        parser.add_argument(
+            '--readers', type=int, default=8,
+            help='Количество читающих потоков'
+        )
+        parser.add_argument(
+            '--writers', type=int, default=4,
+            help='Количество пишущих потоков'
+        )
+        parser.add_argument(
+            '--mode', nargs='+', choices=list(MODES), default=list(MODES),
+            help='Режимы соединений: rollback - как до WAL, wal - настройки'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"режим":<10}{"потоки":<8}{"операции":>10}{"в секунду":>11}'
+            f'{"p95 мс":>10}{"ошибки":>8}'
+        )
+        results = {}
+        for mode in options['mode']:
+            results[mode] = run_stress(
+                mode, options['seconds'],
+                options['readers'], options['writers']
+            )
+            for kind, stats in results[mode].items():
+                self.stdout.write(
+                    f'{mode:<10}{kind:<8}{stats["ops"]:>10}'
+                    f'{stats["ops_per_s"]:>11}{stats["p95_ms"]:>10}'
+                    f'{stats["errors"]:>8}'
+                )
+        if len(results) == len(MODES):
+            for kind in ('read', 'write'):
+                before = results['rollback'][kind]['ops_per_s']
+                after = results['wal'][kind]['ops_per_s']
+                ratio = f'x{after / before:.2f}' if before else 'нет данных'
+                self.stdout.write(self.style.SUCCESS(
+                    f'{kind}: {before} -> {after} операций в секунду ({ratio})'
+                ))
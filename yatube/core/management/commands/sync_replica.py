@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.db_router import sync_replica
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик: локальная замена '
+        'репликации для проверки чтения из реплик (DATABASE_REPLICAS).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='Алиасы реплик (по умолчанию DATABASE_REPLICAS)'
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError(
+                'Реплики не заданы: укажите алиасы или DATABASE_REPLICAS'
+            )
+        for alias in aliases:
+            if alias not in connections.databases:
+                raise CommandError(f'Нет базы с алиасом {alias}')
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'{alias}: поддерживается только SQLite')
+            sync_replica(alias)
+            self.stdout.write(self.style.SUCCESS(
+                f'{alias}: скопирована в '
+                f'{connections[alias].settings_dict["NAME"]}'
+            ))
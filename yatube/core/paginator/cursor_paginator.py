@@ -0,0 +1,175 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    '''Страница keyset-пагинации: без OFFSET и без COUNT(*)'''
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page of %s items>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if self.has_next():
+            return self.paginator.encode_cursor(self.object_list[-1], NEXT)
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous():
+            return self.paginator.encode_cursor(self.object_list[0], PREVIOUS)
+        return None
+
+
+def keyset_slice(queryset, keys, position, direction, limit):
+    '''
+    До limit строк queryset после позиции (created, id) по ключу keys.
+    При переходе вперед строки идут по убыванию ключа, назад - по возрастанию.
+    '''
+    created_field, pk_field = keys
+    descending = ('-' + created_field, '-' + pk_field)
+    if position is None:
+        return list(queryset.order_by(*descending)[:limit])
+    created, pk = position
+    if direction == NEXT:
+        return list(
+            queryset.filter(
+                Q(**{created_field + '__lt': created})
+                | Q(**{created_field: created, pk_field + '__lt': pk})
+            ).order_by(*descending)[:limit]
+        )
+    return list(
+        queryset.filter(
+            Q(**{created_field + '__gt': created})
+            | Q(**{created_field: created, pk_field + '__gt': pk})
+        ).order_by(created_field, pk_field)[:limit]
+    )
+
+
+class CursorPaginator:
+    '''
+    Пагинатор по ключу (created, id) в порядке убывания.
+    Курсор - непрозрачная строка с ключом крайнего объекта страницы
+    и направлением перехода.
+    keys задает поля ключа, если id хранится не в pk.
+    '''
+    keys = ('created', 'pk')
+
+    def __init__(self, queryset, per_page, keys=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        if keys is not None:
+            self.keys = keys
+
+    def get_key(self, obj):
+        '''Ключ (created, id) объекта или строки из values()'''
+        created_field, pk_field = self.keys
+        if isinstance(obj, dict):
+            return obj[created_field], obj[pk_field]
+        return getattr(obj, created_field), getattr(obj, pk_field)
+
+    def encode_cursor(self, obj, direction):
+        created, pk = self.get_key(obj)
+        payload = json.dumps(
+            [created.isoformat(), pk, direction], separators=(',', ':')
+        )
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            created, pk, direction = json.loads(
+                base64.urlsafe_b64decode(padded.encode()).decode()
+            )
+            created = parse_datetime(created)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise InvalidCursor('Некорректный курсор')
+        if created is None or direction not in (NEXT, PREVIOUS):
+            raise InvalidCursor('Некорректный курсор')
+        return created, pk, direction
+
+    def fetch(self, position, direction, limit):
+        '''Строки страницы; переопределяется для составных источников'''
+        return keyset_slice(
+            self.queryset, self.keys, position, direction, limit
+        )
+
+    def page(self, cursor=None):
+        if not cursor:
+            rows = self.fetch(None, NEXT, self.per_page + 1)
+            return CursorPage(
+                rows[:self.per_page], self, len(rows) > self.per_page, False
+            )
+        created, pk, direction = self.decode_cursor(cursor)
+        rows = self.fetch((created, pk), direction, self.per_page + 1)
+        if direction == NEXT:
+            return CursorPage(
+                rows[:self.per_page], self, len(rows) > self.per_page, True
+            )
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return CursorPage(rows, self, True, has_previous)
+
+
+class CursorPaginationMixin:
+    '''
+    Подключает keyset-пагинацию к ListView.
+    Ссылки вида ?page=N продолжают обслуживаться стандартным Paginator.
+    '''
+    cursor_kwarg = 'cursor'
+
+    def get_cursor_paginator(self, queryset, page_size):
+        return CursorPaginator(queryset, page_size)
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.page_kwarg in self.request.GET or self.page_kwarg in self.kwargs:
+            self.cursor_paginated = False
+            return super().paginate_queryset(queryset, page_size)
+        self.cursor_paginated = True
+        paginator = self.get_cursor_paginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor_paginated'] = getattr(self, 'cursor_paginated', False)
+        return context
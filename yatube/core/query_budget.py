@@ -0,0 +1,78 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from core.sql import normalize_sql
+
+
+class QueryBudgetMixin:
+    '''
+    Проверка бюджета запросов страниц для TestCase.
+    Каждая страница открывается на данных из 1, 10 и 100 элементов
+    (и с таким же размером страницы): число запросов должно укладываться
+    в бюджет query_budgets и не зависеть от количества элементов.
+    Подкласс реализует get_pages(size): создает данные и возвращает
+    {имя URL: (клиент, адрес)}.
+    '''
+    query_budgets = {}
+    budget_sizes = (1, 10, 100)
+
+    def get_pages(self, size):
+        raise NotImplementedError
+
+    def capture_pages(self, size):
+        '''SQL каждой страницы на size элементах; данные затем откатываются'''
+        captured = {}
+        with transaction.atomic(), override_settings(
+            POSTS_PER_PAGE=size, COMMENTS_PER_PAGE=size
+        ):
+            for name, (client, url) in self.get_pages(size).items():
+                # Замер без кэша: фрагменты и страницы строятся заново
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                self.assertLess(
+                    response.status_code, 400, f'{name}: {url}'
+                )
+                captured[name] = [query['sql'] for query in queries]
+            transaction.set_rollback(True)
+        return captured
+
+    def assertQueryBudgets(self):
+        runs = {size: self.capture_pages(size) for size in self.budget_sizes}
+        smallest, largest = runs[min(runs)], runs[max(runs)]
+        failures = []
+        for name, budget in self.query_budgets.items():
+            counts = {size: len(run[name]) for size, run in runs.items()}
+            if len(set(counts.values())) > 1:
+                failures.append(
+                    f'{name}: число запросов растет с количеством элементов '
+                    f'{counts}, бюджет {budget}\n'
+                    + self.format_growth(smallest[name], largest[name])
+                )
+            elif counts[max(counts)] > budget:
+                failures.append(
+                    f'{name}: {counts[max(counts)]} запросов при бюджете '
+                    f'{budget}\n' + self.format_queries(largest[name])
+                )
+        if failures:
+            self.fail('\n\n'.join(failures))
+
+    def format_queries(self, queries):
+        return '\n'.join(
+            f'  {number}. {sql}' for number, sql in enumerate(queries, 1)
+        )
+
+    def format_growth(self, small, large):
+        '''Запросы, которых на большой странице стало больше, с примером'''
+        before = Counter(normalize_sql(sql) for sql in small)
+        after = Counter(normalize_sql(sql) for sql in large)
+        examples = {normalize_sql(sql): sql for sql in large}
+        return '\n'.join(
+            f'  +{after[fingerprint] - before[fingerprint]} x {fingerprint}'
+            f'\n    например: {examples[fingerprint]}'
+            for fingerprint in after
+            if after[fingerprint] > before[fingerprint]
+        )
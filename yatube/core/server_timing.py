@@ -0,0 +1,139 @@
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from core.sql import QueryRecorder
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+_local = threading.local()
+
+
+class RequestTimings:
+    '''Метрики одного запроса'''
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql = QueryRecorder()
+        self.template = 0.0
+        self.template_start = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def current_timings():
+    '''Метрики запроса, обрабатываемого в этом потоке, или None'''
+    return getattr(_local, 'timings', None)
+
+
+def instrument_cache(backend):
+    '''
+    Подсчет попаданий и промахов в экземпляре бэкенда кэша.
+    Экземпляры у каждого потока свои, поэтому обертка ставится
+    один раз на экземпляр и пишет в метрики текущего запроса.
+    '''
+    if getattr(backend, '_server_timing', False):
+        return
+    get, get_many = backend.get, backend.get_many
+
+    def timed_get(key, default=None, version=None):
+        value = get(key, _MISSING, version=version)
+        timings = current_timings()
+        if timings is not None:
+            if value is _MISSING:
+                timings.cache_misses += 1
+            else:
+                timings.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def timed_get_many(keys, version=None):
+        keys = list(keys)
+        values = get_many(keys, version=version)
+        timings = current_timings()
+        if timings is not None:
+            timings.cache_hits += len(values)
+            timings.cache_misses += len(keys) - len(values)
+        return values
+
+    backend.get, backend.get_many = timed_get, timed_get_many
+    backend._server_timing = True
+
+
+class ServerTimingMiddleware:
+    '''
+    Замеры запроса: число и время SQL, время отрисовки шаблона, попадания
+    и промахи кэша, общее время. Отдаются в заголовке Server-Timing
+    и строкой JSON в лог core.server_timing. Замеряется доля
+    SERVER_TIMING_SAMPLE_RATE запросов, остальные проходят без оберток.
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        for alias in settings.CACHES:
+            instrument_cache(caches[alias])
+        timings = _local.timings = RequestTimings()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.sql)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.timings = None
+        total = time.perf_counter() - timings.start
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = self.header(timings, total)
+        if settings.SERVER_TIMING_LOG:
+            logger.info(json.dumps(self.record(
+                request, response, timings, total
+            )))
+        return response
+
+    def process_template_response(self, request, response):
+        '''Отрисовка TemplateResponse идет после представления: засекаем ее'''
+        timings = current_timings()
+        if timings is not None:
+            timings.template_start = time.perf_counter()
+            response.add_post_render_callback(self.rendered)
+        return response
+
+    def rendered(self, response):
+        timings = current_timings()
+        if timings is not None and timings.template_start is not None:
+            timings.template += time.perf_counter() - timings.template_start
+
+    def header(self, timings, total):
+        return ', '.join((
+            f'sql;dur={timings.sql.time * 1000:.1f};'
+            f'desc="{timings.sql.count} queries"',
+            f'tpl;dur={timings.template * 1000:.1f}',
+            f'cache;desc="hit={timings.cache_hits} '
+            f'miss={timings.cache_misses}"',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+    def record(self, request, response, timings, total):
+        match = request.resolver_match
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'sql_ms': round(timings.sql.time * 1000, 2),
+            'queries': timings.sql.count,
+            'template_ms': round(timings.template * 1000, 2),
+            'cache_hits': timings.cache_hits,
+            'cache_misses': timings.cache_misses,
+        }
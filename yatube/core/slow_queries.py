@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.sql import normalize_sql
+
+logger = logging.getLogger(__name__)
+# Строки лога - готовый JSON, в общий лог они не попадают
+logger.propagate = False
+
+_local = threading.local()
+_handler_lock = threading.Lock()
+
+# Длина одного параметра в примере запроса
+PARAM_MAX_LENGTH = 200
+# Замена параметров запросов к таблицам SLOW_QUERY_REDACTED_TABLES
+REDACTED = '***'
+
+
+def log_files(path=None):
+    '''Файл лога и его ротированные копии, от старых к новым'''
+    path = path or settings.SLOW_QUERY_LOG_FILE
+    files = [
+        f'{path}.{number}'
+        for number in range(settings.SLOW_QUERY_LOG_BACKUPS, 0, -1)
+    ]
+    return [name for name in files + [path] if os.path.exists(name)]
+
+
+def get_logger():
+    '''Логгер с ротацией файла; файл открывается при первой записи'''
+    path = settings.SLOW_QUERY_LOG_FILE
+    handler = logger.handlers[0] if logger.handlers else None
+    if handler is None or handler.baseFilename != os.path.abspath(path):
+        with _handler_lock:
+            for old in list(logger.handlers):
+                logger.removeHandler(old)
+                old.close()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = RotatingFileHandler(
+                path,
+                maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+                backupCount=settings.SLOW_QUERY_LOG_BACKUPS,
+                encoding='utf-8',
+                delay=True
+            )
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+    return logger
+
+
+def is_redacted(sql):
+    '''Запрос касается таблицы с секретами (ключи сессий, хэши паролей)'''
+    return any(
+        f'"{table}"' in sql for table in settings.SLOW_QUERY_REDACTED_TABLES
+    )
+
+
+def short_params(sql, params, many):
+    '''
+    Параметры примера: строками и с ограничением длины; у запросов
+    к таблицам с секретами каждый параметр заменяется на REDACTED
+    '''
+    if params is None:
+        return None
+    if many:
+        params = next(iter(params), ())
+    if isinstance(params, dict):
+        params = list(params.values())
+    if is_redacted(sql):
+        return [REDACTED for _ in params]
+    return [str(value)[:PARAM_MAX_LENGTH] for value in params]
+
+
+class SlowQueryLog:
+    '''
+    Обертка выполнения запросов соединения.
+    Пишет запросы дольше SLOW_QUERY_THRESHOLD_MS и случайную долю
+    SLOW_QUERY_SAMPLE_RATE остальных: отпечаток без литералов,
+    время и представление, из которого пришел запрос. Пример параметров
+    сохраняется только у медленных запросов: выборка пишет обычные
+    запросы, в том числе с данными пользователей.
+    '''
+    def __init__(self, alias):
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            slow = duration >= settings.SLOW_QUERY_THRESHOLD_MS
+            if slow or random.random() < settings.SLOW_QUERY_SAMPLE_RATE:
+                self.write(sql, params, many, duration, slow)
+
+    def write(self, sql, params, many, duration, slow):
+        path, view = getattr(_local, 'context', (None, None))
+        get_logger().info(json.dumps({
+            'time': timezone.now().isoformat(),
+            'alias': self.alias,
+            'ms': round(duration, 3),
+            'slow': slow,
+            'fingerprint': normalize_sql(sql),
+            'params': short_params(sql, params, many) if slow else None,
+            'view': view,
+            'path': path,
+        }, ensure_ascii=False))
+
+
+def install_slow_query_log(sender, connection, **kwargs):
+    '''Подключает журнал к каждому новому соединению с базой'''
+    if not settings.SLOW_QUERY_LOG_FILE:
+        return
+    wrappers = connection.execute_wrappers
+    if not any(isinstance(wrapper, SlowQueryLog) for wrapper in wrappers):
+        # В начало списка: соединение может открыться внутри
+        # connection.execute_wrapper(), который при выходе снимает
+        # последнюю обертку
+        wrappers.insert(0, SlowQueryLog(connection.alias))
+
+
+class SlowQueryContextMiddleware:
+    '''Запоминает адрес и представление запроса для записей журнала'''
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.context = (request.path, None)
+        try:
+            return self.get_response(request)
+        finally:
+            _local.context = (None, None)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        _local.context = (request.path, match and match.view_name)
@@ -0,0 +1,54 @@
+import re
+import time
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:\?|%s)(?:, (?:\?|%s))*\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    '''
+    Отпечаток запроса: литералы заменены на ?, списки IN свернуты.
+    Запросы, отличающиеся только значениями, дают один отпечаток.
+    '''
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    '''Обертка выполнения запросов: считает их число и время'''
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+
+
+# Признаки плохого плана SQLite: проход по всей таблице без индекса
+# и сортировка или группировка во временном B-дереве
+_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?[\w"]+(?: AS \w+)?$')
+_TEMP_BTREE = re.compile(r'USE TEMP B-TREE')
+
+
+def query_plan(connection, sql):
+    '''Строки EXPLAIN QUERY PLAN запроса (только SQLite)'''
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan):
+    '''Шаги плана с полным проходом таблицы или временной сортировкой'''
+    return [
+        step for step in plan
+        if _FULL_SCAN.match(step) or _TEMP_BTREE.search(step)
+    ]
@@ -0,0 +1,68 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+# Прагма и настройка с ее значением; порядок важен: busy_timeout
+# ставится первым, чтобы переключение журнала ждало чужие блокировки
+PRAGMA_SETTINGS = (
+    ('busy_timeout', 'SQLITE_BUSY_TIMEOUT'),
+    ('journal_mode', 'SQLITE_JOURNAL_MODE'),
+    ('synchronous', 'SQLITE_SYNCHRONOUS'),
+    ('mmap_size', 'SQLITE_MMAP_SIZE'),
+    ('cache_size', 'SQLITE_CACHE_SIZE'),
+    ('temp_store', 'SQLITE_TEMP_STORE'),
+)
+
+
+def sqlite_pragmas():
+    '''Прагмы соединения из настроек; None в настройке - значение SQLite'''
+    pragmas = []
+    for pragma, name in PRAGMA_SETTINGS:
+        value = getattr(settings, name, None)
+        if value is not None:
+            pragmas.append((pragma, value))
+    return pragmas
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    '''
+    Настраивает каждое новое соединение с SQLite.
+    WAL позволяет читать во время записи, synchronous=NORMAL в WAL
+    не теряет целостность и не ждет fsync на каждой фиксации,
+    busy_timeout заставляет ждать блокировку вместо "database is locked".
+    '''
+    if connection.vendor != 'sqlite':
+        return
+    # Напрямую через драйвер: прагмы не попадают в счетчики и журналы
+    # запросов приложения
+    for pragma, value in sqlite_pragmas():
+        connection.connection.execute(f'PRAGMA {pragma} = {value}')
+
+
+@contextmanager
+def immediate_atomic(using=DEFAULT_DB_ALIAS):
+    '''
+    transaction.atomic(), который в SQLite начинается с BEGIN IMMEDIATE.
+    Обычная транзакция SQLite берет блокировку записи только на первой
+    записи, и если другая транзакция успела записать после чтения,
+    запись падает с "database is locked" без ожидания busy_timeout.
+    Здесь блокировка берется сразу, и параллельные транзакции ждут
+    друг друга. Вложенный блок - обычная точка сохранения.
+    '''
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+    # Django начинает транзакцию SQLite методом соединения с BEGIN;
+    # подменяем его только для этого блока
+    connection._start_transaction_under_autocommit = (
+        lambda: connection.cursor().execute('BEGIN IMMEDIATE')
+    )
+    try:
+        with transaction.atomic(using=using):
+            del connection._start_transaction_under_autocommit
+            yield
+    finally:
+        connection.__dict__.pop('_start_transaction_under_autocommit', None)
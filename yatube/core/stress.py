@@ -0,0 +1,221 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import (
+    DEFAULT_DB_ALIAS, OperationalError, connection, connections
+)
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.benchmark import CLIENT_ADDR, percentile
+from posts.models import Post
+
+User = get_user_model()
+
+# Режимы соединений SQLite: журнал отката с настройками SQLite
+# и драйвера по умолчанию (как было до core.sqlite) и настройки проекта
+MODES = {
+    'rollback': {
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': None,
+        'SQLITE_BUSY_TIMEOUT': None,
+        'SQLITE_MMAP_SIZE': None,
+        'SQLITE_CACHE_SIZE': None,
+        'SQLITE_TEMP_STORE': None,
+    },
+    'wal': {},
+}
+# Префикс имен пользователей нагрузки
+USERNAME_PREFIX = 'stress-'
+STRESS_POSTS = 10
+# Свой кэш процесса на время прогона: фрагменты и страницы копии базы
+# не должны попасть в общий кэш живого сайта
+STRESS_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'stress',
+    }
+}
+
+
+class StressData:
+    '''
+    Пользователи и посты нагрузки. Имена уникальны для прогона,
+    удаляются только созданные им пользователи (вместе с их постами)
+    '''
+    def __init__(self, readers, writers):
+        prefix = f'{USERNAME_PREFIX}{uuid.uuid4().hex[:8]}-'
+        self.author = User.objects.create_user(f'{prefix}author')
+        self.posts = [
+            Post.objects.create(
+                author=self.author,
+                title=f'Нагрузка {number}',
+                text='Текст поста под нагрузкой'
+            ).pk
+            for number in range(STRESS_POSTS)
+        ]
+        self.readers = [
+            User.objects.create_user(f'{prefix}reader{number}')
+            for number in range(readers)
+        ]
+        self.writers = [
+            User.objects.create_user(f'{prefix}writer{number}')
+            for number in range(writers)
+        ]
+        self.user_ids = [
+            user.pk for user in [self.author, *self.readers, *self.writers]
+        ]
+
+    def delete(self):
+        User.objects.filter(pk__in=self.user_ids).delete()
+
+
+@contextmanager
+def database_copy():
+    '''
+    Копия основной базы во временном файле через backup API.
+    На время прогона соединения default открываются к копии: режим
+    журнала и данные нагрузки не касаются рабочей базы.
+    '''
+    connection.ensure_connection()
+    fd, path = tempfile.mkstemp(prefix='yatube-stress-', suffix='.sqlite3')
+    os.close(fd)
+    target = sqlite3.connect(path)
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
+    settings_dict = connections.databases[DEFAULT_DB_ALIAS]
+    source = settings_dict['NAME']
+    connections.close_all()
+    settings_dict['NAME'] = path
+    try:
+        yield path
+    finally:
+        connections.close_all()
+        settings_dict['NAME'] = source
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def read(client, post_id):
+    '''Чтение: страница поста и главная'''
+    yield client.get(reverse('posts:post_detail', args=(post_id,))), 200
+    yield client.get(reverse('posts:index')), 200
+
+
+def write(client, post_id):
+    '''Запись: переключение лайка и комментарий'''
+    yield client.post(
+        reverse('posts:like_unlike_post'), {'post_id': post_id}
+    ), 200
+    yield client.post(
+        reverse('posts:add_comment', args=(post_id,)),
+        {'text': 'Комментарий под нагрузкой'}
+    ), 302
+
+
+class Worker(threading.Thread):
+    '''
+    Поток, выполняющий действие до истечения времени прогона.
+    "database is locked" и неожиданные коды ответа считаются ошибками,
+    остальные исключения передаются в основной поток.
+    '''
+    def __init__(self, action, user, posts, barrier, seconds):
+        super().__init__(daemon=True)
+        self.action = action
+        self.posts = posts
+        self.barrier = barrier
+        self.seconds = seconds
+        self.client = Client(REMOTE_ADDR=CLIENT_ADDR)
+        self.client.force_login(user)
+        self.rng = random.Random(user.pk)
+        self.timings = []
+        self.errors = 0
+        self.exception = None
+
+    def run(self):
+        try:
+            self.barrier.wait(timeout=30)
+            deadline = time.perf_counter() + self.seconds
+            while time.perf_counter() < deadline:
+                self.step(self.rng.choice(self.posts))
+        except Exception as error:
+            self.exception = error
+        finally:
+            connection.close()
+
+    def step(self, post_id):
+        responses = self.action(self.client, post_id)
+        while True:
+            start = time.perf_counter()
+            try:
+                response, expected = next(responses)
+            except StopIteration:
+                return
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                self.errors += 1
+                return
+            if response.status_code != expected:
+                self.errors += 1
+            else:
+                self.timings.append(time.perf_counter() - start)
+
+
+def summarize(workers, seconds):
+    timings = [timing for worker in workers for timing in worker.timings]
+    return {
+        'ops': len(timings),
+        'ops_per_s': round(len(timings) / seconds, 1),
+        'p95_ms': round(percentile(timings, 95) * 1000, 2) if timings else 0,
+        'errors': sum(worker.errors for worker in workers),
+    }
+
+
+def run_stress(mode, seconds, readers, writers):
+    '''
+    Смешанная нагрузка: readers потоков читают страницы, writers
+    потоков ставят лайки и пишут комментарии в течение seconds секунд.
+    Возвращает пропускную способность, p95 и число ошибок
+    для чтения и записи.
+    Нагрузка идет на копию основной базы (database_copy) без реплик
+    и со своим кэшем.
+    '''
+    with database_copy(), override_settings(
+            DATABASE_REPLICAS=[], CACHES=STRESS_CACHES, **MODES[mode]):
+        data = StressData(readers, writers)
+        try:
+            barrier = threading.Barrier(readers + writers)
+            workers = {
+                'read': [
+                    Worker(read, user, data.posts, barrier, seconds)
+                    for user in data.readers
+                ],
+                'write': [
+                    Worker(write, user, data.posts, barrier, seconds)
+                    for user in data.writers
+                ],
+            }
+            threads = workers['read'] + workers['write']
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for thread in threads:
+                if thread.exception is not None:
+                    raise thread.exception
+        finally:
+            data.delete()
+            connections.close_all()
+    return {kind: summarize(group, seconds) for kind, group in workers.items()}
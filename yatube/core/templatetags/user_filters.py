@@ -1,4 +1,5 @@
 from django import template
+from django.conf import settings
 # В template.Library зарегистрированы все встроенные теги и фильтры шаблонов;
 # добавляем к ним и наш фильтр.
 register = template.Library()
@@ -7,3 +8,15 @@ register = template.Library()
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
+
+
+@register.filter
+def page_window(page):
+    '''
+    Номера страниц вокруг текущей: не больше PAGINATOR_WINDOW с каждой
+    стороны, чтобы на выдаче с тысячами страниц не выводить их все
+    '''
+    radius = settings.PAGINATOR_WINDOW
+    first = max(page.number - radius, 1)
+    last = min(page.number + radius, page.paginator.num_pages)
+    return range(first, last + 1)
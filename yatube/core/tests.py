@@ -1,4 +1,61 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.benchmark import PAGES, SKIPPED, compare, measure, url_names
+from core.checks import check_shared_cache
+from core.db_router import sync_replica
+from core.slow_queries import log_files, logger as slow_query_logger
+from core.context_processors.groups_all import groups_all
+from core.sql import normalize_sql
+from core.stress import USERNAME_PREFIX, run_stress
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class SharedCacheCheckTests(TestCase):
+    '''Несколько рабочих процессов требуют общего кэша'''
+    LOCMEM = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    SHARED = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/tmp/yatube-cache',
+        }
+    }
+
+    def test_single_worker_allows_locmem(self):
+        with self.settings(WEB_WORKERS=1, CACHES=self.LOCMEM):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_several_workers_reject_locmem(self):
+        with self.settings(WEB_WORKERS=4, CACHES=self.LOCMEM):
+            errors = check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+    def test_several_workers_allow_shared_cache(self):
+        with self.settings(WEB_WORKERS=4, CACHES=self.SHARED):
+            self.assertEqual(check_shared_cache(None), [])
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +63,468 @@ class ViewTestClass(TestCase):
     def test_error_page(self):
         response = self.client.get('/nonexist-page/')
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class GroupsDirectoryTests(TransactionTestCase):
+    '''Кэшированный справочник групп из контекст-процессора groups_all'''
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='creator')
+        self.quiet = Group.objects.create(
+            title='Тихая группа', slug='quiet', creator=self.user
+        )
+        self.busy = Group.objects.create(
+            title='Активная группа', slug='busy', creator=self.user
+        )
+        for i in range(2):
+            Post.objects.create(
+                author=self.user, title=f'Пост {i}', text='Текст',
+                group=self.busy
+            )
+
+    def test_directory_is_lazy(self):
+        """Без обращения к groups_all запросов к группам нет."""
+        context = groups_all(None)
+        with self.assertNumQueries(0):
+            context['groups_all']
+
+    def test_directory_is_ordered_and_cached(self):
+        """Группы отсортированы по активности и читаются из кэша."""
+        with self.assertNumQueries(1):
+            directory = list(groups_all(None)['groups_all'])
+        self.assertEqual(
+            [(group['slug'], group['posts_count']) for group in directory],
+            [('busy', 2), ('quiet', 0)]
+        )
+        with self.assertNumQueries(0):
+            list(groups_all(None)['groups_all'])
+
+    def test_directory_invalidated_on_writes(self):
+        """Создание группы и поста сбрасывает кэш справочника."""
+        list(groups_all(None)['groups_all'])
+        Group.objects.create(title='Новая', slug='new', creator=self.user)
+        Post.objects.create(
+            author=self.user, title='Пост', text='Текст', group=self.quiet
+        )
+        directory = {
+            g['slug']: g['posts_count'] for g in groups_all(None)['groups_all']
+        }
+        self.assertEqual(directory, {'busy': 2, 'quiet': 1, 'new': 0})
+
+
+class BenchmarkViewsTests(TestCase):
+    '''Замеры страниц и сравнение с эталоном'''
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_yatube', users=20, groups=2, posts=30, comments=40,
+            follows=60, likes=80, workers=1, stdout=StringIO()
+        )
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.baseline = os.path.join(directory, 'baseline.json')
+        self.addCleanup(os.rmdir, directory)
+
+    def run_command(self, **options):
+        call_command(
+            'benchmark_views', iterations=1, warmup=0,
+            baseline=self.baseline, stdout=StringIO(), **options
+        )
+
+    def test_every_page_is_measured_or_skipped(self):
+        """Каждый URL posts, users и about замеряется или пропущен явно."""
+        measured = [page[0] for page in PAGES]
+        self.assertEqual(
+            sorted(url_names()), sorted(measured + list(SKIPPED))
+        )
+
+    def test_baseline_round_trip(self):
+        """Эталон записывается, повторный прогон с ним проходит."""
+        self.run_command(update_baseline=True)
+        self.addCleanup(os.remove, self.baseline)
+        with open(self.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        self.assertEqual(set(baseline['pages']), {page[0] for page in PAGES})
+        self.assertEqual(baseline['dataset']['posts'], 30)
+        self.run_command(threshold=1000)
+
+    def test_compare_reports_regressions(self):
+        """Лишний запрос, рост времени и неверный код ответа - регрессии."""
+        baseline = {'posts:index': {
+            'p50_ms': 10, 'p95_ms': 20, 'queries': 4, 'sql_ms': 1,
+            'bytes': 1000,
+        }}
+        result = {
+            'status': 200, 'expected_status': 200, 'p50_ms': 11,
+            'p95_ms': 40, 'queries': 5, 'sql_ms': 1.1, 'bytes': 1000,
+        }
+        self.assertEqual(
+            compare({'posts:index': result}, baseline, 0.2),
+            [
+                'posts:index: p95_ms 20 -> 40 (+100%)',
+                'posts:index: queries 4 -> 5 (+25%)',
+            ]
+        )
+        result.update(status=500, p95_ms=20, queries=4)
+        self.assertEqual(len(compare({'posts:index': result}, baseline, 0.2)), 1)
+
+    def test_regression_fails_command(self):
+        """Команда завершается ошибкой, если страница стала тяжелее."""
+        with open(self.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'pages': {'about:tech': {'bytes': 1}}}, f)
+        self.addCleanup(os.remove, self.baseline)
+        with self.assertRaisesMessage(CommandError, 'about:tech: bytes'):
+            self.run_command(only=['about:tech'])
+
+
+class NormalizeSqlTests(TestCase):
+    def test_literals_are_stripped(self):
+        """Запросы, отличающиеся только значениями, совпадают."""
+        self.assertEqual(
+            normalize_sql(
+                'SELECT "t"."id" FROM "t2" WHERE "t"."a" = 15 AND '
+                "\"t\".\"b\" = 'it''s'  AND \"t\".\"id\" IN (1, 2, 3)"
+            ),
+            'SELECT "t"."id" FROM "t2" WHERE "t"."a" = ? AND '
+            '"t"."b" = ? AND "t"."id" IN (...)'
+        )
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+class ServerTimingTests(TestCase):
+    '''Заголовок Server-Timing и строка лога с замерами запроса'''
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.user, title='Пост', text='Текст')
+
+    def setUp(self):
+        cache.clear()
+
+    def timing(self, response):
+        return dict(
+            (name, desc or float(dur))
+            for name, dur, desc in re.findall(
+                r'(\w+)(?:;dur=([\d.]+))?(?:;desc="([^"]*)")?',
+                response['Server-Timing']
+            )
+        )
+
+    def test_log_is_configured(self):
+        """Лог замеров пишет INFO в свой обработчик."""
+        timing_logger = logging.getLogger('core.server_timing')
+        self.assertTrue(timing_logger.isEnabledFor(logging.INFO))
+        self.assertTrue(timing_logger.handlers)
+
+    def test_header_and_log(self):
+        """Время SQL, шаблона и общее время есть в заголовке и в логе."""
+        with self.assertLogs('core.server_timing', 'INFO') as logs:
+            response = self.client.get(reverse('posts:index'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreaterEqual(record['total_ms'], record['template_ms'])
+        self.assertIn(
+            f'sql;dur={record["sql_ms"]:.1f};desc="{record["queries"]} '
+            'queries"',
+            response['Server-Timing']
+        )
+        self.assertIn('tpl', self.timing(response))
+
+    def test_cache_hits_and_misses(self):
+        """Кэш страницы: сначала промахи, при повторе - попадания."""
+        with self.assertLogs('core.server_timing', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+            response = self.client.get(reverse('posts:index'))
+        first, second = (json.loads(r.getMessage()) for r in logs.records)
+        self.assertGreater(first['cache_misses'], 0)
+        self.assertGreater(second['cache_hits'], 0)
+        self.assertEqual(
+            self.timing(response)['cache'],
+            f'hit={second["cache_hits"]} miss={second["cache_misses"]}'
+        )
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request_is_not_measured(self):
+        """Запрос вне выборки проходит без замеров и строки лога."""
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('core.server_timing', 'INFO'):
+                response = self.client.get(reverse('about:tech'))
+        self.assertNotIn('Server-Timing', response)
+
+
+class SlowQueryLogTests(TestCase):
+    '''Журнал медленных запросов и его сводка'''
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.user, title='Пост', text='Текст')
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'slow.log')
+        settings = override_settings(
+            SLOW_QUERY_LOG_FILE=self.path, SLOW_QUERY_THRESHOLD_MS=0
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(self.close_log)
+
+    def close_log(self):
+        for handler in list(slow_query_logger.handlers):
+            slow_query_logger.removeHandler(handler)
+            handler.close()
+
+    def records(self):
+        self.close_log()
+        with open(self.path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_queries_are_logged_with_view(self):
+        """Запрос пишется без литералов, с параметрами и представлением."""
+        group = Group.objects.create(
+            title='Группа', slug='group', creator=self.user
+        )
+        self.client.get(reverse('posts:group_list', args=(group.slug,)))
+        records = [
+            r for r in self.records() if r['view'] == 'posts:group_list'
+        ]
+        self.assertTrue(records)
+        lookup = next(r for r in records if '"posts_group"."slug"' in r[
+            'fingerprint'
+        ])
+        self.assertEqual(lookup['params'], ['group'])
+        self.assertEqual(lookup['path'], '/group/group/')
+        self.assertTrue(lookup['slow'])
+
+    def test_secret_tables_params_are_redacted(self):
+        """Параметры запросов к сессиям и пользователям скрываются."""
+        self.client.force_login(self.user)
+        self.client.get(reverse('posts:index'))
+        params = [
+            value for r in self.records()
+            if '"django_session"' in r['fingerprint']
+            or '"auth_user"' in r['fingerprint']
+            for value in r['params']
+        ]
+        self.assertTrue(params)
+        self.assertEqual(set(params), {'***'})
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=10 ** 6, SLOW_QUERY_SAMPLE_RATE=1)
+    def test_sampled_fast_queries_have_no_params(self):
+        """Быстрые запросы из выборки пишутся без параметров."""
+        Post.objects.filter(pk=self.user.pk).exists()
+        records = self.records()
+        self.assertTrue(records)
+        self.assertFalse(records[0]['slow'])
+        self.assertIsNone(records[0]['params'])
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=10 ** 6, SLOW_QUERY_SAMPLE_RATE=0)
+    def test_fast_queries_are_not_logged(self):
+        """Быстрые запросы вне выборки не пишутся."""
+        self.client.get(reverse('posts:index'))
+        self.assertFalse(os.path.exists(self.path))
+
+    @override_settings(SLOW_QUERY_LOG_MAX_BYTES=1500)
+    def test_report_aggregates_rotated_files(self):
+        """Сводка учитывает ротированные файлы и группирует по отпечатку."""
+        for _ in range(10):
+            Post.objects.filter(pk=self.user.pk).exists()
+        self.close_log()
+        self.assertGreater(len(log_files(self.path)), 1)
+        out = StringIO()
+        call_command('slowqueries', sort='count', top=1, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertIn('10 раз', lines[0])
+        self.assertIn('WHERE "posts_post"."id" = %s', lines[1])
+        self.assertIn(f"['{self.user.pk}']", lines[3])
+
+    def test_empty_log_is_reported(self):
+        """Без журнала команда сообщает об ошибке."""
+        with self.assertRaises(CommandError):
+            call_command('slowqueries', stdout=StringIO())
+
+
+class SQLiteConnectionTests(TransactionTestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_new_connection_gets_pragmas(self):
+        """Новое соединение получает WAL и прагмы из настроек."""
+        connection.close()
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        # NORMAL = 1, MEMORY = 2
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+
+    @override_settings(SQLITE_BUSY_TIMEOUT=1234, SQLITE_CACHE_SIZE=None)
+    def test_pragmas_follow_settings(self):
+        """None оставляет значение SQLite по умолчанию."""
+        connection.close()
+        self.assertEqual(self.pragma('busy_timeout'), 1234)
+        self.assertEqual(self.pragma('cache_size'), -2000)
+
+    def test_mixed_load(self):
+        """Под смешанной нагрузкой в WAL нет ошибок блокировки."""
+        User.objects.create_user(f'{USERNAME_PREFIX}existing')
+        results = {
+            mode: run_stress(mode, seconds=1, readers=4, writers=2)
+            for mode in ('rollback', 'wal')
+        }
+        for kind in ('read', 'write'):
+            self.assertGreater(results['wal'][kind]['ops'], 0)
+            self.assertEqual(results['wal'][kind]['errors'], 0)
+        # Нагрузка шла на копию: в рабочей базе нет постов нагрузки,
+        # чужие пользователи с тем же префиксом остались
+        self.assertEqual(
+            list(User.objects.filter(
+                username__startswith=USERNAME_PREFIX
+            ).values_list('username', flat=True)),
+            [f'{USERNAME_PREFIX}existing']
+        )
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+
+    def test_command_reports_both_modes(self):
+        out = StringIO()
+        call_command(
+            'stress_sqlite', seconds=0.5, readers=2, writers=1, stdout=out
+        )
+        self.assertIn('rollback', out.getvalue())
+        self.assertRegex(out.getvalue(), r'write: [\d.]+ -> [\d.]+')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    '''Чтение лент из реплики, запись и закрепление за основной базой'''
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.synced = Post.objects.create(
+            author=self.author, title='Синхронизированный пост', text='Есть в реплике'
+        )
+        sync_replica('replica')
+        # Реплика отстает: этого поста в ней нет до следующей синхронизации
+        self.fresh = Post.objects.create(
+            author=self.author, title='Свежий пост', text='Только в основной'
+        )
+        self.writer = Client()
+        self.writer.force_login(self.author)
+        # Читатель с входом: его страницы не берутся из кэша анонимных
+        self.reader = Client()
+        self.reader.force_login(User.objects.create_user(username='reader'))
+
+    def test_lists_and_detail_read_from_replica(self):
+        """Ленты и страница поста читаются из отстающей реплики."""
+        response = self.reader.get(reverse('posts:index'))
+        self.assertContains(response, 'Синхронизированный пост')
+        self.assertNotContains(response, 'Свежий пост')
+        response = self.reader.get(
+            reverse('posts:post_detail', args=(self.fresh.pk,))
+        )
+        self.assertEqual(response.status_code, 404)
+        sync_replica('replica')
+        self.assertContains(
+            self.reader.get(reverse('posts:index')), 'Свежий пост'
+        )
+
+    def test_replica_pages_are_not_cached(self):
+        """Фрагмент ленты, меню групп и ETag не берутся из реплики."""
+        Group.objects.create(
+            title='Свежая группа', slug='fresh', creator=self.author
+        )
+        index = reverse('posts:index')
+        response = self.reader.get(index)
+        self.assertNotContains(response, 'Свежий пост')
+        self.assertNotContains(response, 'Свежая группа')
+        self.assertFalse(response.has_header('ETag'))
+        # Реплика догнала основную базу без новых сбросов кэша
+        sync_replica('replica')
+        response = self.reader.get(index)
+        self.assertContains(response, 'Свежий пост')
+        self.assertContains(response, 'Свежая группа')
+
+    def test_anonymous_page_cache_fills_from_primary(self):
+        """Промах кэша анонимных страниц читает основную базу."""
+        index = reverse('posts:index')
+        response = self.client.get(index)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Свежий пост')
+        self.assertTrue(response.has_header('ETag'))
+        response = self.client.get(index)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertContains(response, 'Свежий пост')
+
+    def test_benchmark_counts_replica_queries(self):
+        """Замер страниц учитывает запросы ко всем базам."""
+        primary = CaptureQueriesContext(connections['default'])
+        replica = CaptureQueriesContext(connections['replica'])
+        with primary, replica:
+            result = measure(self.reader, reverse('posts:index'), 1, 0)
+        self.assertTrue(replica.captured_queries)
+        self.assertEqual(
+            result['queries'],
+            len(primary.captured_queries) + len(replica.captured_queries)
+        )
+
+    def test_other_views_read_from_primary(self):
+        """Страницы изменения данных читают основную базу."""
+        response = self.writer.get(
+            reverse('posts:post_edit', args=(self.fresh.pk,))
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_writer_is_pinned_to_primary(self):
+        """После записи автор видит свой пост, остальные - после реплики."""
+        response = self.writer.post(reverse('posts:post_create'), {
+            'title': 'Пост автора', 'text': 'Только что написан'
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertFalse(
+            Post.objects.using('replica').filter(title='Пост автора').exists()
+        )
+        profile = reverse('posts:profile', args=('author',))
+        self.assertContains(self.writer.get(profile), 'Пост автора')
+        self.assertNotContains(self.reader.get(profile), 'Пост автора')
+
+    def test_writes_outside_replica_apps_do_not_pin(self):
+        """Вход пишет сессию и пользователя, но не закрепляет за основной."""
+        self.author.set_password('password')
+        self.author.save()
+        client = Client()
+        response = client.post(reverse('users:login'), {
+            'username': 'author', 'password': 'password'
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertNotContains(
+            client.get(reverse('posts:index')), 'Свежий пост'
+        )
+
+    def test_pin_expires(self):
+        """Просроченное закрепление снова отправляет чтение в реплику."""
+        self.writer.cookies[settings.REPLICA_PIN_COOKIE] = str(
+            time.time() - 1
+        )
+        response = self.writer.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Свежий пост')
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_reads_primary(self):
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Свежий пост'
+        )
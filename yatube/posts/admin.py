@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Post, Group, Comment, Follow, Like
+from .models import AuthorStats, Post, Group, Comment, Follow, Like
+from .search import search_posts
 
 
 @admin.register(Post)
@@ -15,10 +16,16 @@ class PostAdmin(admin.ModelAdmin):
                     'like_count'
                     )
     list_editable = ('group',)
-    search_fields = ('text',)
+    search_fields = ('title', 'text')
     list_filter = ('created',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск идет по полнотекстовому индексу, а не LIKE '%...%'
+        if not search_term:
+            return queryset, False
+        return search_posts(search_term, queryset), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -50,5 +57,17 @@ class FollowAdmin(admin.ModelAdmin):
                     'author',
                     )
     empty_value_display = '-пусто-'
+
+
+@admin.register(AuthorStats)
+class AuthorStatsAdmin(admin.ModelAdmin):
+    list_display = ('user',
+                    'posts_count',
+                    'followers_count',
+                    'following_count',
+                    'likes_received'
+                    )
+    readonly_fields = ('user',)
+    empty_value_display = '-пусто-'
     
 admin.site.register(Like)
\ No newline at end of file
@@ -0,0 +1,25 @@
+import time
+
+from django.core.cache import cache
+
+FEED_GENERATION_KEY = 'posts:feed_generation'
+
+
+def get_feed_generation():
+    '''Текущее поколение ленты: часть ключа кэшированных фрагментов'''
+    generation = cache.get(FEED_GENERATION_KEY)
+    if generation is None:
+        # Начальное значение берется из часов, а не с единицы:
+        # если ключ вытеснят из кэша, новое поколение не совпадет
+        # с поколениями уже закэшированных фрагментов
+        cache.add(FEED_GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(FEED_GENERATION_KEY)
+    return generation
+
+
+def bump_feed_generation():
+    '''Переводит ленту на новое поколение, старые фрагменты устаревают'''
+    try:
+        cache.incr(FEED_GENERATION_KEY)
+    except ValueError:
+        get_feed_generation()
@@ -0,0 +1,241 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Subquery
+
+from core.paginator.cursor_paginator import (
+    NEXT, CursorPaginator, keyset_slice
+)
+from .models import AuthorStats, FeedEntry, Follow, Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def is_read_on_request(author_id):
+    '''
+    Посты автора с огромным числом подписчиков не рассылаются при записи,
+    а читаются при запросе ленты
+    '''
+    return AuthorStats.objects.filter(
+        user_id=author_id,
+        followers_count__gte=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).exists()
+
+
+def follow_feed_state(user_id):
+    '''
+    Одним запросом по подпискам пользователя: авторы, читаемые при запросе,
+    и авторы, чей последний пост не дошел до ленты. Рассылка идет только
+    из post_save, поэтому посты из bulk_create, сида без --with-feed или
+    упавшей фоновой рассылки в ленте отсутствуют.
+    '''
+    latest_post = Post.objects.filter(
+        author_id=OuterRef(OuterRef('author_id'))
+    ).order_by('-created', '-pk').values('pk')[:1]
+    rows = Follow.objects.filter(user_id=user_id).annotate(
+        read_on_request=Exists(AuthorStats.objects.filter(
+            user_id=OuterRef('author_id'),
+            followers_count__gte=settings.FEED_FANOUT_MAX_FOLLOWERS
+        )),
+        has_posts=Exists(Post.objects.filter(author_id=OuterRef('author_id'))),
+        delivered=Exists(FeedEntry.objects.filter(
+            user_id=user_id, post_id=Subquery(latest_post)
+        ))
+    ).values_list('author_id', 'read_on_request', 'has_posts', 'delivered')
+    read_on_request, stale = [], []
+    for author_id, on_request, has_posts, delivered in rows:
+        if on_request:
+            read_on_request.append(author_id)
+        elif has_posts and not delivered:
+            stale.append(author_id)
+    return read_on_request, stale
+
+
+def follower_batches(author_id, batch_size):
+    '''id подписчиков автора пачками по ключу подписки'''
+    followers = Follow.objects.filter(author_id=author_id).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(
+            followers.filter(pk__gt=last_pk)
+            .values_list('pk', 'user_id')[:batch_size]
+        )
+        if not batch:
+            return
+        yield [user_id for _, user_id in batch]
+        last_pk = batch[-1][0]
+
+
+def add_entries(user_ids, author_id, posts):
+    '''Строки лент: каждый пост posts каждому из user_ids, без дублей'''
+    return FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                created=created
+            )
+            for user_id in user_ids
+            for post_id, created in posts
+        ],
+        ignore_conflicts=True
+    )
+
+
+def recent_posts(author_id):
+    '''Последние FEED_INBOX_BACKFILL постов автора: (id, дата)'''
+    return list(
+        Post.objects.filter(author_id=author_id)
+        .order_by('-created', '-pk')
+        .values_list('pk', 'created')[:settings.FEED_INBOX_BACKFILL]
+    )
+
+
+def fan_out_post(post_id):
+    '''
+    Раскладывает пост по лентам подписчиков автора.
+    Подписчики читаются по ключу пачками, каждая пачка пишется
+    отдельным INSERT, уже существующие строки пропускаются.
+    '''
+    post = Post.objects.filter(pk=post_id).values('author_id', 'created').first()
+    if post is None or is_read_on_request(post['author_id']):
+        return 0
+    total = 0
+    for user_ids in follower_batches(
+        post['author_id'], settings.FEED_FANOUT_BATCH_SIZE
+    ):
+        add_entries(
+            user_ids, post['author_id'], [(post_id, post['created'])]
+        )
+        total += len(user_ids)
+    return total
+
+
+def refill_author_inboxes(author_id):
+    '''
+    Автор опустился ниже FEED_FANOUT_MAX_FOLLOWERS, и лента снова берет
+    его посты из строк подписчиков. Посты, написанные, пока он читался
+    при запросе, не рассылались, а подписавшиеся в это время не получили
+    прошлых постов: всем подписчикам заново раскладываются последние
+    FEED_INBOX_BACKFILL постов автора.
+    '''
+    if is_read_on_request(author_id):
+        return 0
+    posts = recent_posts(author_id)
+    if not posts:
+        return 0
+    # Строк в одном INSERT - не больше FEED_FANOUT_BATCH_SIZE
+    batch_size = max(settings.FEED_FANOUT_BATCH_SIZE // len(posts), 1)
+    total = 0
+    for user_ids in follower_batches(author_id, batch_size):
+        add_entries(user_ids, author_id, posts)
+        total += len(user_ids)
+    return total
+
+
+def _run_in_background(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Не удалось разослать ленту: %s%r', func.__name__, args)
+    finally:
+        connection.close()
+
+
+def run_after_commit(func, *args):
+    '''
+    После коммита ставит рассылку в фоновый поток: запрос автора
+    не ждет записи строк в ленты всех подписчиков.
+    '''
+    def submit():
+        global _executor
+        if not settings.FEED_FANOUT_ASYNC:
+            func(*args)
+            return
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.FEED_FANOUT_WORKERS,
+                thread_name_prefix='feed-fanout'
+            )
+        _executor.submit(_run_in_background, func, *args)
+
+    transaction.on_commit(submit)
+
+
+def schedule_fan_out(post_id):
+    '''Рассылка начинается только после коммита поста'''
+    run_after_commit(fan_out_post, post_id)
+
+
+def schedule_refill(author_id):
+    '''Дополняет ленты подписчиков, если автор опустился ниже порога'''
+    dropped = AuthorStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.FEED_FANOUT_MAX_FOLLOWERS - 1
+    ).exists()
+    if dropped:
+        run_after_commit(refill_author_inboxes, author_id)
+
+
+def backfill_inbox(user_id, author_id):
+    '''Добавляет в ленту нового подписчика последние посты автора'''
+    if is_read_on_request(author_id):
+        return 0
+    return len(add_entries([user_id], author_id, recent_posts(author_id)))
+
+
+def trim_inbox(user_id, author_id):
+    '''Убирает из ленты посты автора после отписки'''
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+class FollowFeedPaginator(CursorPaginator):
+    '''
+    Keyset-пагинация ленты подписок.
+    Авторы, чьи последние посты не разосланы, сначала дописываются
+    в ленту (см. follow_feed_state). Ключи постов берутся из узкого индекса
+    ленты пользователя и, если среди подписок есть авторы с огромным
+    числом подписчиков, сливаются с их последними постами; затем одним
+    запросом загружаются сами посты.
+    queryset может быть и выборкой values() с полями created и pk.
+    '''
+    def __init__(self, user, per_page, queryset=None):
+        if queryset is None:
+            queryset = Post.objects.select_related('author', 'group')
+        super().__init__(queryset, per_page)
+        entries = FeedEntry.objects.filter(user_id=user.pk)
+        authors, stale = follow_feed_state(user.pk)
+        # Отставшая лента дополняется при чтении последними постами автора
+        for author_id in stale:
+            add_entries([user.pk], author_id, recent_posts(author_id))
+        if authors:
+            entries = entries.exclude(author_id__in=authors)
+            self.read_posts = Post.objects.filter(author_id__in=authors)
+        else:
+            self.read_posts = None
+        self.entries = entries
+
+    def fetch(self, position, direction, limit):
+        keys = keyset_slice(
+            self.entries.values_list('created', 'post_id'),
+            ('created', 'post_id'), position, direction, limit
+        )
+        if self.read_posts is not None:
+            keys += keyset_slice(
+                self.read_posts.values_list('created', 'pk'),
+                ('created', 'pk'), position, direction, limit
+            )
+            keys.sort(reverse=direction == NEXT)
+            keys = keys[:limit]
+        posts = {
+            self.get_key(post)[1]: post
+            for post in self.queryset.filter(
+                pk__in=[post_id for _, post_id in keys]
+            ).order_by()
+        }
+        return [posts[post_id] for _, post_id in keys if post_id in posts]
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import normalize_image
 from .models import Group, Post, Comment
 
 
@@ -22,6 +24,13 @@ class PostForm(forms.ModelForm):
         if not data:
             raise forms.ValidationError('Пост не может быть пустым!')
         return data
+
+    def clean_image(self):
+        data = self.cleaned_data['image']
+        # Обрабатываем только новую загрузку, а не уже сохраненный файл
+        if isinstance(data, UploadedFile):
+            return normalize_image(data)
+        return data
     
 class GroupForm(forms.ModelForm):
     class Meta:
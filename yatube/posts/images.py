@@ -0,0 +1,100 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps, ImageSequence
+
+# Выше этого размера результат кодирования уходит из памяти во временный файл
+SPOOL_MAX_SIZE = 1024 * 1024
+# Форматы, которые draft() читает сразу уменьшенными
+DRAFT_FORMATS = ('JPEG', 'MPO')
+
+
+def check_pixels(count, limit, width, height):
+    if count > limit:
+        raise ValidationError(
+            'Картинка слишком большая: %(width)sx%(height)s пикселей',
+            params={'width': width, 'height': height}
+        )
+
+
+def prepare_frame(frame, max_size):
+    '''Уменьшает кадр и приводит его к RGB или RGBA'''
+    frame.thumbnail(max_size, Image.Resampling.LANCZOS)
+    has_alpha = frame.mode in ('RGBA', 'LA') or (
+        frame.mode == 'P' and 'transparency' in frame.info
+    )
+    return frame.convert('RGBA' if has_alpha else 'RGB')
+
+
+def normalize_image(upload):
+    '''
+    Приводит загруженную картинку к формату хранения:
+    ограничивает размеры, применяет поворот из EXIF и выбрасывает
+    метаданные, перекодирует в POST_IMAGE_FORMAT.
+    Пиксели полноразмерного JPEG не декодируются целиком: draft()
+    сразу читает уменьшенную в 2-8 раз версию. Остальные форматы
+    декодируются полностью, поэтому для них предел пикселей ниже
+    (POST_IMAGE_MAX_DECODED_PIXELS); слишком большие картинки
+    отклоняются по заголовку до декодирования.
+    Анимированные картинки перекодируются покадрово с теми же
+    ограничениями; на все кадры вместе действует
+    POST_IMAGE_MAX_ANIMATION_PIXELS.
+    '''
+    max_size = settings.POST_IMAGE_MAX_SIZE
+    upload.seek(0)
+    image = Image.open(upload)
+    width, height = image.size
+    draft = image.format in DRAFT_FORMATS
+    check_pixels(
+        width * height,
+        settings.POST_IMAGE_MAX_PIXELS if draft
+        else settings.POST_IMAGE_MAX_DECODED_PIXELS,
+        width, height
+    )
+    options = {}
+    if getattr(image, 'is_animated', False) and not draft:
+        check_pixels(
+            width * height * image.n_frames,
+            settings.POST_IMAGE_MAX_ANIMATION_PIXELS, width, height
+        )
+        loop = image.info.get('loop', 0)
+        frames, durations = [], []
+        for frame in ImageSequence.Iterator(image):
+            durations.append(frame.info.get('duration', 100))
+            frames.append(prepare_frame(frame.copy(), max_size))
+        image = frames[0]
+        options = {
+            'save_all': True,
+            'append_images': frames[1:],
+            'duration': durations,
+            'loop': loop,
+        }
+    else:
+        image.draft('RGB', max_size)
+        image = prepare_frame(ImageOps.exif_transpose(image), max_size)
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    image_format = settings.POST_IMAGE_FORMAT
+    image.save(
+        output,
+        image_format,
+        quality=settings.POST_IMAGE_QUALITY,
+        icc_profile=image.info.get('icc_profile'),
+        **options
+    )
+    size = output.tell()
+    output.seek(0)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    extension = Image.registered_extensions()
+    suffix = next(
+        ext for ext, fmt in sorted(extension.items()) if fmt == image_format
+    )
+    return UploadedFile(
+        file=output,
+        name=name + suffix,
+        content_type=Image.MIME.get(image_format),
+        size=size
+    )
@@ -0,0 +1,214 @@
+import json
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+
+class Subscription:
+    '''
+    Подписка одного соединения на события постов.
+    Ожидание - это threading.Event без опроса: простаивающее соединение
+    не тратит процессор, пока не придет событие или пинг.
+    '''
+    def __init__(self, broker, post_ids):
+        self.broker = broker
+        self.post_ids = frozenset(post_ids)
+        self.events = deque(maxlen=settings.LIVE_QUEUE_SIZE)
+        self.ready = threading.Event()
+
+    def push(self, event):
+        self.events.append(event)
+        self.ready.set()
+
+    def wait(self, timeout):
+        '''События, накопленные до истечения timeout; пустой список - пинг'''
+        self.ready.wait(timeout)
+        self.ready.clear()
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        return events
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    '''Брокер в памяти процесса: подписчики индексированы по id поста'''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+
+    def subscribe(self, post_ids):
+        subscription = Subscription(self, post_ids)
+        with self.lock:
+            for post_id in subscription.post_ids:
+                self.subscribers[post_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for post_id in subscription.post_ids:
+                subscribers = self.subscribers.get(post_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscribers[post_id]
+
+    def deliver(self, event):
+        with self.lock:
+            subscribers = list(self.subscribers.get(event['post'], ()))
+        for subscription in subscribers:
+            subscription.push(event)
+
+    def publish(self, event):
+        self.deliver(event)
+
+
+class CacheBroker(LocalBroker):
+    '''
+    Брокер для нескольких процессов через общий кэш Django.
+    События пишутся в кэш под возрастающими номерами; один фоновый поток
+    на процесс раз в LIVE_POLL_INTERVAL забирает новые и раздает
+    их локальным подписчикам.
+    '''
+    sequence_key = 'posts:live:sequence'
+    event_key = 'posts:live:event:%s'
+
+    def __init__(self):
+        super().__init__()
+        self.poller = None
+
+    def subscribe(self, post_ids):
+        with self.lock:
+            if self.poller is None:
+                self.poller = threading.Thread(
+                    target=self.poll, name='live-broker', daemon=True
+                )
+                self.poller.start()
+        return super().subscribe(post_ids)
+
+    def publish(self, event):
+        cache.add(self.sequence_key, 0, None)
+        number = cache.incr(self.sequence_key)
+        cache.set(self.event_key % number, event, settings.LIVE_EVENT_TTL)
+
+    def poll(self):
+        last = cache.get(self.sequence_key, 0)
+        while True:
+            time.sleep(settings.LIVE_POLL_INTERVAL)
+            current = cache.get(self.sequence_key, 0)
+            if current <= last:
+                # Счетчик пропал из кэша и начался заново
+                last = min(last, current)
+                continue
+            keys = [self.event_key % n for n in range(last + 1, current + 1)]
+            events = cache.get_many(keys)
+            for key in keys:
+                if key in events:
+                    self.deliver(events[key])
+            last = current
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.LIVE_BROKER)()
+    return _broker
+
+
+def publish_counts(post_ids, field, delta):
+    '''
+    Публикует изменение счетчика (like_count или comment_count) постов.
+    Вместе с приращением отправляется итоговое значение: клиент, который
+    пропустил событие или сам поставил лайк, не разойдется с базой.
+    '''
+    name = {'like_count': 'likes', 'comment_count': 'comments'}[field]
+    broker = get_broker()
+    rows = Post.objects.filter(pk__in=list(post_ids)).values_list('pk', field)
+    for post_id, value in rows:
+        broker.publish({
+            'post': post_id, 'field': name, 'delta': delta, 'value': value
+        })
+
+
+def count_events(post_ids):
+    '''Текущие значения счетчиков постов: события без приращения'''
+    rows = Post.objects.filter(pk__in=list(post_ids)).values_list(
+        'pk', 'like_count', 'comment_count'
+    )
+    for post_id, likes, comments in rows:
+        yield {'post': post_id, 'field': 'likes', 'delta': 0, 'value': likes}
+        yield {
+            'post': post_id, 'field': 'comments', 'delta': 0,
+            'value': comments
+        }
+
+
+def format_event(event):
+    return 'event: counts\ndata: %s\n\n' % json.dumps(event)
+
+
+_streams = 0
+_streams_lock = threading.Lock()
+
+
+def acquire_stream():
+    '''Занимает место потока, если их меньше LIVE_MAX_STREAMS'''
+    global _streams
+    with _streams_lock:
+        if _streams >= settings.LIVE_MAX_STREAMS:
+            return False
+        _streams += 1
+        return True
+
+
+def release_stream():
+    global _streams
+    with _streams_lock:
+        _streams -= 1
+
+
+def event_stream(post_ids):
+    '''
+    Поток Server-Sent Events для постов post_ids.
+    Подписка оформляется при первой итерации и снимается при закрытии
+    соединения или по истечении LIVE_STREAM_TIMEOUT: браузер сам
+    переподключится через LIVE_RETRY_MS. Каждый поток занимает
+    обработчик сервера, поэтому их не больше LIVE_MAX_STREAMS на процесс.
+    Сверх лимита клиент переходит на опрос: получает текущие значения
+    счетчиков одним запросом, поток закрывается, и браузер
+    переподключается за новыми через LIVE_BUSY_RETRY_MS.
+    '''
+    if not acquire_stream():
+        yield 'retry: %d\n\n' % settings.LIVE_BUSY_RETRY_MS
+        for event in count_events(post_ids):
+            yield format_event(event)
+        return
+    try:
+        subscription = get_broker().subscribe(post_ids)
+        try:
+            yield 'retry: %d\n\n' % settings.LIVE_RETRY_MS
+            deadline = time.monotonic() + settings.LIVE_STREAM_TIMEOUT
+            while time.monotonic() < deadline:
+                events = subscription.wait(settings.LIVE_HEARTBEAT)
+                if not events:
+                    yield ': ping\n\n'
+                for event in events:
+                    yield format_event(event)
+        finally:
+            subscription.close()
+    finally:
+        release_stream()
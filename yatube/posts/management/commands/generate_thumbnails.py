@@ -0,0 +1,85 @@
+import os
+from multiprocessing import Pool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.thumbnails import generate_post_thumbnail
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+
+
+def iter_post_images(directory):
+    '''Имена картинок постов относительно MEDIA_ROOT, в стабильном порядке'''
+    root = os.path.join(settings.MEDIA_ROOT, directory)
+    for current, dirs, files in os.walk(root):
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(current, filename)
+                yield os.path.relpath(path, settings.MEDIA_ROOT).replace(
+                    os.sep, '/'
+                )
+
+
+def _generate(name):
+    try:
+        generate_post_thumbnail(name)
+    except Exception as e:
+        return name, str(e)
+    return name, None
+
+
+def _close_connections():
+    # Соединение родителя нельзя делить с дочерним процессом
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает недостающие миниатюры для картинок в media/posts/ '
+        'пулом процессов. Готовые миниатюры находятся в хранилище '
+        'sorl-thumbnail и пропускаются, поэтому прерванный запуск '
+        'можно просто повторить.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Количество процессов; 1 - без пула'
+        )
+        parser.add_argument(
+            '--directory',
+            default='posts',
+            help='Каталог с картинками внутри MEDIA_ROOT'
+        )
+
+    def handle(self, *args, **options):
+        names = iter_post_images(options['directory'])
+        workers = options['workers']
+        processed = failed = 0
+        if workers > 1:
+            _close_connections()
+            pool = Pool(workers, initializer=_close_connections)
+            results = pool.imap_unordered(_generate, names, chunksize=16)
+        else:
+            pool = None
+            results = map(_generate, names)
+        try:
+            for name, error in results:
+                processed += 1
+                if error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                if processed % 100 == 0:
+                    self.stdout.write(f'Обработано картинок: {processed}')
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {processed}, ошибок: {failed}'
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import AuthorStats, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает статистику авторов (посты, подписчики, подписки, '
+        'полученные лайки) по реальным данным пачками'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество пользователей, обрабатываемых за одну транзакцию'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = 0
+        rebuilt = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not user_ids:
+                break
+            rebuilt += AuthorStats.rebuild(user_ids)
+            last_pk = user_ids[-1]
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитана статистика пользователей: {rebuilt}'
+        ))
@@ -0,0 +1,143 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from posts.search import (
+    SEARCH_TABLE, TRIGGER_EVENTS, fts_available, search_table_sql,
+    search_triggers_sql
+)
+
+# Новый индекс строится рядом со старым, поиск до подмены идет по старому
+NEW_TABLE = f'{SEARCH_TABLE}_new'
+# Наибольший id поста, уже попавший в новый индекс
+PROGRESS_TABLE = f'{SEARCH_TABLE}_progress'
+PROGRESS_QUERY = f'SELECT last_id FROM {PROGRESS_TABLE}'
+# Страниц индекса, сливаемых за одну транзакцию
+MERGE_PAGES = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает полнотекстовый индекс постов пачками. Каждая пачка - '
+        'короткая транзакция, поэтому записи постов не ждут дольше '
+        'SQLITE_BUSY_TIMEOUT; поиск до конца перестройки идет по старому '
+        'индексу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество постов, индексируемых за одну транзакцию'
+        )
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError('Полнотекстовый индекс есть только в SQLite')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        self.prepare()
+        last_pk = 0
+        indexed = 0
+        while True:
+            count, last_pk = self.index_batch(last_pk, batch_size)
+            if not count:
+                break
+            indexed += count
+            self.stdout.write(f'Проиндексировано постов: {indexed}')
+        indexed += self.swap(last_pk)
+        self.merge()
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс перестроен, постов: {indexed}'
+        ))
+
+    def prepare(self):
+        '''
+        Новый индекс с триггерами: правки уже проиндексированных постов
+        сразу попадают и в него, остальные посты добавят следующие пачки
+        '''
+        with transaction.atomic(), connection.cursor() as cursor:
+            self.drop_new(cursor)
+            cursor.execute(search_table_sql(NEW_TABLE))
+            cursor.execute(f'CREATE TABLE {PROGRESS_TABLE} (last_id integer)')
+            cursor.execute(f'INSERT INTO {PROGRESS_TABLE} VALUES (0)')
+            for statement in search_triggers_sql(NEW_TABLE, PROGRESS_QUERY):
+                cursor.execute(statement)
+
+    def index_batch(self, last_pk, batch_size):
+        '''Пачка постов с id после last_pk: (число постов, последний id)'''
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT count(*), max(id) FROM ('
+                ' SELECT id FROM posts_post WHERE id > %s'
+                ' ORDER BY id LIMIT %s)',
+                [last_pk, batch_size]
+            )
+            count, batch_last_pk = cursor.fetchone()
+            if not count:
+                return 0, last_pk
+            cursor.execute(
+                f'INSERT INTO {NEW_TABLE}(rowid, title, text) '
+                f'SELECT id, title, text FROM posts_post '
+                f'WHERE id > %s AND id <= %s',
+                [last_pk, batch_last_pk]
+            )
+            cursor.execute(
+                f'UPDATE {PROGRESS_TABLE} SET last_id = %s', [batch_last_pk]
+            )
+        return count, batch_last_pk
+
+    def swap(self, last_pk):
+        '''
+        Одной короткой транзакцией дописывает посты, созданные после
+        последней пачки, и ставит новый индекс на место старого
+        '''
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT count(*) FROM posts_post WHERE id > %s', [last_pk]
+            )
+            added, = cursor.fetchone()
+            cursor.execute(
+                f'INSERT INTO {NEW_TABLE}(rowid, title, text) '
+                f'SELECT id, title, text FROM posts_post WHERE id > %s',
+                [last_pk]
+            )
+            self.drop_new(cursor, keep_table=True)
+            for event in TRIGGER_EVENTS:
+                cursor.execute(
+                    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{event}'
+                )
+            cursor.execute(f'DROP TABLE {SEARCH_TABLE}')
+            cursor.execute(f'ALTER TABLE {NEW_TABLE} RENAME TO {SEARCH_TABLE}')
+            for statement in search_triggers_sql():
+                cursor.execute(statement)
+        return added
+
+    def merge(self):
+        '''
+        Сливает сегменты индекса небольшими шагами вместо 'optimize':
+        каждый шаг - отдельная короткая транзакция. Первый шаг
+        с отрицательным числом страниц начинает полное слияние, шаг,
+        изменивший меньше двух строк, означает, что сливать больше нечего.
+        '''
+        pages = -MERGE_PAGES
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                before = connection.connection.total_changes
+                cursor.execute(
+                    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) "
+                    f"VALUES ('merge', %s)",
+                    [pages]
+                )
+                if connection.connection.total_changes - before < 2:
+                    return
+            pages = MERGE_PAGES
+
+    def drop_new(self, cursor, keep_table=False):
+        '''Убирает триггеры и таблицы новой сборки, в том числе прерванной'''
+        for event in TRIGGER_EVENTS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {NEW_TABLE}_{event}')
+        cursor.execute(f'DROP TABLE IF EXISTS {PROGRESS_TABLE}')
+        if not keep_table:
+            cursor.execute(f'DROP TABLE IF EXISTS {NEW_TABLE}')
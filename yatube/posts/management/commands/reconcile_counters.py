@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Post
+
+
+def count_subquery(queryset, field):
+    '''Подзапрос COUNT по связанной таблице для каждого поста'''
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет Post.like_count и Post.comment_count с реальными данными '
+        'и исправляет расхождения пачками'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество постов, обрабатываемых за одну транзакцию'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        likes = Post.liked.through.objects.all()
+        comments = Comment.objects.all()
+        last_pk = 0
+        checked = fixed = 0
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    Post.objects.filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .annotate(
+                        real_likes=count_subquery(likes, 'post'),
+                        real_comments=count_subquery(comments, 'post')
+                    )
+                    .only('pk', 'like_count', 'comment_count')[:batch_size]
+                )
+                if not batch:
+                    break
+                drifted = []
+                for post in batch:
+                    if (post.like_count != post.real_likes
+                            or post.comment_count != post.real_comments):
+                        post.like_count = post.real_likes
+                        post.comment_count = post.real_comments
+                        drifted.append(post)
+                Post.objects.bulk_update(
+                    drifted, ['like_count', 'comment_count']
+                )
+            checked += len(batch)
+            fixed += len(drifted)
+            last_pk = batch[-1].pk
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено постов: {checked}, исправлено: {fixed}'
+        ))
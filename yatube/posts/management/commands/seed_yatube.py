@@ -0,0 +1,363 @@
+import os
+import random
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta, timezone
+from multiprocessing import Pool
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts.feed_inbox import backfill_inbox
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+WORDS = (
+    'лето город море книга утро ветер дорога песня окно сад река друг '
+    'дом свет поезд осень зима весна небо лес кофе кот собака работа '
+    'история вечер дождь снег солнце музыка фильм письмо мост остров '
+    'гора поле звезда путь встреча рассказ мечта память вопрос ответ'
+).split()
+
+# Параметры генерации, общие для всех процессов пула
+_config = {}
+
+
+def _init_worker(config):
+    _config.update(config)
+    # Соединение родителя нельзя делить с дочерним процессом
+    connections.close_all()
+
+
+def power_law_index(rng, n, alpha):
+    '''
+    Индекс 0..n-1, выпадающий с вероятностью ~ 1 / (индекс + 1) ** alpha:
+    немногие популярные авторы и посты собирают большую часть
+    подписчиков, лайков и комментариев
+    '''
+    u = rng.random()
+    if alpha == 1:
+        x = (n + 1) ** u
+    else:
+        x = (((n + 1) ** (1 - alpha) - 1) * u + 1) ** (1 / (1 - alpha))
+    return min(int(x) - 1, n - 1)
+
+
+def sentence(rng, low, high):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def post_timestamp(index):
+    '''Посты равномерно распределены по периоду, новые - с большими id'''
+    span = _config['until'] - _config['since']
+    return _config['since'] + span * (index + 0.5) / _config['posts']
+
+
+def _generate(task):
+    '''
+    Строки одной пачки в виде кортежей индексов и значений.
+    Генератор пачки зависит только от seed, таблицы и номера пачки,
+    поэтому результат не зависит от числа процессов.
+    '''
+    kind, number, start, count = task
+    rng = random.Random(f'{_config["seed"]}:{kind}:{number}')
+    users, posts = _config['users'], _config['posts']
+    alpha = _config['alpha']
+    rows = []
+    if kind == 'users':
+        for index in range(start, start + count):
+            rows.append((f'{_config["prefix"]}{index}',))
+    elif kind == 'posts':
+        for index in range(start, start + count):
+            group = -1
+            if _config['groups'] and rng.random() < 0.6:
+                group = power_law_index(rng, _config['groups'], alpha)
+            rows.append((
+                power_law_index(rng, users, alpha),
+                group,
+                sentence(rng, 2, 8).capitalize(),
+                sentence(rng, 10, 120).capitalize(),
+                post_timestamp(index),
+            ))
+    elif kind == 'comments':
+        for _ in range(count):
+            post = posts - 1 - power_law_index(rng, posts, alpha)
+            rows.append((
+                post,
+                rng.randrange(users),
+                sentence(rng, 3, 30).capitalize(),
+                min(
+                    post_timestamp(post) + rng.expovariate(1 / 86400),
+                    _config['until']
+                ),
+            ))
+    elif kind == 'follows':
+        for _ in range(count):
+            user = rng.randrange(users)
+            author = power_law_index(rng, users, alpha)
+            if user != author:
+                rows.append((user, author))
+    elif kind == 'likes':
+        for _ in range(count):
+            rows.append((
+                rng.randrange(users),
+                posts - 1 - power_law_index(rng, posts, alpha),
+            ))
+    return rows
+
+
+def iter_tasks(kind, total, batch_size):
+    for number, start in enumerate(range(0, total, batch_size)):
+        yield kind, number, start, min(batch_size, total - start)
+
+
+def iter_batches(pool, tasks, window):
+    '''
+    Пачки по порядку; в работе одновременно не больше window пачек,
+    так что память не растет, даже если запись медленнее генерации
+    '''
+    if pool is None:
+        yield from map(_generate, tasks)
+        return
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(_generate, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+@contextmanager
+def explicit_created(*models):
+    '''Позволяет записать собственные даты создания в bulk_create'''
+    fields = [model._meta.get_field('created') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def pk_array(queryset):
+    '''id строк по порядку вставки в компактном массиве'''
+    pks = array('q')
+    last = 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last).order_by('pk')
+            .values_list('pk', flat=True)[:100_000]
+        )
+        if not batch:
+            return pks
+        pks.extend(batch)
+        last = batch[-1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями, подписками и лайками для нагрузочного '
+        'тестирования. Подписчики, лайки и комментарии распределены '
+        'по степенному закону; один и тот же --seed дает те же данные.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in (
+            ('users', 10_000),
+            ('groups', 200),
+            ('posts', 100_000),
+            ('comments', 300_000),
+            ('follows', 200_000),
+            ('likes', 1_000_000),
+        ):
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'Сколько создать (по умолчанию {default})'
+            )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного распределения популярности'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до --until распределить посты'
+        )
+        parser.add_argument(
+            '--until', default=None,
+            help='Дата последнего поста, ГГГГ-ММ-ДД (по умолчанию сегодня)'
+        )
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс имен пользователей и адресов групп'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Количество процессов генерации; 1 - без пула'
+        )
+        parser.add_argument(
+            '--with-feed', action='store_true',
+            help='Заполнить ленты подписок (долго на больших объемах)'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['posts'] < 1:
+            raise CommandError('Нужны хотя бы два пользователя и один пост')
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом "{prefix}" уже есть, '
+                'укажите другой --prefix'
+            )
+        until = (
+            datetime.strptime(options['until'], '%Y-%m-%d').date()
+            if options['until'] else datetime.now(timezone.utc).date()
+        )
+        until = datetime.combine(until, time(), tzinfo=timezone.utc)
+        config = {
+            'seed': options['seed'],
+            'alpha': options['alpha'],
+            'prefix': prefix,
+            'users': options['users'],
+            'groups': options['groups'],
+            'posts': options['posts'],
+            'until': until.timestamp(),
+            'since': (until - timedelta(days=options['days'])).timestamp(),
+        }
+        self.batch_size = options['batch_size']
+        workers = options['workers']
+        _config.update(config)
+        if workers > 1:
+            connections.close_all()
+            self.pool = Pool(workers, _init_worker, (config,))
+            self.window = workers * 2
+        else:
+            self.pool = None
+        try:
+            with explicit_created(Post, Comment, Group):
+                self.seed(options)
+        finally:
+            if self.pool is not None:
+                self.pool.terminate()
+                self.pool.join()
+        self.stdout.write('Пересчет счетчиков и статистики авторов')
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_author_stats', stdout=self.stdout)
+        if options['with_feed']:
+            self.fill_feed()
+        self.stdout.write(self.style.SUCCESS('Готово'))
+
+    def batches(self, kind, total):
+        return iter_batches(
+            self.pool, iter_tasks(kind, total, self.batch_size),
+            getattr(self, 'window', 1)
+        )
+
+    def insert(self, kind, total, build, model):
+        # Повторы подписок и лайков пропускаются ignore_conflicts,
+        # поэтому созданные строки считаются по таблице, а не по пачкам
+        before = model.objects.count()
+        generated = 0
+        for rows in self.batches(kind, total):
+            # Размер отдельного INSERT выбирает бэкенд (лимит параметров
+            # SQLite), вся пачка пишется в одной транзакции
+            model.objects.bulk_create(
+                [build(row) for row in rows],
+                ignore_conflicts=kind in ('follows', 'likes')
+            )
+            generated += len(rows)
+            created = model.objects.count() - before
+            self.stdout.write(
+                f'{kind}: {created} из {total}'
+                f' (пропущено повторов: {generated - created})'
+            )
+
+    def seed(self, options):
+        prefix = options['prefix']
+        # Пароль у всех один и непригодный для входа, хеш считается однажды
+        password = make_password(None)
+        self.insert(
+            'users', options['users'],
+            lambda row: User(username=row[0], password=password),
+            User
+        )
+        users = pk_array(User.objects.filter(username__startswith=prefix))
+
+        rng = random.Random(f'{options["seed"]}:groups')
+        since = datetime.fromtimestamp(_config['since'], timezone.utc)
+        Group.objects.bulk_create(
+            Group(
+                title=f'{sentence(rng, 1, 3).capitalize()} {prefix}{index}',
+                slug=f'{prefix}-{index}',
+                description=sentence(rng, 5, 20).capitalize(),
+                creator_id=users[rng.randrange(len(users))],
+                created=since
+            )
+            for index in range(options['groups'])
+        )
+        groups = pk_array(Group.objects.filter(slug__startswith=f'{prefix}-'))
+
+        def stamp(timestamp):
+            return datetime.fromtimestamp(timestamp, timezone.utc)
+
+        self.insert(
+            'posts', options['posts'],
+            lambda row: Post(
+                author_id=users[row[0]],
+                group_id=groups[row[1]] if row[1] >= 0 else None,
+                title=row[2],
+                text=row[3],
+                created=stamp(row[4])
+            ),
+            Post
+        )
+        posts = pk_array(Post.objects.filter(author_id__gte=users[0]))
+        if len(posts) != options['posts']:
+            raise CommandError('Не удалось сопоставить созданные посты')
+
+        self.insert(
+            'comments', options['comments'],
+            lambda row: Comment(
+                post_id=posts[row[0]],
+                author_id=users[row[1]],
+                text=row[2],
+                created=stamp(row[3])
+            ),
+            Comment
+        )
+        self.insert(
+            'follows', options['follows'],
+            lambda row: Follow(user_id=users[row[0]], author_id=users[row[1]]),
+            Follow
+        )
+        likes = Post.liked.through
+        self.insert(
+            'likes', options['likes'],
+            lambda row: likes(user_id=users[row[0]], post_id=posts[row[1]]),
+            likes
+        )
+
+    def fill_feed(self):
+        follows = Follow.objects.order_by('pk').values_list(
+            'pk', 'user_id', 'author_id'
+        )
+        last = 0
+        filled = 0
+        while True:
+            batch = list(follows.filter(pk__gt=last)[:self.batch_size])
+            if not batch:
+                break
+            for _, user_id, author_id in batch:
+                backfill_inbox(user_id, author_id)
+            filled += len(batch)
+            last = batch[-1][0]
+            self.stdout.write(f'feed: {filled}')
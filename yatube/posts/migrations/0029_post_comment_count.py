@@ -0,0 +1,44 @@
+# Generated by Django 2.2.19 on 2026-10-18 19:41
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+
+    def total(queryset):
+        return Coalesce(
+            Subquery(
+                queryset.filter(post=OuterRef('pk'))
+                .order_by()
+                .values('post')
+                .annotate(total=Count('pk'))
+                .values('total'),
+                output_field=IntegerField()
+            ),
+            0
+        )
+
+    Post.objects.update(
+        like_count=total(Post.liked.through.objects.all()),
+        comment_count=total(Comment.objects.all())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0028_auto_20220904_2353'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.BigIntegerField(default=0, help_text='Счетчик комментариев', verbose_name='Количество комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
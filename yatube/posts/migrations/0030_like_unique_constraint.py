@@ -0,0 +1,29 @@
+# Generated by Django 2.2.19 on 2026-10-18 19:42
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_likes(apps, schema_editor):
+    Like = apps.get_model('posts', 'Like')
+    latest = (
+        Like.objects.values('user', 'post')
+        .annotate(last_pk=Max('pk'))
+        .values_list('last_pk', flat=True)
+    )
+    Like.objects.exclude(pk__in=list(latest)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0029_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='like',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_like'),
+        ),
+    ]
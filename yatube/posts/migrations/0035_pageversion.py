@@ -0,0 +1,24 @@
+# Generated by Django 2.2.19 on 2026-10-18 21:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0034_feed_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageVersion',
+            fields=[
+                ('key', models.CharField(max_length=200, primary_key=True, serialize=False, verbose_name='Ключ страниц')),
+                ('modified', models.DateTimeField(verbose_name='Изменено')),
+            ],
+            options={
+                'verbose_name': 'Версия страниц',
+                'verbose_name_plural': 'Версии страниц',
+            },
+        ),
+    ]
@@ -0,0 +1,135 @@
+import time
+
+from django.template.response import SimpleTemplateResponse
+from django.utils.cache import get_conditional_response
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date
+
+from core.db_router import read_from_primary, reads_from_replica
+from .models import Post
+from .page_cache import (
+    cache_response, get_cached_response, is_cacheable_request, page_validators
+)
+
+
+class LikedPostsMixin:
+    '''
+    Отмечает посты страницы, лайкнутые текущим пользователем.
+    Вместо проверки post.liked.all для каждой карточки выполняется
+    один запрос с IN по id постов страницы.
+    При defer_liked_posts посты не размечаются, а в контекст кладется
+    ленивое множество liked_post_ids: его читает только некэшируемая
+    часть шаблона.
+    '''
+    defer_liked_posts = False
+
+    def get_liked_post_ids(self, posts):
+        user = self.request.user
+        if not user.is_authenticated or not posts:
+            return set()
+        return set(
+            Post.liked.through.objects.filter(
+                user_id=user.pk,
+                post_id__in=[post.pk for post in posts]
+            ).values_list('post_id', flat=True)
+        )
+
+    def mark_liked_posts(self, posts):
+        liked_ids = self.get_liked_post_ids(posts)
+        for post in posts:
+            post.is_liked = post.pk in liked_ids
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if context.get('page_obj') is not None:
+            posts = context['page_obj']
+        elif context.get('object') is not None:
+            posts = [context['object']]
+        else:
+            return context
+        if self.defer_liked_posts:
+            context['liked_post_ids'] = SimpleLazyObject(
+                lambda: self.get_liked_post_ids(list(posts))
+            )
+        else:
+            self.mark_liked_posts(list(posts))
+        return context
+
+
+class CachedObjectMixin:
+    '''
+    Загружает объект представления один раз за запрос.
+    Повторные вызовы get_object() из test_func, get() и post()
+    возвращают уже загруженный экземпляр.
+    '''
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_cached_object'):
+            self._cached_object = super().get_object()
+        return self._cached_object
+
+
+class AnonymousPageCacheMixin:
+    '''
+    Отдает анонимным читателям готовую страницу целиком, минуя ORM,
+    контекст-процессоры и шаблоны.
+    Страница помечается ключами get_surrogate_keys(), запись в данные
+    сбрасывает ровно эти ключи (см. posts/signals.py).
+    Ключи вычисляются до обработки запроса, по URL; None - не кэшировать.
+    '''
+    def get_surrogate_keys(self):
+        return None
+
+    def dispatch(self, request, *args, **kwargs):
+        if not is_cacheable_request(request):
+            return super().dispatch(request, *args, **kwargs)
+        response = get_cached_response(request)
+        if response is not None:
+            return response
+        keys = self.get_surrogate_keys()
+        if keys:
+            # Страница заполняет кэш только из основной базы: отстающая
+            # реплика сохранила бы под новыми версиями ключей старые данные
+            read_from_primary()
+        response = super().dispatch(request, *args, **kwargs)
+        if keys and isinstance(response, SimpleTemplateResponse):
+            response.add_post_render_callback(
+                lambda rendered: cache_response(request, rendered, keys)
+            )
+        return response
+
+
+class ConditionalGetMixin:
+    '''
+    Отвечает 304 Not Modified на If-None-Match и If-Modified-Since
+    до выборки постов и отрисовки шаблона.
+    Валидаторы строятся по версиям ключей get_surrogate_keys() в базе:
+    версия меняется при каждой записи, которая сбрасывает страницу.
+    Last-Modified отдается, только когда секунда последней версии
+    закончилась: иначе запись в ту же секунду не изменила бы его.
+    Страница, прочитанная из реплики, уходит без валидаторов: версия
+    могла смениться раньше, чем реплика получила запись.
+    '''
+    def get_surrogate_keys(self):
+        return None
+
+    def dispatch(self, request, *args, **kwargs):
+        keys = None
+        if (request.method in ('GET', 'HEAD')
+                and 'messages' not in request.COOKIES):
+            keys = self.get_surrogate_keys()
+        if not keys:
+            return super().dispatch(request, *args, **kwargs)
+        etag, last_modified = page_validators(request, keys)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200 or reads_from_replica():
+                return response
+        response['ETag'] = etag
+        if last_modified is not None and int(time.time()) > last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
@@ -50,10 +52,26 @@ class Post(CreatedModel):
         default='0',
         help_text='Счетчик лайков'
         )
+    comment_count = models.BigIntegerField(
+        'Количество комментариев',
+        default=0,
+        help_text='Счетчик комментариев'
+    )
 
 
     class Meta:
         ordering = ['-created']
+        # Ленты группы и автора: фильтр и порядок ленты по одному индексу
+        indexes = [
+            models.Index(
+                fields=['group', '-created', '-id'],
+                name='post_group_created'
+            ),
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='post_author_created'
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -133,6 +151,12 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created'
+            ),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -186,6 +210,168 @@ class Like(models.Model):
     value = models.CharField(choices=LIKE_CHOICES, max_length=8)
     updated = models.DateTimeField(auto_now=True)
     created = models.DateTimeField(auto_now_add=True)
-    
+
+    class Meta:
+        constraints = [
+            # Один пользователь - одна запись о лайке поста
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_like'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}-{self.post}-{self.value}'
+
+def count_for_user(queryset, field):
+    '''Подзапрос COUNT строк queryset, где field ссылается на пользователя'''
+    return Coalesce(
+        models.Subquery(
+            queryset.filter(**{field: models.OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=models.Count('pk'))
+            .values('total'),
+            output_field=models.IntegerField()
+        ),
+        0
+    )
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.IntegerField('Постов', default=0)
+    followers_count = models.IntegerField('Подписчиков', default=0)
+    following_count = models.IntegerField('Подписок', default=0)
+    likes_received = models.IntegerField('Получено лайков', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'Статистика {self.user_id}'
+
+    @classmethod
+    def bump(cls, user_id, **deltas):
+        '''
+        Атомарно меняет счетчики пользователя на deltas.
+        Если строки нет, она собирается по реальным данным после коммита:
+        к этому моменту они включают текущее изменение, а строка
+        удаленного пользователя не будет создана заново.
+        '''
+        updated = cls.objects.filter(user_id=user_id).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+        if not updated:
+            transaction.on_commit(lambda: cls.rebuild([user_id]))
+
+    @classmethod
+    def rebuild(cls, user_ids):
+        '''
+        Пересчитывает статистику пользователей по реальным данным.
+        Подсчет идет внутри транзакции после удаления строк: удаление
+        берет блокировку записи, и bump(), пришедший во время пересчета,
+        ждет фиксации, а не теряется между подсчетом и записью.
+        '''
+        with transaction.atomic():
+            cls.objects.filter(user_id__in=user_ids).delete()
+            users = User.objects.filter(pk__in=user_ids).annotate(
+                real_posts=count_for_user(Post.objects.all(), 'author'),
+                real_followers=count_for_user(Follow.objects.all(), 'author'),
+                real_following=count_for_user(Follow.objects.all(), 'user'),
+                real_likes=count_for_user(
+                    Post.liked.through.objects.all(), 'post__author'
+                )
+            ).values_list(
+                'pk', 'real_posts', 'real_followers', 'real_following',
+                'real_likes'
+            )
+            stats = [
+                cls(
+                    user_id=pk,
+                    posts_count=posts,
+                    followers_count=followers,
+                    following_count=following,
+                    likes_received=likes
+                )
+                for pk, posts, followers, following, likes in users
+            ]
+            cls.objects.bulk_create(stats)
+        return len(stats)
+
+
+class FeedEntry(models.Model):
+    '''
+    Строка ленты подписок: пост автора, разосланный подписчику при записи.
+    created копирует дату поста, чтобы лента читалась по индексу
+    (user, created, post) без соединения с постами.
+    '''
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        db_index=False,
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False,
+        verbose_name='Автор'
+    )
+    created = models.DateTimeField('Дата поста')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created', '-post'],
+                name='feed_entry_user_created'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_entry_user_author'
+            ),
+            models.Index(fields=['author'], name='feed_entry_author')
+        ]
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class PageVersion(models.Model):
+    '''
+    Версия группы страниц (ключа страниц, см. posts/page_cache.py):
+    время последней записи, которая их меняет. Хранится в базе, чтобы
+    сброс был виден всем процессам; по ней строятся ETag и Last-Modified.
+    '''
+    key = models.CharField('Ключ страниц', max_length=200, primary_key=True)
+    modified = models.DateTimeField('Изменено')
+
+    class Meta:
+        verbose_name = 'Версия страниц'
+        verbose_name_plural = 'Версии страниц'
+
     def __str__(self):
-        return f'{self.user}-{self.post}-{self.value}'
\ No newline at end of file
+        return f'{self.key}: {self.modified}'
@@ -0,0 +1,158 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.http import quote_etag
+
+from .models import PageVersion, Post
+
+PAGE_KEY_PREFIX = 'posts:page'
+SURROGATE_KEY_PREFIX = 'posts:surrogate'
+
+
+def page_cache_key(request):
+    url = request.build_absolute_uri().encode()
+    return f'{PAGE_KEY_PREFIX}:{request.method}:{hashlib.md5(url).hexdigest()}'
+
+
+def surrogate_cache_key(key):
+    return f'{SURROGATE_KEY_PREFIX}:{key}'
+
+
+def post_surrogate_keys(post_id, username, group_slug=None):
+    '''Ключи страниц, на которых виден пост, кроме главной'''
+    keys = [f'post:{post_id}', f'author:{username}']
+    if group_slug:
+        keys.append(f'group:{group_slug}')
+    return keys
+
+
+def surrogate_versions(keys):
+    '''
+    Версии ключей: время их последнего сброса.
+    Ключ без версии получает текущее время, так что после вытеснения
+    из кэша страница считается измененной, а не наоборот.
+    '''
+    cache_keys = [surrogate_cache_key(key) for key in keys]
+    versions = cache.get_many(cache_keys)
+    missing = [key for key in cache_keys if key not in versions]
+    if missing:
+        now = time.time()
+        for cache_key in missing:
+            cache.add(cache_key, now, None)
+        versions = cache.get_many(cache_keys)
+        if len(versions) != len(cache_keys):
+            return None
+    return versions
+
+
+def page_versions(keys):
+    '''
+    Время последнего изменения ключей по основной базе: реплика может
+    отставать от уже сделанного сброса. Ключа без строки не касалась
+    ни одна запись с появления таблицы версий.
+    '''
+    return dict(
+        PageVersion.objects.using(DEFAULT_DB_ALIAS)
+        .filter(key__in=list(keys)).values_list('key', 'modified')
+    )
+
+
+def bump_page_versions(keys):
+    '''Отмечает изменение страниц с ключами keys'''
+    keys = set(keys)
+    now = timezone.now()
+    updated = PageVersion.objects.filter(key__in=keys).update(modified=now)
+    if updated < len(keys):
+        PageVersion.objects.bulk_create(
+            [PageVersion(key=key, modified=now) for key in keys],
+            ignore_conflicts=True
+        )
+
+
+def page_validators(request, keys):
+    '''
+    ETag и Last-Modified (в секундах) страницы по версиям ее ключей.
+    В ETag входят адрес с параметрами (?page=, ?cursor=) и пользователь:
+    у каждого своя шапка и отметки лайков. Last-Modified равен None,
+    если ни один ключ еще не менялся.
+    '''
+    versions = page_versions(keys)
+    payload = repr((
+        request.get_full_path(), request.user.pk,
+        sorted((key, value.isoformat()) for key, value in versions.items())
+    ))
+    etag = quote_etag(hashlib.md5(payload.encode()).hexdigest())
+    if not versions:
+        return etag, None
+    return etag, int(max(versions.values()).timestamp())
+
+
+def is_cacheable_request(request):
+    '''
+    В кэш попадают только GET анонимных читателей без ожидающих
+    flash-сообщений: остальным нужна персональная страница
+    '''
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and 'messages' not in request.COOKIES
+    )
+
+
+def get_cached_response(request):
+    '''
+    Готовый ответ из кэша, если ни один из его ключей не сбрасывался.
+    Версия ключа запоминается вместе со страницей; сброс удаляет версию,
+    и все страницы с этим ключом перестают совпадать.
+    '''
+    entry = cache.get(page_cache_key(request))
+    if entry is None:
+        return None
+    versions, content, headers = entry
+    if cache.get_many(list(versions)) != versions:
+        return None
+    response = HttpResponse(content)
+    for header, value in headers:
+        response[header] = value
+    response['X-Page-Cache'] = 'HIT'
+    return response
+
+
+def cache_response(request, response, keys):
+    '''Сохраняет отрисованный ответ вместе с версиями его ключей'''
+    if (response.status_code != 200 or response.cookies
+            or request.META.get('CSRF_COOKIE_USED')):
+        return
+    versions = surrogate_versions(keys)
+    if versions is None:
+        return
+    response['Surrogate-Key'] = ' '.join(keys)
+    cache.set(
+        page_cache_key(request),
+        (versions, response.content, list(response.items())),
+        settings.PAGE_CACHE_TIMEOUT
+    )
+    response['X-Page-Cache'] = 'MISS'
+
+
+def purge_surrogate_keys(keys):
+    '''Сбрасывает все закэшированные страницы с любым из ключей'''
+    keys = set(keys)
+    cache.delete_many([surrogate_cache_key(key) for key in keys])
+    bump_page_versions(keys)
+
+
+def purge_posts(post_ids):
+    '''Сбрасывает страницы существующих постов по их id'''
+    rows = Post.objects.filter(pk__in=list(post_ids)).values_list(
+        'pk', 'author__username', 'group__slug'
+    )
+    keys = ['index']
+    for row in rows:
+        keys.extend(post_surrogate_keys(*row))
+    purge_surrogate_keys(keys)
@@ -0,0 +1,131 @@
+import re
+
+from django.db import connection
+
+from .models import Post
+
+SEARCH_TABLE = 'posts_post_fts'
+TRIGGER_EVENTS = ('insert', 'delete', 'update')
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def search_table_sql(table=SEARCH_TABLE):
+    '''Индекс FTS5 поверх posts_post: текст хранится только в постах'''
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+        f"title, text, content='posts_post', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')"
+    )
+
+
+def search_triggers_sql(table=SEARCH_TABLE, indexed_up_to=None):
+    '''
+    Триггеры posts_post, поддерживающие индекс table. indexed_up_to -
+    подзапрос с наибольшим проиндексированным id: строки за ним триггеры
+    не трогают, их добавит перестройка индекса.
+    '''
+    def when(row):
+        if indexed_up_to is None:
+            return ''
+        return f'WHEN {row}.id <= ({indexed_up_to}) '
+
+    delete = (
+        f"INSERT INTO {table}({table}, rowid, title, text) "
+        f"VALUES ('delete', old.id, old.title, old.text);"
+    )
+    insert = (
+        f"INSERT INTO {table}(rowid, title, text) "
+        f"VALUES (new.id, new.title, new.text);"
+    )
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS {table}_insert "
+        f"AFTER INSERT ON posts_post {when('new')}BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_delete "
+        f"AFTER DELETE ON posts_post {when('old')}BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_update "
+        f"AFTER UPDATE OF title, text ON posts_post "
+        f"{when('old')}BEGIN {delete} {insert} END",
+    )
+
+
+def missing_search_triggers(cursor, table=SEARCH_TABLE):
+    '''
+    Триггеры индекса, которых нет в базе. Пустой список и для базы
+    без индекса: миграция с ним еще не применена.
+    '''
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+        [table]
+    )
+    if cursor.fetchone() is None:
+        return []
+    cursor.execute(
+        "SELECT name FROM sqlite_master "
+        "WHERE type = 'trigger' AND tbl_name = 'posts_post'"
+    )
+    names = {name for name, in cursor.fetchall()}
+    return [
+        f'{table}_{event}' for event in TRIGGER_EVENTS
+        if f'{table}_{event}' not in names
+    ]
+
+
+def ensure_search_triggers(using_connection=connection):
+    '''
+    Восстанавливает триггеры индекса. SQLite пересоздает таблицу при
+    изменении полей Post в миграции, и триггеры пропадают вместе со
+    старой таблицей; пропущенные за это время изменения восполняет
+    перестройка индекса. Возвращает имена восстановленных триггеров.
+    '''
+    if using_connection.vendor != 'sqlite':
+        return []
+    with using_connection.cursor() as cursor:
+        missing = missing_search_triggers(cursor)
+        if missing:
+            for statement in search_triggers_sql():
+                cursor.execute(statement)
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) "
+                f"VALUES ('rebuild')"
+            )
+    return missing
+
+
+def build_match_query(query):
+    '''
+    Превращает пользовательский ввод в безопасное выражение MATCH:
+    каждое слово берется в кавычки, последнее ищется по префиксу.
+    '''
+    words = re.findall(r'\w+', query)
+    if not words:
+        return ''
+    terms = ['"%s"' % word for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_posts(query, queryset=None):
+    '''
+    Посты, подходящие под запрос, упорядоченные по релевантности (bm25).
+    Без FTS5 (не SQLite) используется обычный поиск по вхождению.
+    '''
+    if queryset is None:
+        queryset = Post.objects.all()
+    match = build_match_query(query)
+    if not match:
+        return queryset.none()
+    if not fts_available():
+        return queryset.filter(text__icontains=query)
+    return queryset.extra(
+        tables=[SEARCH_TABLE],
+        where=[
+            f'{SEARCH_TABLE}.rowid = posts_post.id',
+            f'{SEARCH_TABLE} MATCH %s',
+        ],
+        params=[match],
+        select={'rank': f'{SEARCH_TABLE}.rank'},
+        order_by=['rank', '-created'],
+    )
@@ -0,0 +1,280 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from core.context_processors.groups_all import invalidate_groups_directory
+from .feed_cache import bump_feed_generation
+from .feed_inbox import (
+    backfill_inbox, schedule_fan_out, schedule_refill, trim_inbox
+)
+from .live import publish_counts
+from .page_cache import post_surrogate_keys, purge_posts, purge_surrogate_keys
+from .search import ensure_search_triggers
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_feed(sender, **kwargs):
+    '''Сбрасывает кэш ленты после изменения постов и комментариев'''
+    transaction.on_commit(bump_feed_generation)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_groups(sender, **kwargs):
+    '''Сбрасывает кэш справочника групп в меню ленты'''
+    transaction.on_commit(invalidate_groups_directory)
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    '''Увеличивает счетчик комментариев поста'''
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F('comment_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    '''Уменьшает счетчик комментариев поста'''
+    Post.objects.filter(pk=instance.post_id).update(
+        comment_count=F('comment_count') - 1
+    )
+
+
+@receiver(m2m_changed, sender=Post.liked.through)
+def update_like_count(sender, instance, action, reverse, pk_set, **kwargs):
+    '''
+    Поддерживает Post.like_count и AuthorStats.likes_received
+    при изменении Post.liked с любой стороны.
+    При удалении pk_set не фильтруется Django по существующим связям,
+    поэтому реально удаляемые лайки запоминаются до удаления.
+    '''
+    if action in ('pre_remove', 'pre_clear'):
+        if reverse:
+            links = sender.objects.filter(user_id=instance.pk)
+            if pk_set is not None:
+                links = links.filter(post_id__in=pk_set)
+        else:
+            links = sender.objects.filter(post_id=instance.pk)
+            if pk_set is not None:
+                links = links.filter(user_id__in=pk_set)
+        instance._unliked_post_ids = list(
+            links.values_list('post_id', flat=True)
+        )
+        return
+    if action == 'post_add':
+        post_ids = list(pk_set) if reverse else [instance.pk] * len(pk_set)
+        sign = 1
+    elif action in ('post_remove', 'post_clear'):
+        post_ids = instance.__dict__.pop('_unliked_post_ids', [])
+        sign = -1
+    else:
+        return
+    transaction.on_commit(bump_feed_generation)
+    if not post_ids:
+        return
+    if reverse:
+        Post.objects.filter(pk__in=post_ids).update(
+            like_count=F('like_count') + sign
+        )
+        authors = Counter(
+            Post.objects.filter(pk__in=post_ids)
+            .values_list('author_id', flat=True)
+        )
+    else:
+        Post.objects.filter(pk=instance.pk).update(
+            like_count=F('like_count') + sign * len(post_ids)
+        )
+        authors = {instance.author_id: len(post_ids)}
+    for author_id, total in authors.items():
+        AuthorStats.bump(author_id, likes_received=sign * total)
+    transaction.on_commit(lambda: purge_posts(post_ids))
+    if reverse:
+        transaction.on_commit(
+            lambda: publish_counts(set(post_ids), 'like_count', sign)
+        )
+    else:
+        transaction.on_commit(lambda: publish_counts(
+            [instance.pk], 'like_count', sign * len(post_ids)
+        ))
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, **kwargs):
+    '''Заводит пустую статистику новому пользователю'''
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def increment_posts_count(sender, instance, created, **kwargs):
+    '''Увеличивает счетчик постов автора'''
+    if created:
+        AuthorStats.bump(instance.author_id, posts_count=1)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_likes(sender, instance, **kwargs):
+    '''
+    Запоминает число лайков удаляемого поста: связи удаляются каскадом
+    без m2m_changed, а like_count в памяти может быть устаревшим
+    '''
+    instance._deleted_likes = Post.liked.through.objects.filter(
+        post_id=instance.pk
+    ).count()
+
+
+@receiver(post_delete, sender=Post)
+def decrement_posts_count(sender, instance, **kwargs):
+    '''Уменьшает счетчики автора при удалении поста вместе с лайками'''
+    AuthorStats.bump(
+        instance.author_id,
+        posts_count=-1,
+        likes_received=-instance.__dict__.pop('_deleted_likes', 0)
+    )
+
+
+@receiver(post_save, sender=Follow)
+def increment_follow_counts(sender, instance, created, **kwargs):
+    '''Увеличивает счетчики подписчика и автора'''
+    if created:
+        AuthorStats.bump(instance.user_id, following_count=1)
+        AuthorStats.bump(instance.author_id, followers_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def decrement_follow_counts(sender, instance, **kwargs):
+    '''Уменьшает счетчики подписчика и автора'''
+    AuthorStats.bump(instance.user_id, following_count=-1)
+    AuthorStats.bump(instance.author_id, followers_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    '''Раскладывает новый пост по лентам подписчиков после коммита'''
+    if created:
+        schedule_fan_out(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_follow_feed(sender, instance, created, **kwargs):
+    '''Добавляет посты автора в ленту нового подписчика'''
+    if created:
+        user_id, author_id = instance.user_id, instance.author_id
+        transaction.on_commit(lambda: backfill_inbox(user_id, author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def trim_follow_feed(sender, instance, **kwargs):
+    '''
+    Убирает посты автора из ленты отписавшегося. Если автор при этом
+    опустился ниже порога рассылки, ленты остальных подписчиков
+    дополняются его постами (счетчик уже уменьшен сигналом выше)
+    '''
+    trim_inbox(instance.user_id, instance.author_id)
+    schedule_refill(instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Group)
+def remember_old_group(sender, instance, **kwargs):
+    '''Запоминает прежнюю группу: ее страницу тоже нужно сбросить'''
+    if instance.pk is None:
+        return
+    field = 'group__slug' if sender is Post else 'slug'
+    instance._old_group_slug = sender.objects.filter(
+        pk=instance.pk
+    ).values_list(field, flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def purge_post_pages(sender, instance, **kwargs):
+    '''Сбрасывает закэшированные страницы, на которых виден пост'''
+    keys = post_surrogate_keys(
+        instance.pk,
+        instance.author.username,
+        instance.group.slug if instance.group_id else None
+    )
+    old_slug = instance.__dict__.pop('_old_group_slug', None)
+    if old_slug:
+        keys.append(f'group:{old_slug}')
+    # Число постов в меню групп есть на всех лентах
+    keys.extend(['index', 'groups'])
+    transaction.on_commit(lambda: purge_surrogate_keys(keys))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_comment_pages(sender, instance, **kwargs):
+    '''Сбрасывает страницы поста: изменились комментарии и их число'''
+    post_id = instance.post_id
+    transaction.on_commit(lambda: purge_posts([post_id]))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def purge_group_pages(sender, instance, **kwargs):
+    '''Сбрасывает страницу группы и меню групп на лентах'''
+    keys = [f'group:{instance.slug}', 'groups']
+    old_slug = instance.__dict__.pop('_old_group_slug', None)
+    if old_slug:
+        keys.append(f'group:{old_slug}')
+    transaction.on_commit(lambda: purge_surrogate_keys(keys))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def purge_follow_pages(sender, instance, **kwargs):
+    '''Сбрасывает профили обоих пользователей: изменились счетчики'''
+    user_ids = [instance.user_id, instance.author_id]
+
+    def purge():
+        usernames = User.objects.filter(pk__in=user_ids).values_list(
+            'username', flat=True
+        )
+        purge_surrogate_keys(f'author:{username}' for username in usernames)
+
+    transaction.on_commit(purge)
+
+
+@receiver(post_save, sender=Comment)
+def publish_comment_added(sender, instance, created, **kwargs):
+    '''Сообщает открытым страницам о новом комментарии'''
+    if created:
+        post_id = instance.post_id
+        transaction.on_commit(
+            lambda: publish_counts([post_id], 'comment_count', 1)
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def publish_comment_removed(sender, instance, **kwargs):
+    '''Сообщает открытым страницам об удалении комментария'''
+    post_id = instance.post_id
+    transaction.on_commit(
+        lambda: publish_counts([post_id], 'comment_count', -1)
+    )
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    '''
+    Возвращает триггеры полнотекстового индекса, если миграция
+    пересоздала таблицу постов (SQLite делает так при AlterField/AddField)
+    '''
+    if sender.name == 'posts' and using not in settings.DATABASE_REPLICAS:
+        ensure_search_triggers(connections[using])
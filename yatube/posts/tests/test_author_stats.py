@@ -0,0 +1,124 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts.models import AuthorStats, Follow, Post
+
+User = get_user_model()
+
+
+class AuthorStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def stats(self, user):
+        stats = AuthorStats.objects.get(user=user)
+        return (stats.posts_count, stats.followers_count,
+                stats.following_count, stats.likes_received)
+
+    def test_new_user_gets_empty_stats(self):
+        """У нового пользователя сразу есть нулевая статистика."""
+        self.assertEqual(self.stats(self.author), (0, 0, 0, 0))
+
+    def test_posts_update_posts_count(self):
+        """Создание и удаление поста меняют posts_count автора."""
+        post = Post.objects.create(
+            author=self.author, title='Пост', text='Текст'
+        )
+        Post.objects.create(author=self.author, title='Пост', text='Текст')
+        self.assertEqual(self.stats(self.author), (2, 0, 0, 0))
+        post.delete()
+        self.assertEqual(self.stats(self.author), (1, 0, 0, 0))
+
+    def test_follow_updates_both_sides(self):
+        """Подписка и отписка меняют счетчики обоих пользователей."""
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertEqual(self.stats(self.author), (0, 1, 0, 0))
+        self.assertEqual(self.stats(self.reader), (0, 0, 1, 0))
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertEqual(self.stats(self.author), (0, 0, 0, 0))
+        self.assertEqual(self.stats(self.reader), (0, 0, 0, 0))
+
+    def test_likes_update_likes_received(self):
+        """Лайки через view и через связь меняют likes_received автора."""
+        post = Post.objects.create(
+            author=self.author, title='Пост', text='Текст'
+        )
+        self.reader_client.post(
+            reverse('posts:like_unlike_post'), {'post_id': post.pk}
+        )
+        self.assertEqual(self.stats(self.author)[3], 1)
+        post.liked.add(self.author)
+        self.assertEqual(self.stats(self.author)[3], 2)
+        self.reader_client.post(
+            reverse('posts:like_unlike_post'), {'post_id': post.pk}
+        )
+        self.assertEqual(self.stats(self.author)[3], 1)
+        # Удаление поста забирает и его лайки
+        post.delete()
+        self.assertEqual(self.stats(self.author), (0, 0, 0, 0))
+
+    def test_pages_read_stats(self):
+        """Профиль и страница поста берут числа из статистики."""
+        post = Post.objects.create(
+            author=self.author, title='Пост', text='Текст'
+        )
+        AuthorStats.objects.filter(user=self.author).update(posts_count=17)
+        response = self.reader_client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertContains(response, 'всего постов: 17')
+        response = self.reader_client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        self.assertContains(response, '<span >17</span>')
+
+    def test_rebuild_author_stats_repairs_drift(self):
+        """Команда rebuild_author_stats пересчитывает статистику."""
+        post = Post.objects.create(
+            author=self.author, title='Пост', text='Текст'
+        )
+        post.liked.add(self.reader)
+        Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.filter(user=self.author).update(
+            posts_count=42, likes_received=-1
+        )
+        AuthorStats.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('rebuild_author_stats', batch_size=1, stdout=out)
+        self.assertIn('Пересчитана статистика пользователей: 2', out.getvalue())
+        self.assertEqual(self.stats(self.author), (1, 1, 0, 1))
+        self.assertEqual(self.stats(self.reader), (0, 0, 1, 0))
+
+
+class MissingAuthorStatsTests(TransactionTestCase):
+    def test_missing_row_is_rebuilt_after_commit(self):
+        """Отсутствующая строка собирается заново после коммита."""
+        author = User.objects.create_user(username='author')
+        AuthorStats.objects.filter(user=author).delete()
+        Post.objects.create(author=author, title='Пост', text='Текст')
+        stats = AuthorStats.objects.get(user=author)
+        self.assertEqual(stats.posts_count, 1)
+
+    def test_user_delete_does_not_resurrect_stats(self):
+        """Удаление пользователя с постами не оставляет его статистику."""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Post.objects.create(author=author, title='Пост', text='Текст')
+        Follow.objects.create(user=reader, author=author)
+        author.delete()
+        self.assertFalse(AuthorStats.objects.filter(user_id=author.pk).exists())
+        self.assertEqual(AuthorStats.objects.get(user=reader).following_count, 0)
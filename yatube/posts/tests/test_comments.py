@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post, Comment
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class PostCommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            title='Обсуждаемый пост',
+            text='Тестовый текст'
+        )
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f'Комментарий {i}')
+            for i in range(12)
+        )
+        cls.newest_first = list(
+            Comment.objects.order_by('-created', '-pk')
+            .values_list('text', flat=True)
+        )
+
+    def setUp(self):
+        # Анонимные страницы кэшируются целиком
+        cache.clear()
+        self.client = Client()
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+
+    def test_detail_shows_first_page_newest_first(self):
+        """Страница поста выводит только первую страницу комментариев."""
+        response = self.client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments], self.newest_first[:5]
+        )
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'load-more-comments')
+
+    def test_load_more_walks_all_comments(self):
+        """Фрагмент «Показать еще» отдает следующие страницы до конца."""
+        page = self.client.get(self.detail_url).context['comments']
+        texts = [comment.text for comment in page]
+        url = reverse('posts:comments', kwargs={'post_id': self.post.pk})
+        while page.has_next():
+            response = self.client.get(url, {'cursor': page.next_cursor})
+            self.assertTemplateUsed(
+                response, 'posts/includes/comment_list.html'
+            )
+            page = response.context['page_obj']
+            texts.extend(comment.text for comment in page)
+        self.assertEqual(texts, self.newest_first)
+        self.assertNotContains(response, 'load-more-comments')
+
+    def test_comments_of_missing_post_not_found(self):
+        """Фрагмент комментариев несуществующего поста отвечает 404."""
+        response = self.client.get(
+            reverse('posts:comments', kwargs={'post_id': self.post.pk + 1000})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_detail_queries_do_not_depend_on_comment_count(self):
+        """Число запросов страницы поста не растет с числом комментариев."""
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(self.detail_url)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.author, text='Еще')
+            for _ in range(50)
+        )
+        # В TestCase сброс страниц после коммита не срабатывает
+        cache.clear()
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(self.detail_url)
+        self.assertEqual(len(before), len(after))
+        self.assertEqual(len(response.context['comments']), 5)
@@ -0,0 +1,133 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Group, PageVersion, Post
+from posts.page_cache import bump_page_versions
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', creator=self.author
+        )
+        self.post = Post.objects.create(
+            author=self.author, title='Пост', text='Текст', group=self.group
+        )
+        self.guest = Client()
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:follow_index'),
+        )
+
+    def revalidate(self, client, url, response):
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def settle(self):
+        """Последние изменения случились раньше текущей секунды."""
+        PageVersion.objects.update(
+            modified=timezone.now() - timedelta(seconds=10)
+        )
+
+    def test_unchanged_pages_return_not_modified(self):
+        """Неизменившаяся страница отдает 304 без выборки постов."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.has_header('ETag'))
+                # Сессия, пользователь, версии ключей и, для поста, его ключи
+                with self.assertNumQueries(4 if 'posts/' in url else 3):
+                    again = self.revalidate(self.client, url, response)
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.content, b'')
+
+    def test_if_modified_since(self):
+        """If-Modified-Since сверяется со временем последней записи."""
+        self.settle()
+        url = reverse('posts:index')
+        response = self.guest.get(url)
+        modified = response['Last-Modified']
+        again = self.guest.get(url, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(again.status_code, 304)
+        Post.objects.create(author=self.author, title='Новый', text='Текст')
+        again = self.guest.get(url, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(again.status_code, 200)
+        self.assertContains(again, 'Новый')
+
+    def test_last_modified_waits_for_the_second_to_end(self):
+        """В секунду последней записи Last-Modified не отдается."""
+        response = self.guest.get(reverse('posts:index'))
+        self.assertTrue(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_versions_are_shared_through_database(self):
+        """Сброс, сделанный другим процессом, виден по версиям в базе."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        # Другой процесс записал пост: его кэш в этом процессе не сброшен
+        bump_page_versions(['index'])
+        self.assertEqual(
+            self.revalidate(self.client, url, response).status_code, 200
+        )
+
+    def test_etag_depends_on_query_string(self):
+        """Разные страницы одной ленты получают разные ETag."""
+        url = reverse('posts:index')
+        first = self.client.get(url)
+        second = self.client.get(url, {'page': 1})
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        response = self.client.get(
+            url, {'page': 1}, HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_writes_change_validators(self):
+        """Комментарий, лайк и новый пост меняют ETag затронутых страниц."""
+        detail = reverse('posts:post_detail', args=[self.post.pk])
+        writes = (
+            lambda: Comment.objects.create(
+                post=self.post, author=self.author, text='Комментарий'
+            ),
+            lambda: self.client.post(
+                reverse('posts:like_unlike_post'), {'post_id': self.post.pk}
+            ),
+            lambda: Post.objects.create(
+                author=self.author, title='Новый', text='Текст'
+            ),
+        )
+        for write in writes:
+            before = self.client.get(detail)
+            write()
+            self.assertEqual(
+                self.revalidate(self.client, detail, before).status_code, 200
+            )
+
+    def test_etag_depends_on_user(self):
+        """Анонимный и авторизованный читатели получают разные ETag."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertEqual(
+            self.revalidate(self.guest, url, response).status_code, 200
+        )
+
+    def test_missing_post_is_not_found(self):
+        """Для несуществующего поста валидаторы не вычисляются."""
+        response = self.guest.get(
+            reverse('posts:post_detail', args=[self.post.pk + 100])
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
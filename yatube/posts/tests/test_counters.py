@@ -0,0 +1,65 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Post, Comment
+
+User = get_user_model()
+
+
+class PostCountersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            title='Тестовый пост',
+            text='Тестовый текст'
+        )
+
+    def counters(self):
+        post = Post.objects.get(pk=self.post.pk)
+        return post.like_count, post.comment_count
+
+    def test_comment_create_and_delete_update_counter(self):
+        """Создание и удаление комментария меняют comment_count."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Ответ'
+        )
+        self.assertEqual(self.counters(), (0, 2))
+        comment.delete()
+        self.assertEqual(self.counters(), (0, 1))
+
+    def test_like_and_unlike_update_counter(self):
+        """Лайк и снятие лайка с любой стороны связи меняют like_count."""
+        self.post.liked.add(self.reader, self.author)
+        self.assertEqual(self.counters(), (2, 0))
+        # Повторное добавление не должно увеличивать счетчик
+        self.reader.likes.add(self.post)
+        self.assertEqual(self.counters(), (2, 0))
+        self.reader.likes.remove(self.post)
+        # Повторное удаление не должно уменьшать счетчик
+        self.post.liked.remove(self.reader)
+        self.assertEqual(self.counters(), (1, 0))
+        self.post.liked.clear()
+        self.assertEqual(self.counters(), (0, 0))
+
+    def test_reconcile_counters_repairs_drift(self):
+        """Команда reconcile_counters исправляет рассинхронизацию."""
+        self.post.liked.add(self.reader)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Post.objects.filter(pk=self.post.pk).update(
+            like_count=42, comment_count=-3
+        )
+        out = StringIO()
+        call_command('reconcile_counters', batch_size=1, stdout=out)
+        self.assertEqual(self.counters(), (1, 1))
+        self.assertIn('исправлено: 1', out.getvalue())
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from posts.feed_cache import get_feed_generation
+from posts.models import Post
+
+User = get_user_model()
+
+
+# Поколение ленты меняется после коммита, поэтому нужны реальные транзакции
+class FeedCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(
+            author=self.author,
+            title='Тестовый пост',
+            text='Тестовый текст'
+        )
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def index(self, client):
+        return client.get(reverse('posts:index')).content.decode()
+
+    def test_fragment_is_reused_until_write(self):
+        """Без записей лента отдается из кэша, даже если данные изменились."""
+        self.assertIn('Тестовый текст', self.index(self.reader_client))
+        # update() не отправляет сигналов и не меняет поколение ленты
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        self.assertIn('Тестовый текст', self.index(self.reader_client))
+
+    def test_new_post_appears_immediately(self):
+        """Новый пост сразу виден в ленте."""
+        self.index(self.reader_client)
+        generation = get_feed_generation()
+        Post.objects.create(
+            author=self.author, title='Свежий', text='Свежий пост'
+        )
+        self.assertGreater(get_feed_generation(), generation)
+        self.assertIn('Свежий пост', self.index(self.reader_client))
+
+    def test_like_bumps_generation(self):
+        """Лайк меняет поколение ленты и обновляет счетчик на странице."""
+        generation = get_feed_generation()
+        self.reader_client.post(
+            reverse('posts:like_unlike_post'), {'post_id': self.post.pk}
+        )
+        self.assertGreater(get_feed_generation(), generation)
+
+    def test_liked_state_is_not_shared_between_users(self):
+        """Отметки лайков не попадают в общий кэшированный фрагмент."""
+        self.post.liked.add(self.reader)
+        reader_page = self.index(self.reader_client)
+        author_page = self.index(self.author_client)
+        self.assertIn(f'data-liked="{self.post.pk} "', reader_page)
+        self.assertIn('data-liked=""', author_page)
+        button = f'like-button{self.post.pk}">🤍</button>'
+        self.assertIn(button, reader_page)
+        self.assertIn(button, author_page)
@@ -0,0 +1,143 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts import feed_inbox
+from posts.models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+@override_settings(FEED_FANOUT_ASYNC=False)
+class FeedInboxTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.other = User.objects.create_user(username='other')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def inbox(self, user):
+        return set(
+            FeedEntry.objects.filter(user=user).values_list('post_id', flat=True)
+        )
+
+    def feed(self, **params):
+        return self.client.get(reverse('posts:follow_index'), params)
+
+    @override_settings(FEED_FANOUT_BATCH_SIZE=1)
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост раскладывается по лентам всех подписчиков пачками."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        post = Post.objects.create(
+            author=self.author, title='Пост', text='Текст'
+        )
+        self.assertEqual(self.inbox(self.reader), {post.pk})
+        self.assertEqual(self.inbox(self.other), {post.pk})
+        self.assertEqual(
+            [p.pk for p in self.feed().context['page_obj']], [post.pk]
+        )
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        """Подписка добавляет посты автора в ленту, отписка убирает."""
+        posts = [
+            Post.objects.create(author=self.author, title='Пост', text='Текст')
+            for _ in range(3)
+        ]
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertEqual(self.inbox(self.reader), {p.pk for p in posts})
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertEqual(self.inbox(self.reader), set())
+        self.assertEqual(len(self.feed().context['page_obj']), 0)
+
+    def test_bulk_created_posts_are_added_on_read(self):
+        """Посты без рассылки (bulk_create) дописываются в ленту при чтении."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.bulk_create(
+            Post(author=self.author, title='Пост', text='Текст')
+            for _ in range(3)
+        )
+        self.assertEqual(self.inbox(self.reader), set())
+        self.assertEqual(len(self.feed().context['page_obj']), 3)
+        self.assertEqual(
+            self.inbox(self.reader),
+            set(Post.objects.values_list('pk', flat=True))
+        )
+
+    def test_deleted_post_leaves_feed(self):
+        """Удаленный пост пропадает из лент подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(
+            author=self.author, title='Пост', text='Текст'
+        )
+        post.delete()
+        self.assertEqual(self.inbox(self.reader), set())
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=2)
+    def test_popular_author_is_read_on_request(self):
+        """Посты популярного автора не рассылаются, но попадают в ленту."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.other)
+        posts = []
+        for i in range(25):
+            author = self.author if i % 2 else self.other
+            posts.append(
+                Post.objects.create(author=author, title='Пост', text='Текст')
+            )
+        self.assertFalse(
+            FeedEntry.objects.filter(author=self.author).exists()
+        )
+        expected = [
+            p.pk for p in sorted(
+                posts, key=lambda p: (p.created, p.pk), reverse=True
+            )
+        ]
+        page = self.feed().context['page_obj']
+        seen = [p.pk for p in page]
+        while page.has_next():
+            page = self.feed(cursor=page.next_cursor).context['page_obj']
+            seen.extend(p.pk for p in page)
+        self.assertEqual(seen, expected)
+        previous = self.feed(cursor=page.previous_cursor).context['page_obj']
+        self.assertEqual([p.pk for p in previous], expected[10:20])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=2)
+    def test_dropping_below_threshold_refills_inboxes(self):
+        """
+        Когда автор опускается ниже порога, посты, написанные пока он
+        читался при запросе, раскладываются по лентам подписчиков.
+        """
+        third = User.objects.create_user(username='third')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        popular_post = Post.objects.create(
+            author=self.author, title='Пост', text='Текст'
+        )
+        # Подписался, пока автор читался при запросе: без заполнения ленты
+        Follow.objects.create(user=third, author=self.author)
+        self.assertEqual(self.inbox(third), set())
+        Follow.objects.filter(user=self.other, author=self.author).delete()
+        Follow.objects.filter(user=third, author=self.author).delete()
+        self.assertEqual(self.inbox(self.reader), {popular_post.pk})
+        self.assertEqual(
+            [p.pk for p in self.feed().context['page_obj']], [popular_post.pk]
+        )
+
+    @override_settings(FEED_FANOUT_ASYNC=True)
+    def test_fan_out_runs_in_background(self):
+        """Рассылка поста выполняется в фоновом потоке после коммита."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(
+            author=self.author, title='Пост', text='Текст'
+        )
+        executor = feed_inbox._executor
+        self.assertIsNotNone(executor)
+        executor.shutdown(wait=True)
+        feed_inbox._executor = None
+        self.assertEqual(self.inbox(self.reader), {post.pk})
@@ -1,12 +1,15 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from posts.forms import PostForm
 from posts.models import Post, Group, Comment
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -82,7 +85,7 @@ class PostsFormsTests(TestCase):
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.author, PostsFormsTests.user)
         self.assertEqual(post.group, PostsFormsTests.group)
-        self.assertEqual(post.image, 'posts/new.gif')
+        self.assertEqual(post.image, 'posts/new.webp')
 
     def test_post_edit(self):
         """
@@ -127,7 +130,7 @@ class PostsFormsTests(TestCase):
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.author, PostsFormsTests.user)
         self.assertEqual(post.group, PostsFormsTests.group)
-        self.assertEqual(post.image, 'posts/pic.gif')
+        self.assertEqual(post.image, 'posts/pic.webp')
 
     def test_add_comment(self):
         """
@@ -173,3 +176,103 @@ class PostsFormsTests(TestCase):
             follow=True
         )
         self.assertEqual(Comment.objects.count(), comment_count)
+
+
+@override_settings(
+    POST_IMAGE_MAX_SIZE=(400, 400), POST_IMAGE_MAX_PIXELS=4_000_000,
+    POST_IMAGE_MAX_DECODED_PIXELS=1_000_000,
+    POST_IMAGE_MAX_ANIMATION_PIXELS=3_000_000
+)
+class PostImageNormalizationTests(TestCase):
+    def upload(self, size, name='photo.jpg', exif=None):
+        buffer = BytesIO()
+        image = Image.new('RGB', size, 'blue')
+        options = {'exif': exif} if exif is not None else {}
+        image.save(buffer, 'JPEG', **options)
+        return SimpleUploadedFile(
+            name=name, content=buffer.getvalue(), content_type='image/jpeg'
+        )
+
+    def clean(self, upload):
+        form = PostForm(
+            data={'title': 'Пост', 'text': 'Пост с фото'},
+            files={'image': upload}
+        )
+        form.is_valid()
+        return form
+
+    def test_image_downscaled_rotated_and_stripped(self):
+        """Картинка уменьшается, поворачивается по EXIF и теряет метаданные."""
+        exif = Image.Exif()
+        # Orientation = 6: снимок повернут на 90 градусов
+        exif[0x0112] = 6
+        # Make: производитель камеры
+        exif[0x010F] = 'Camera'
+        form = self.clean(self.upload((1200, 800), exif=exif.tobytes()))
+        self.assertTrue(form.is_valid(), form.errors)
+        stored = form.cleaned_data['image']
+        self.assertEqual(stored.name, 'photo.webp')
+        self.assertEqual(stored.content_type, 'image/webp')
+        image = Image.open(stored)
+        self.assertEqual(image.format, 'WEBP')
+        self.assertEqual(image.size, (267, 400))
+        self.assertFalse(image.getexif())
+
+    def test_small_image_keeps_size(self):
+        """Маленькая картинка не увеличивается, но перекодируется."""
+        form = self.clean(self.upload((120, 80), name='small.png'))
+        image = Image.open(form.cleaned_data['image'])
+        self.assertEqual((image.format, image.size), ('WEBP', (120, 80)))
+
+    def test_too_many_pixels_rejected(self):
+        """Картинка с огромным числом пикселей отклоняется формой."""
+        form = self.clean(self.upload((2500, 2000)))
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def animation(self, size, image_format, frames=3, exif=None):
+        buffer = BytesIO()
+        images = [
+            Image.new('RGB', size, color)
+            for color in ('red', 'green', 'blue', 'white')[:frames]
+        ]
+        options = {'exif': exif} if exif is not None else {}
+        images[0].save(
+            buffer, image_format, save_all=True, append_images=images[1:],
+            duration=100, loop=0, **options
+        )
+        return SimpleUploadedFile(
+            name=f'clip.{image_format.lower()}', content=buffer.getvalue()
+        )
+
+    def test_fully_decoded_formats_have_lower_limit(self):
+        """PNG декодируется целиком, и его предел ниже, чем у JPEG."""
+        buffer = BytesIO()
+        Image.new('RGB', (1500, 1000), 'blue').save(buffer, 'PNG')
+        form = self.clean(SimpleUploadedFile('big.png', buffer.getvalue()))
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+        form = self.clean(self.upload((1500, 1000)))
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_animation_downscaled_and_stripped(self):
+        """Анимация уменьшается покадрово и теряет метаданные."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        form = self.clean(
+            self.animation((800, 600), 'WEBP', exif=exif.tobytes())
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        image = Image.open(form.cleaned_data['image'])
+        self.assertEqual(image.format, 'WEBP')
+        self.assertEqual(image.size, (400, 300))
+        self.assertEqual(image.n_frames, 3)
+        self.assertFalse(image.getexif())
+
+    def test_animation_total_pixels_limited(self):
+        """На все кадры анимации вместе действует общий предел."""
+        form = self.clean(self.animation((1000, 1000), 'GIF', frames=4))
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+        form = self.clean(self.animation((1000, 1000), 'GIF', frames=2))
+        self.assertTrue(form.is_valid(), form.errors)
@@ -0,0 +1,200 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+class LikeToggleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.user = User.objects.create_user(username='user')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            title='Тестовый пост',
+            text='Тестовый текст'
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def toggle(self, **data):
+        data.setdefault('post_id', self.post.pk)
+        return self.authorized_client.post(
+            reverse('posts:like_unlike_post'), data
+        )
+
+    def test_toggle_like_and_unlike(self):
+        """Повторный клик снимает лайк, счетчик возвращается без пересчета."""
+        self.assertEqual(self.toggle().json(), {'value': 'Like', 'likes': 1})
+        self.assertTrue(self.post.liked.filter(pk=self.user.pk).exists())
+        self.assertEqual(
+            self.toggle().json(), {'value': 'Unlike', 'likes': 0}
+        )
+        self.assertFalse(self.post.liked.exists())
+
+    def test_explicit_value_is_idempotent(self):
+        """Запрос с явным value можно безопасно повторять."""
+        for _ in range(2):
+            self.assertEqual(
+                self.toggle(value='Like').json(), {'value': 'Like', 'likes': 1}
+            )
+        for _ in range(2):
+            self.assertEqual(
+                self.toggle(value='Unlike').json(),
+                {'value': 'Unlike', 'likes': 0}
+            )
+        self.assertFalse(self.post.liked.exists())
+
+    def test_toggle_unknown_post_returns_404(self):
+        """Лайк несуществующего поста возвращает 404 и ничего не пишет."""
+        for post_id in (self.post.pk + 100, 'abc'):
+            with self.subTest(post_id=post_id):
+                self.assertEqual(self.toggle(post_id=post_id).status_code, 404)
+        self.assertFalse(Post.liked.through.objects.exists())
+
+    def test_toggle_query_count(self):
+        """Переключение лайка укладывается в фиксированное число запросов."""
+        self.toggle()
+        # сессия, пользователь, savepoint, пост с отметкой лайка,
+        # выборка снимаемых лайков сигналом, выборка и удаление связи,
+        # счетчики поста и автора, итоговый счетчик, release savepoint
+        with self.assertNumQueries(11):
+            self.toggle()
+
+
+class LikedByUserTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.user = User.objects.create_user(username='user')
+        Post.objects.bulk_create(
+            Post(author=cls.author, title=f'Пост {i}', text=f'Текст {i}')
+            for i in range(3)
+        )
+        cls.posts = list(Post.objects.order_by('title'))
+        cls.liked_post = cls.posts[1]
+        cls.liked_post.liked.add(cls.user)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feed_marks_liked_posts(self):
+        """Лента отмечает лайкнутые пользователем посты флагом is_liked."""
+        page = self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': 'author'})
+        ).context['page_obj']
+        liked = {post.title: post.is_liked for post in page}
+        self.assertEqual(
+            liked, {'Пост 0': False, 'Пост 1': True, 'Пост 2': False}
+        )
+
+    def test_post_detail_marks_liked_post(self):
+        """Страница поста отмечает лайк текущего пользователя."""
+        for post, expected in ((self.liked_post, True), (self.posts[0], False)):
+            with self.subTest(post=post.title):
+                response = self.authorized_client.get(reverse(
+                    'posts:post_detail', kwargs={'post_id': post.pk}
+                ))
+                self.assertIs(response.context['post'].is_liked, expected)
+
+    def test_anonymous_user_sees_no_likes(self):
+        """Для гостя посты не отмечаются лайкнутыми."""
+        page = Client().get(
+            reverse('posts:profile', kwargs={'username': 'author'})
+        ).context['page_obj']
+        self.assertFalse(any(post.is_liked for post in page))
+
+    def test_liked_flags_cost_one_query(self):
+        """Число запросов ленты не зависит от количества лайков."""
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        for i in range(20):
+            self.posts[0].liked.add(
+                User.objects.create_user(username=f'fan{i}')
+            )
+        with CaptureQueriesContext(connection) as before:
+            self.authorized_client.get(url)
+        for i in range(20, 40):
+            self.posts[2].liked.add(
+                User.objects.create_user(username=f'fan{i}')
+            )
+        with CaptureQueriesContext(connection) as after:
+            self.authorized_client.get(url)
+        self.assertEqual(len(before), len(after))
+        liked_queries = [
+            q['sql'] for q in after.captured_queries
+            if 'posts_post_liked' in q['sql']
+        ]
+        self.assertEqual(len(liked_queries), 1)
+
+
+class LikeToggleConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(
+            author=self.author,
+            title='Тестовый пост',
+            text='Тестовый текст'
+        )
+        self.users = [
+            User.objects.create_user(username=f'user{i}') for i in range(8)
+        ]
+
+    def run_parallel(self, requests):
+        barrier = threading.Barrier(len(requests))
+        responses = []
+
+        def worker(user, data):
+            client = Client()
+            client.force_login(user)
+            barrier.wait(timeout=10)
+            try:
+                responses.append(client.post(
+                    reverse('posts:like_unlike_post'), data
+                ))
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=request)
+            for request in requests
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def test_parallel_likes_from_many_users(self):
+        """Параллельные лайки разных пользователей не теряют счетчик."""
+        responses = self.run_parallel([
+            (user, {'post_id': self.post.pk}) for user in self.users
+        ])
+        self.assertEqual(
+            [r.status_code for r in responses], [200] * len(self.users)
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, len(self.users))
+        self.assertEqual(self.post.liked.count(), len(self.users))
+
+    def test_parallel_double_click_is_idempotent(self):
+        """Двойной клик одного пользователя создает ровно один лайк."""
+        user = self.users[0]
+        responses = self.run_parallel([
+            (user, {'post_id': self.post.pk, 'value': 'Like'})
+            for _ in range(4)
+        ])
+        self.assertEqual([r.status_code for r in responses], [200] * 4)
+        self.assertTrue(all(r.json()['likes'] == 1 for r in responses))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(self.post.liked.count(), 1)
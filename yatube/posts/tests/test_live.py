@@ -0,0 +1,131 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (
+    Client, SimpleTestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
+
+from posts.live import CacheBroker, LocalBroker, event_stream, get_broker
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class BrokerTests(SimpleTestCase):
+    def test_local_broker_delivers_only_subscribed_posts(self):
+        """Подписчик получает события только своих постов."""
+        broker = LocalBroker()
+        subscription = broker.subscribe([1, 2])
+        broker.publish({'post': 1, 'field': 'likes', 'delta': 1, 'value': 5})
+        broker.publish({'post': 3, 'field': 'likes', 'delta': 1, 'value': 1})
+        self.assertEqual(
+            [event['post'] for event in subscription.wait(0)], [1]
+        )
+        self.assertEqual(subscription.wait(0), [])
+        subscription.close()
+        self.assertEqual(dict(broker.subscribers), {})
+
+    @override_settings(LIVE_POLL_INTERVAL=0.01)
+    def test_cache_broker_delivers_through_shared_cache(self):
+        """CacheBroker раздает события, записанные в общий кэш."""
+        cache.clear()
+        broker = CacheBroker()
+        subscription = broker.subscribe([7])
+        # Событие другого процесса: публикует отдельный экземпляр брокера
+        CacheBroker().publish(
+            {'post': 7, 'field': 'comments', 'delta': 1, 'value': 1}
+        )
+        self.assertEqual(subscription.wait(5)[0]['value'], 1)
+        subscription.close()
+
+    @override_settings(LIVE_HEARTBEAT=0)
+    def test_stream_sends_heartbeat_and_unsubscribes(self):
+        """Поток шлет пинги и снимает подписку при закрытии."""
+        stream = event_stream({42})
+        self.assertTrue(next(stream).startswith('retry:'))
+        self.assertIn(42, get_broker().subscribers)
+        self.assertEqual(next(stream), ': ping\n\n')
+        stream.close()
+        self.assertNotIn(42, get_broker().subscribers)
+
+
+class LiveCountsTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(
+            author=self.author, title='Пост', text='Текст'
+        )
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_bad_post_list_is_rejected(self):
+        """Пустой или некорректный список постов - ошибка 400."""
+        for posts in ('', 'abc', ','.join(str(i) for i in range(1, 200))):
+            with self.subTest(posts=posts[:10]):
+                response = self.client.get(
+                    reverse('posts:live_counts'), {'posts': posts}
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_stream_receives_like_and_comment_counts(self):
+        """Лайк и комментарий доходят до открытого потока с итогом."""
+        response = self.client.get(
+            reverse('posts:live_counts'), {'posts': str(self.post.pk)}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = iter(response.streaming_content)
+        self.assertTrue(next(stream).startswith(b'retry:'))
+        self.client.post(
+            reverse('posts:like_unlike_post'), {'post_id': self.post.pk}
+        )
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        events = []
+        while len(events) < 2:
+            chunk = next(stream).decode()
+            if chunk.startswith('event: counts'):
+                events.append(json.loads(chunk.split('data: ')[1]))
+        response.close()
+        self.assertEqual(
+            events,
+            [
+                {'post': self.post.pk, 'field': 'likes', 'delta': 1,
+                 'value': 1},
+                {'post': self.post.pk, 'field': 'comments', 'delta': 1,
+                 'value': 1},
+            ]
+        )
+        self.assertNotIn(self.post.pk, get_broker().subscribers)
+
+    @override_settings(
+        LIVE_MAX_STREAMS=1, LIVE_RETRY_MS=3000, LIVE_BUSY_RETRY_MS=10000
+    )
+    def test_streams_over_limit_poll_current_counts(self):
+        """Сверх LIVE_MAX_STREAMS клиент опрашивает текущие счетчики."""
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        first = event_stream({self.post.pk})
+        next(first)
+        second = event_stream({self.post.pk})
+        self.assertEqual(next(second), 'retry: 10000\n\n')
+        events = [json.loads(chunk.split('data: ')[1]) for chunk in second]
+        self.assertEqual(
+            events,
+            [
+                {'post': self.post.pk, 'field': 'likes', 'delta': 0,
+                 'value': 0},
+                {'post': self.post.pk, 'field': 'comments', 'delta': 0,
+                 'value': 1},
+            ]
+        )
+        self.assertEqual(len(get_broker().subscribers[self.post.pk]), 1)
+        first.close()
+        third = event_stream({self.post.pk})
+        self.assertEqual(next(third), 'retry: 3000\n\n')
+        third.close()
+        self.assertNotIn(self.post.pk, get_broker().subscribers)
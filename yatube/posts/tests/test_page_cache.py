@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', creator=self.author
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа', slug='other', creator=self.author
+        )
+        self.post = Post.objects.create(
+            author=self.author, title='Пост', text='Текст', group=self.group
+        )
+        self.other_post = Post.objects.create(
+            author=self.reader, title='Чужой пост', text='Текст'
+        )
+        self.guest = Client()
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=[self.group.slug]),
+            'other_group': reverse(
+                'posts:group_list', args=[self.other_group.slug]
+            ),
+            'profile': reverse('posts:profile', args=[self.author.username]),
+            'reader_profile': reverse(
+                'posts:profile', args=[self.reader.username]
+            ),
+            'detail': reverse('posts:post_detail', args=[self.post.pk]),
+            'other_detail': reverse(
+                'posts:post_detail', args=[self.other_post.pk]
+            ),
+        }
+
+    def warm(self):
+        for url in self.urls.values():
+            self.guest.get(url)
+
+    def cached(self):
+        '''Названия страниц, которые отдаются из кэша'''
+        return {
+            name for name, url in self.urls.items()
+            if self.guest.get(url).get('X-Page-Cache') == 'HIT'
+        }
+
+    def test_anonymous_pages_are_served_from_cache(self):
+        """Повторный анонимный запрос не обращается к базе."""
+        response = self.guest.get(self.urls['detail'])
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertEqual(
+            response['Surrogate-Key'],
+            f'post:{self.post.pk} author:author group:group'
+        )
+        # Остаются выборка ключей страницы и их версий для ETag
+        with self.assertNumQueries(2):
+            response = self.guest.get(self.urls['detail'])
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertContains(response, 'Текст')
+
+    def test_authenticated_pages_are_not_cached(self):
+        """Страницы авторизованных пользователей не кэшируются."""
+        client = Client()
+        client.force_login(self.reader)
+        client.get(self.urls['index'])
+        response = client.get(self.urls['index'])
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_comment_purges_only_pages_of_its_post(self):
+        """Комментарий сбрасывает страницы своего поста и ленты."""
+        self.warm()
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Новый комментарий'
+        )
+        self.assertEqual(
+            self.cached(), {'other_group', 'reader_profile', 'other_detail'}
+        )
+        self.assertContains(
+            self.guest.get(self.urls['detail']), 'Новый комментарий'
+        )
+
+    def test_like_purges_pages_of_its_post(self):
+        """Лайк через view сбрасывает страницы поста."""
+        self.warm()
+        client = Client()
+        client.force_login(self.reader)
+        client.post(reverse('posts:like_unlike_post'), {'post_id': self.post.pk})
+        self.assertEqual(
+            self.cached(), {'other_group', 'reader_profile', 'other_detail'}
+        )
+
+    def test_post_move_purges_old_and_new_group(self):
+        """Перенос поста сбрасывает обе группы и все ленты с меню групп."""
+        self.warm()
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertEqual(self.cached(), {'other_detail'})
+        response = self.guest.get(self.urls['other_group'])
+        self.assertContains(response, 'Пост')
+
+    def test_follow_purges_both_profiles(self):
+        """Подписка сбрасывает профили подписчика и автора."""
+        self.warm()
+        Follow.objects.create(user=self.reader, author=self.author)
+        # Страницы постов показывают статистику автора и тоже сбрасываются
+        self.assertEqual(self.cached(), {'index', 'group', 'other_group'})
@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
 
+from posts.feed_inbox import backfill_inbox
 from posts.models import Post, Group, Follow
 
 User = get_user_model()
@@ -17,7 +18,8 @@ class PaginatorViewsTest(TestCase):
         cls.group = Group.objects.create(
             title='Тестовая группа',
             slug='test-slug',
-            description='Тестовое описание'
+            description='Тестовое описание',
+            creator=cls.author
         )
         cls.follow = Follow.objects.create(
             user=cls.user,
@@ -67,3 +69,88 @@ class PaginatorViewsTest(TestCase):
                     len(response_page_2.context.get('page_obj')),
                     5
                 )
+
+
+# Тестируем keyset-пагинацию по курсору
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='cursor_author')
+        cls.group = Group.objects.create(
+            title='Группа курсора',
+            slug='cursor-slug',
+            creator=cls.author
+        )
+        Post.objects.bulk_create(
+            Post(
+                author=cls.author,
+                title='Пост ' + str(i),
+                text='Тестовый пост ' + str(i),
+                group=cls.group
+            )
+            for i in range(1, 26)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Курсоры next/prev обходят ленту без пропусков и повторов."""
+        expected = list(
+            Post.objects.order_by('-created', '-pk').values_list('pk', flat=True)
+        )
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertTrue(response.context['cursor_paginated'])
+        page = response.context['page_obj']
+        seen = [post.pk for post in page]
+        self.assertFalse(page.has_previous())
+        while page.has_next():
+            page = self.client.get(
+                url, {'cursor': page.next_cursor}
+            ).context['page_obj']
+            seen.extend(post.pk for post in page)
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(page), 5)
+        previous = self.client.get(
+            url, {'cursor': page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual([post.pk for post in previous], expected[10:20])
+
+    def test_cursor_used_by_all_feeds(self):
+        """Ленты группы, профиля и подписок тоже листаются курсором."""
+        follower = User.objects.create_user(username='cursor_follower')
+        Follow.objects.create(user=follower, author=self.author)
+        # В TestCase on_commit не срабатывает, ленту заполняем вручную
+        backfill_inbox(follower.pk, self.author.pk)
+        self.client.force_login(follower)
+        pages = (
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author.username}),
+            reverse('posts:follow_index')
+        )
+        for url in pages:
+            with self.subTest(url=url):
+                first = self.client.get(url).context['page_obj']
+                second = self.client.get(
+                    url, {'cursor': first.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(first), 10)
+                self.assertEqual(len(second), 10)
+                self.assertTrue(first[9].pk > second[0].pk)
+
+    def test_page_number_links_still_work(self):
+        """Старые ссылки ?page=N обслуживаются стандартным Paginator."""
+        response = self.client.get(reverse('posts:index'), {'page': 3})
+        self.assertFalse(response.context['cursor_paginated'])
+        self.assertEqual(response.context['page_obj'].number, 3)
+        self.assertEqual(len(response.context['page_obj']), 5)
+
+    def test_invalid_cursor_returns_404(self):
+        """Испорченный курсор приводит к ошибке 404."""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'not-a-cursor'}
+        )
+        self.assertEqual(response.status_code, 404)
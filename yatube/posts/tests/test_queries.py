@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post, Group, Comment
+
+User = get_user_model()
+
+
+class SingleFetchQueriesTests(TestCase):
+    '''Объект страницы загружается один раз за запрос'''
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', creator=cls.author
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            title='Пост',
+            text='Тестовый текст',
+            group=cls.group
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.author, text='Комментарий'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+        # Справочник групп в меню кэшируется, прогреваем кэш
+        self.client.get(reverse('posts:index'))
+
+    def test_pages_query_budget(self):
+        """Страница поста и страницы изменения укладываются в минимум."""
+        # Каждой странице нужны сессия и пользователь (2 запроса)
+        budgets = {
+            # ключи страницы и их версии для ETag, пост с автором, группой
+            # и числом постов автора, лайк пользователя, комментарии
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}): 7,
+            # пост и список групп в форме
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}): 4,
+            reverse('posts:post_delete', kwargs={'post_id': self.post.pk}): 3,
+            reverse('posts:delete_comment', kwargs={
+                'post_id': self.post.pk, 'comment_id': self.comment.pk
+            }): 3,
+            reverse('posts:group_delete', kwargs={'slug': self.group.slug}): 3,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_permission_check_reuses_object(self):
+        """Чужой пользователь получает отказ после единственной загрузки."""
+        stranger = User.objects.create_user(username='stranger')
+        self.client.force_login(stranger)
+        url = reverse('posts:post_delete', kwargs={'post_id': self.post.pk})
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_group_delete_allowed_only_for_creator(self):
+        """Удалить группу может только ее создатель."""
+        stranger = User.objects.create_user(username='stranger')
+        url = reverse('posts:group_delete', kwargs={'slug': self.group.slug})
+        self.client.force_login(stranger)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.post(url).status_code, 403)
+        self.assertTrue(Group.objects.filter(pk=self.group.pk).exists())
+        self.client.force_login(self.author)
+        response = self.client.post(url)
+        self.assertRedirects(
+            response,
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            fetch_redirect_response=False
+        )
+        self.assertFalse(Group.objects.filter(pk=self.group.pk).exists())
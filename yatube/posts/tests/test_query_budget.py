@@ -0,0 +1,174 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from core.benchmark import CLIENT_ADDR, PAGES, make_clients, page_url
+from core.query_budget import QueryBudgetMixin
+from core.sql import normalize_sql, plan_problems, query_plan
+from posts.feed_inbox import backfill_inbox
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Максимум запросов страницы при любом количестве элементов.
+# Авторизованной странице нужны сессия и пользователь (2 запроса);
+# кэш перед замером очищен, поэтому лентам нужен и справочник групп меню.
+QUERY_BUDGETS = {
+    # версии ключей страницы, посты с авторами и группами, отметки лайков,
+    # справочник групп
+    'posts:index': 6,
+    # + группа
+    'posts:group_list': 7,
+    # + автор со статистикой, подписка на него
+    'posts:profile': 8,
+    # число найденных, посты, отметки лайков, справочник групп
+    'posts:search': 6,
+    # ключи страницы и их версии, пост с автором и группой, лайк,
+    # комментарии
+    'posts:post_detail': 7,
+    # версии ключей, комментарии с авторами
+    'posts:comments': 4,
+    # + авторы без рассылки, ключи ленты, посты по ключам
+    'posts:follow_index': 8,
+    'posts:post_create': 3,
+    'posts:group_create': 2,
+    'posts:post_edit': 4,
+    'posts:post_delete': 3,
+    'posts:delete_comment': 3,
+    'posts:group_delete': 3,
+    'users:signup': 0,
+    'users:login': 0,
+    'users:password_change': 2,
+    'users:password_change_done': 2,
+    'users:password_reset_form': 0,
+    'users:password_reset_done': 0,
+    # пользователь и новая сессия с токеном (с точками сохранения теста)
+    'users:password_reset_confirm': 5,
+    'users:password_reset_complete': 0,
+    'about:author': 0,
+    'about:tech': 0,
+}
+
+# Запросы, которым полный проход или временная сортировка допустимы
+ALLOWED_PLANS = {
+    # справочник групп меню: сортировка по числу постов, результат кэшируется
+    'ORDER BY "posts_count" DESC',
+    # поиск сортирует найденное по релевантности, ее нет в индексе
+    'ORDER BY "rank" ASC',
+}
+
+
+def build_pages(size):
+    '''Данные на size элементов и {имя URL: (клиент, адрес)} всех страниц'''
+    owner = User.objects.create_user(username='owner')
+    reader = User.objects.create_user(username='reader')
+    group = Group.objects.create(
+        title='Группа', slug='group', creator=owner
+    )
+    User.objects.bulk_create(
+        User(username=f'author{i}') for i in range(size)
+    )
+    authors = list(User.objects.filter(username__startswith='author'))
+    # Лента из постов разных авторов, каждый лайкнут и прокомментирован
+    # тоже разными пользователями: N+1 по любой связи будет виден
+    Post.objects.bulk_create(
+        Post(
+            author=author, group=group, title=f'Пост {author.username}',
+            text='Текст про море'
+        )
+        for author in authors
+    )
+    Post.objects.bulk_create(
+        Post(author=owner, group=group, title=f'Пост {i}', text='Море')
+        for i in range(size)
+    )
+    post = Post.objects.filter(author=owner).latest('pk')
+    Comment.objects.bulk_create(
+        Comment(post=post, author=author, text='Комментарий')
+        for author in authors
+    )
+    comment = Comment.objects.create(
+        post=post, author=reader, text='Комментарий читателя'
+    )
+    Post.liked.through.objects.bulk_create(
+        Post.liked.through(post_id=pk, user_id=reader.pk)
+        for pk in Post.objects.values_list('pk', flat=True)
+    )
+    Follow.objects.bulk_create(
+        Follow(user=reader, author=author) for author in [owner, *authors]
+    )
+    for author in [owner, *authors]:
+        backfill_inbox(reader.pk, author.pk)
+    AuthorStats.rebuild(User.objects.values_list('pk', flat=True))
+
+    clients = make_clients({
+        'reader': reader, 'owner': owner, 'commenter': reader,
+        'creator': owner,
+    })
+    reader.refresh_from_db()
+    fixtures = {
+        'author_username': owner.username,
+        'group_slug': group.slug,
+        'post_id': post.pk,
+        'comment_id': comment.pk,
+        'reader_uidb64': urlsafe_base64_encode(force_bytes(reader.pk)),
+        'reader_token': default_token_generator.make_token(reader),
+    }
+    return {
+        name: (
+            clients[role] if role else Client(REMOTE_ADDR=CLIENT_ADDR),
+            page_url(name, kwargs, query, fixtures)
+        )
+        for name, role, kwargs, query, _ in PAGES
+    }
+
+
+class PageQueryBudgetTests(QueryBudgetMixin, TestCase):
+    '''Число запросов каждой страницы не зависит от размера страницы'''
+    query_budgets = QUERY_BUDGETS
+
+    def get_pages(self, size):
+        return build_pages(size)
+
+    def test_every_page_has_budget(self):
+        """Бюджет задан для каждой замеряемой страницы."""
+        self.assertEqual(set(QUERY_BUDGETS), {page[0] for page in PAGES})
+
+    def test_query_budgets(self):
+        """Страницы укладываются в бюджет на 1, 10 и 100 элементах."""
+        self.assertQueryBudgets()
+
+
+class QueryPlanTests(TestCase):
+    '''Запросы страниц идут по индексам, без полных проходов и сортировок'''
+    def capture(self, client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        return response, [query['sql'] for query in queries]
+
+    def test_pages_use_indexes(self):
+        """Первая и следующая страницы лент читаются по индексам."""
+        problems = []
+        for name, (client, url) in build_pages(100).items():
+            response, queries = self.capture(client, url)
+            page = response.context and response.context.get('page_obj')
+            cursor = getattr(page, 'next_cursor', None)
+            if cursor:
+                queries += self.capture(client, f'{url}?cursor={cursor}')[1]
+            for sql in queries:
+                if not sql.startswith('SELECT') or any(
+                    allowed in sql for allowed in ALLOWED_PLANS
+                ):
+                    continue
+                steps = plan_problems(query_plan(connection, sql))
+                if steps:
+                    problems.append(
+                        f'{name}: {steps}\n  {normalize_sql(sql)}'
+                    )
+        self.assertEqual(problems, [], '\n'.join(problems))
@@ -0,0 +1,167 @@
+import re
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.signals import post_migrate
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.management.commands.rebuild_search_index import (
+    Command as RebuildCommand
+)
+from posts.models import Post
+from posts.search import build_match_query, search_posts
+
+User = get_user_model()
+
+
+class PostSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.about_cats = Post.objects.create(
+            author=cls.author,
+            title='Кошки',
+            text='Кошки любят спать на подоконнике'
+        )
+        cls.about_dogs = Post.objects.create(
+            author=cls.author,
+            title='Собаки',
+            text='Собаки любят гулять, а кошки - нет'
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.author, title=f'Пост {i}', text='Про погоду')
+            for i in range(12)
+        )
+
+    def found(self, query):
+        return [post.pk for post in search_posts(query)]
+
+    def test_match_query_is_sanitized(self):
+        """Спецсимволы FTS5 во вводе пользователя не ломают запрос."""
+        self.assertEqual(
+            build_match_query('кошки "OR" NEAR('), '"кошки" "OR" "NEAR"*'
+        )
+        self.assertEqual(build_match_query(' -*" '), '')
+        self.assertEqual(self.found('"кошки'), [
+            self.about_cats.pk, self.about_dogs.pk
+        ])
+
+    def test_search_is_ranked(self):
+        """Пост с совпадением в заголовке и тексте выше остальных."""
+        self.assertEqual(
+            self.found('кошки'), [self.about_cats.pk, self.about_dogs.pk]
+        )
+        self.assertEqual(self.found('гуля'), [self.about_dogs.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Триггеры поддерживают индекс при update() и delete()."""
+        Post.objects.filter(pk=self.about_dogs.pk).update(text='Про рыбок')
+        self.assertEqual(self.found('гулять'), [])
+        self.assertEqual(self.found('рыбок'), [self.about_dogs.pk])
+        Post.objects.filter(pk=self.about_cats.pk).delete()
+        self.assertEqual(self.found('подоконнике'), [])
+
+    def test_search_page_is_paginated(self):
+        """Страница /search/ выдает результаты постранично."""
+        client = Client()
+        response = client.get(reverse('posts:search'), {'q': 'погоду'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertContains(
+            response, '?q=%D0%BF%D0%BE%D0%B3%D0%BE%D0%B4%D1%83&amp;page=2'
+        )
+        response = client.get(
+            reverse('posts:search'), {'q': 'погоду', 'page': 2}
+        )
+        self.assertEqual(len(response.context['page_obj']), 2)
+        response = client.get(reverse('posts:search'), {'q': ''})
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    @override_settings(POSTS_PER_PAGE=1, PAGINATOR_WINDOW=2)
+    def test_search_paginator_shows_page_window(self):
+        """Навигация выводит только страницы рядом с текущей."""
+        response = Client().get(
+            reverse('posts:search'), {'q': 'погоду', 'page': 6}
+        )
+        numbers = re.findall(
+            r'page=\d+">\s*(\d+)\s*<', response.content.decode()
+        )
+        self.assertEqual([int(number) for number in numbers], [4, 5, 7, 8])
+        self.assertContains(response, 'page=12">')
+
+    def test_triggers_restored_after_migrate(self):
+        """После миграции пропавшие триггеры и изменения возвращаются."""
+        with connection.cursor() as cursor:
+            for event in ('insert', 'delete', 'update'):
+                cursor.execute(f'DROP TRIGGER posts_post_fts_{event}')
+        # Правка, сделанная без триггеров, в индекс не попадает
+        Post.objects.filter(pk=self.about_dogs.pk).update(text='Про рыбок')
+        self.assertEqual(self.found('рыбок'), [])
+        config = apps.get_app_config('posts')
+        post_migrate.send(
+            sender=config, app_config=config, verbosity=0,
+            interactive=False, using='default', apps=apps, plan=[]
+        )
+        self.assertEqual(self.found('рыбок'), [self.about_dogs.pk])
+        Post.objects.filter(pk=self.about_dogs.pk).update(text='Про птиц')
+        self.assertEqual(self.found('птиц'), [self.about_dogs.pk])
+
+    def test_rebuild_search_index(self):
+        """Команда rebuild_search_index восстанавливает индекс целиком."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO posts_post_fts(posts_post_fts) "
+                "VALUES ('delete-all')"
+            )
+        self.assertEqual(self.found('кошки'), [])
+        call_command('rebuild_search_index', batch_size=5, stdout=StringIO())
+        self.assertEqual(
+            self.found('кошки'), [self.about_cats.pk, self.about_dogs.pk]
+        )
+        self.assertEqual(search_posts('погоду').count(), 12)
+        # Индекс согласован с постами: правки после перестройки
+        # не оставляют в нем лишних или потерянных записей
+        self.about_cats.text = 'Про хомяков'
+        self.about_cats.save()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO posts_post_fts(posts_post_fts, rank) "
+                "VALUES ('integrity-check', 1)"
+            )
+
+    def test_writes_during_rebuild_reach_new_index(self):
+        """Правки между пачками перестройки попадают в новый индекс."""
+        command = RebuildCommand(stdout=StringIO())
+        command.prepare()
+        count, last_pk = command.index_batch(0, 1)
+        self.assertEqual(last_pk, self.about_cats.pk)
+        # Уже проиндексированный пост правят триггеры нового индекса,
+        # еще не проиндексированный - следующая пачка
+        Post.objects.filter(pk=self.about_cats.pk).update(text='Про хомяков')
+        Post.objects.filter(pk=self.about_dogs.pk).update(text='Про рыбок')
+        fresh = Post.objects.create(
+            author=self.author, title='Новый', text='Про енотов'
+        )
+        while count:
+            count, last_pk = command.index_batch(last_pk, 5)
+        fresh.delete()
+        command.swap(last_pk)
+        command.merge()
+        self.assertEqual(self.found('хомяков'), [self.about_cats.pk])
+        self.assertEqual(self.found('рыбок'), [self.about_dogs.pk])
+        self.assertEqual(self.found('подоконнике'), [])
+        self.assertEqual(self.found('енотов'), [])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO posts_post_fts(posts_post_fts, rank) "
+                "VALUES ('integrity-check', 1)"
+            )
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master "
+                "WHERE name LIKE 'posts_post_fts_new%' "
+                "OR name = 'posts_post_fts_progress'"
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
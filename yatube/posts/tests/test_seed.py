@@ -0,0 +1,101 @@
+import random
+from collections import Counter
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase
+
+from posts.management.commands.seed_yatube import power_law_index
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+OPTIONS = {
+    'users': 30, 'groups': 3, 'posts': 60, 'comments': 80,
+    'follows': 100, 'likes': 200, 'batch_size': 25, 'workers': 1,
+    'seed': 7, 'until': '2024-01-01', 'stdout': StringIO(),
+}
+
+
+def snapshot(prefix):
+    def strip(name):
+        return name and name[len(prefix):]
+    posts = Post.objects.filter(author__username__startswith=prefix)
+    return (
+        [
+            (strip(author), strip(group), *rest)
+            for author, group, *rest in posts.order_by('pk').values_list(
+                'author__username', 'group__slug', 'title', 'created',
+                'like_count', 'comment_count'
+            )
+        ],
+        sorted(
+            (strip(user), strip(author))
+            for user, author in Follow.objects.filter(
+                user__username__startswith=prefix
+            ).values_list('user__username', 'author__username')
+        ),
+        list(
+            Comment.objects.filter(post__in=posts).order_by('pk')
+            .values_list('text', 'created')
+        ),
+    )
+
+
+class SeedYatubeTests(TestCase):
+    def test_power_law_prefers_small_indexes(self):
+        """Первые индексы выпадают намного чаще последних."""
+        rng = random.Random(0)
+        counts = Counter(power_law_index(rng, 100, 1.1) for _ in range(5000))
+        self.assertEqual(set(counts) - set(range(100)), set())
+        self.assertGreater(counts[0], 10 * counts.get(99, 1))
+
+    def test_seed_creates_requested_rows(self):
+        """Создаются все строки, счетчики и статистика сходятся."""
+        call_command('seed_yatube', **OPTIONS)
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 80)
+        self.assertGreater(Follow.objects.count(), 0)
+        self.assertFalse(Follow.objects.filter(
+            user_id=F('author_id')
+        ).exists())
+        likes = Post.liked.through.objects.count()
+        self.assertEqual(
+            sum(Post.objects.values_list('like_count', flat=True)), likes
+        )
+        self.assertEqual(AuthorStats.objects.count(), 30)
+        self.assertEqual(
+            sum(AuthorStats.objects.values_list('likes_received', flat=True)),
+            likes
+        )
+        self.assertFalse(
+            Post.objects.filter(created__gte='2024-01-01').exists()
+        )
+
+    def test_progress_counts_rows_in_table(self):
+        """Прогресс считает строки в таблице, без пропущенных повторов."""
+        stdout = StringIO()
+        call_command('seed_yatube', **{**OPTIONS, 'stdout': stdout})
+        follows = [
+            line for line in stdout.getvalue().splitlines()
+            if line.startswith('follows:')
+        ]
+        self.assertEqual(
+            int(follows[-1].split()[1]), Follow.objects.count()
+        )
+
+    def test_same_seed_gives_same_data(self):
+        """Повторный запуск с тем же seed дает те же данные."""
+        call_command('seed_yatube', **OPTIONS)
+        call_command('seed_yatube', **OPTIONS, prefix='again')
+        self.assertEqual(snapshot('again'), snapshot('seed'))
+
+    def test_existing_prefix_is_rejected(self):
+        """Повторный запуск с тем же префиксом не смешивает данные."""
+        User.objects.create_user(username='seed0')
+        with self.assertRaises(CommandError):
+            call_command('seed_yatube', **OPTIONS)
@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+
+def make_image(name, size=(1200, 800)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'JPEG')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/jpeg'
+    )
+
+
+def thumbnails():
+    cache_dir = os.path.join(TEMP_MEDIA_ROOT, 'cache')
+    return [
+        name for _, _, files in os.walk(cache_dir) for name in files
+    ]
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAILS_ASYNC=False)
+class PostThumbnailsTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT, 'cache'), True)
+        self.user = User.objects.create_user(username='author')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_thumbnail_created_after_post_create(self):
+        """Миниатюра создается сразу после сохранения поста."""
+        self.authorized_client.post(reverse('posts:post_create'), {
+            'title': 'С картинкой',
+            'text': 'Пост с картинкой',
+            'image': make_image('photo.jpg')
+        })
+        post = Post.objects.get()
+        self.assertTrue(default.kvstore.get(ImageFile(post.image.name)))
+        self.assertEqual(len(thumbnails()), 1)
+
+    def test_thumbnail_created_after_image_change(self):
+        """При замене картинки в редактировании создается новая миниатюра."""
+        post = Post.objects.create(
+            author=self.user, title='Пост', text='Без картинки'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'title': 'Пост', 'text': 'Теперь с картинкой',
+             'image': make_image('new.jpg')}
+        )
+        post.refresh_from_db()
+        self.assertTrue(default.kvstore.get(ImageFile(post.image.name)))
+
+    def test_generate_thumbnails_command(self):
+        """Команда создает недостающие миниатюры и повторно их не делает."""
+        posts_dir = os.path.join(TEMP_MEDIA_ROOT, 'posts', 'backfill')
+        os.makedirs(posts_dir, exist_ok=True)
+        for i in range(3):
+            with open(os.path.join(posts_dir, f'{i}.jpg'), 'wb') as image:
+                image.write(make_image(f'{i}.jpg').read())
+        call_command(
+            'generate_thumbnails', workers=2, directory='posts/backfill',
+            stdout=StringIO()
+        )
+        self.assertEqual(len(thumbnails()), 3)
+        out = StringIO()
+        call_command(
+            'generate_thumbnails', workers=1, directory='posts/backfill',
+            stdout=out
+        )
+        self.assertIn('Обработано картинок: 3, ошибок: 0', out.getvalue())
+        self.assertEqual(len(thumbnails()), 3)
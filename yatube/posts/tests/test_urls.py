@@ -30,6 +30,8 @@ class PostsURLTests(TestCase):
         )
 
     def setUp(self):
+        # Анонимные страницы кэшируются целиком
+        cache.clear()
         # Создаем неавторизованный клиент
         self.guest_client = Client()
         # Создаем второй клиент и авторизуем его
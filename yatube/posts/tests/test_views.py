@@ -1,10 +1,13 @@
+import re
 import shutil
 import tempfile
+from contextlib import contextmanager
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
@@ -15,7 +18,22 @@ TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@contextmanager
+def run_on_commit_callbacks():
+    '''
+    Выполняет on_commit-обработчики, добавленные внутри блока.
+    TestCase не фиксирует транзакцию, и без этого не срабатывают
+    сброс кэша ленты и рассылка постов подписчикам.
+    '''
+    start = len(connection.run_on_commit)
+    yield
+    callbacks = connection.run_on_commit[start:]
+    del connection.run_on_commit[start:]
+    for _, callback in callbacks:
+        callback()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, FEED_FANOUT_ASYNC=False)
 class PostsViewsTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -25,12 +43,14 @@ class PostsViewsTests(TestCase):
         cls.group = Group.objects.create(
             title='Тестовая группа',
             slug='test-slug',
-            description='Тестовое описание'
+            description='Тестовое описание',
+            creator=cls.author
         )
         cls.second_group = Group.objects.create(
             title='Тестовая группа 2',
             slug='test-slug-2',
-            description='Тестовое описание 2'
+            description='Тестовое описание 2',
+            creator=cls.author
         )
         uploaded = SimpleUploadedFile(
             name='pic.gif',
@@ -62,6 +82,8 @@ class PostsViewsTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        # Анонимные страницы кэшируются целиком
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(PostsViewsTests.user)
@@ -199,31 +221,34 @@ class PostsViewsTests(TestCase):
                 self.assertIsInstance(form_field, expected)
 
     def test_index_page_cache(self):
-        """Тестирование кэширования страницы index."""
-        new_post = Post.objects.create(
-            text='Testing cache',
-            author=PostsViewsTests.user,
-            group=PostsViewsTests.group
-        )
-        response_before = self.authorized_client.get(
-            reverse('posts:index')
-        )
-        new_post.delete()
-        response_after = self.authorized_client.get(
-            reverse('posts:index')
-        )
+        """Фрагмент ленты кэшируется и сбрасывается записью поста."""
+        def cached_part(response):
+            # CSRF-токен выводится вне кэша и меняется с каждым ответом
+            return re.sub(
+                rb'name="csrfmiddlewaretoken" value="[^"]+"', b'',
+                response.content
+            )
+        with run_on_commit_callbacks():
+            new_post = Post.objects.create(
+                text='Testing cache',
+                author=PostsViewsTests.user,
+                group=PostsViewsTests.group
+            )
+        response_before = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response_before, 'Testing cache')
+        # Изменение в обход сигналов не сбрасывает поколение ленты:
+        # отдается закэшированный фрагмент
+        Post.objects.filter(pk=new_post.pk).update(text='Changed quietly')
+        response_cached = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(
-            response_before.content,
-            response_after.content
-        )
-        cache.clear()
-        response_no_cache = self.authorized_client.get(
-            reverse('posts:index')
-        )
-        self.assertNotEqual(
-            response_after.content,
-            response_no_cache.content
+            cached_part(response_before), cached_part(response_cached)
         )
+        # Удаление после фиксации переводит ленту на новое поколение
+        with run_on_commit_callbacks():
+            new_post.delete()
+        response_after = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response_after, 'Testing cache')
+        self.assertNotContains(response_after, 'Changed quietly')
 
     def test_authorized_user_can_follow_and_unfollow(self):
         '''
@@ -254,10 +279,11 @@ class PostsViewsTests(TestCase):
         new_user = User.objects.create_user(username='new_user')
         authorized_client = Client()
         authorized_client.force_login(new_user)
-        authorized_client.get(reverse(
-            'posts:profile_follow',
-            kwargs={'username': PostsViewsTests.user.username}
-        ))
+        with run_on_commit_callbacks():
+            authorized_client.get(reverse(
+                'posts:profile_follow',
+                kwargs={'username': PostsViewsTests.user.username}
+            ))
         response_follow = authorized_client.get(
             reverse('posts:follow_index')
         )
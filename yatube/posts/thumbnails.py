@@ -0,0 +1,54 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from sorl.thumbnail import get_thumbnail
+
+logger = logging.getLogger(__name__)
+
+# Должны совпадать с параметрами {% thumbnail %} в posts/includes/post_list.html
+# и posts/post_detail.html, иначе шаблон не найдет готовую миниатюру
+POST_THUMBNAIL_GEOMETRY = '960x339'
+POST_THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+_executor = None
+
+
+def generate_post_thumbnail(name):
+    '''Создает миниатюру картинки поста, если ее еще нет в хранилище'''
+    get_thumbnail(name, POST_THUMBNAIL_GEOMETRY, **POST_THUMBNAIL_OPTIONS)
+    return name
+
+
+def _generate_in_background(name):
+    try:
+        generate_post_thumbnail(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+    finally:
+        connection.close()
+
+
+def schedule_post_thumbnail(post):
+    '''
+    Ставит создание миниатюры в фоновый поток после коммита транзакции,
+    чтобы первый зритель поста не ждал обработки картинки.
+    '''
+    if not post.image:
+        return
+    name = post.image.name
+
+    def submit():
+        global _executor
+        if not settings.POST_THUMBNAILS_ASYNC:
+            generate_post_thumbnail(name)
+            return
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POST_THUMBNAILS_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+        _executor.submit(_generate_in_background, name)
+
+    transaction.on_commit(submit)
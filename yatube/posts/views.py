@@ -1,23 +1,60 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_GET
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import Count
-from django.http import JsonResponse
+from django.db.models import Exists, OuterRef
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.views.generic.edit import FormMixin
 from django.views.generic import View, ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse
+from django.utils.http import urlencode
 
 
 # from core.paginator.my_paginator import paginate
-from .models import Post, Group, User, Follow, Comment, Like
+from core.db_router import reads_from_replica
+from core.sqlite import immediate_atomic
+from core.paginator.cursor_paginator import CursorPaginationMixin, CursorPaginator
+from .feed_cache import get_feed_generation
+from .feed_inbox import FollowFeedPaginator
+from .live import event_stream
+from .mixins import (
+    AnonymousPageCacheMixin, CachedObjectMixin, ConditionalGetMixin,
+    LikedPostsMixin
+)
+from .page_cache import post_surrogate_keys
+from .search import search_posts
+from .thumbnails import schedule_post_thumbnail
+from .models import Post, Group, User, Follow, Comment
 from .forms import PostForm, CommentForm, GroupForm
 
 
-class IndexListView(ListView):
+class IndexListView(ConditionalGetMixin, AnonymousPageCacheMixin, LikedPostsMixin,
+                    CursorPaginationMixin, ListView):
     '''Главная страница с недавно опубликованными постами'''
     template_name ='posts/index.html'
-    paginate_by = 10
-    queryset = Post.objects.annotate(comments_count=Count('comments'), num_likes=Count('liked')).select_related('author', 'group')
+    queryset = Post.objects.select_related('author', 'group')
+    # Отметки лайков выводятся вне кэшированного фрагмента ленты
+    defer_liked_posts = True
+    # Ленты читаются из реплики (core.db_router)
+    replica_reads = True
+
+    def get_paginate_by(self, queryset):
+        return settings.POSTS_PER_PAGE
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['feed_generation'] = get_feed_generation()
+        # Фрагмент из отстающей реплики не кэшируется: поколение ленты
+        # уже сменилось, и устаревший фрагмент прожил бы под ним весь срок
+        context['feed_cache_timeout'] = (
+            0 if reads_from_replica() else settings.FEED_CACHE_TIMEOUT
+        )
+        return context
+
+    def get_surrogate_keys(self):
+        # Меню групп с числом постов есть на всех лентах
+        return ['index', 'groups']
   
     # Function view version    
     # def index(request):
@@ -30,15 +67,19 @@ class IndexListView(ListView):
 class GroupListView(IndexListView):
     '''Страница с постами группы'''
     template_name = 'posts/group_list.html'
+    defer_liked_posts = False
     
     def get_queryset(self):
         self.group = get_object_or_404(Group, slug=self.kwargs['slug'])
-        return self.group.posts.annotate(comments_count=Count('comments'), num_likes=Count('liked')).select_related('author')
+        return self.group.posts.select_related('author')
         
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['group'] = self.group
         return context
+
+    def get_surrogate_keys(self):
+        return [f'group:{self.kwargs["slug"]}', 'groups']
         
     # Function view version 
     # def group_posts(request, slug):
@@ -55,10 +96,13 @@ class GroupListView(IndexListView):
 class ProfileListView(IndexListView):
     '''Профиль автора с его постами'''
     template_name = 'posts/profile.html'
+    defer_liked_posts = False
     
     def get_queryset(self):
-        self.author = get_object_or_404(User, username=self.kwargs['username'])
-        return self.author.posts.annotate(comments_count=Count('comments'), num_likes=Count('liked')).select_related('group')
+        self.author = get_object_or_404(
+            User.objects.select_related('stats'), username=self.kwargs['username']
+        )
+        return self.author.posts.select_related('group')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -66,6 +110,9 @@ class ProfileListView(IndexListView):
             and self.request.user.follower.filter(author=self.author).exists())
         context['author'], context['following'] = self.author, following
         return context
+
+    def get_surrogate_keys(self):
+        return [f'author:{self.kwargs["username"]}', 'groups']
     
     # Function view version
     # def profile(request, username):
@@ -84,20 +131,89 @@ class ProfileListView(IndexListView):
     #     return render(request, 'posts/profile.html', context)
 
 
-class PostDetailView(DetailView, FormMixin):
+class PostSearchListView(LikedPostsMixin, ListView):
+    '''Полнотекстовый поиск по заголовкам и текстам постов'''
+    template_name = 'posts/search.html'
+    replica_reads = True
+
+    def get_paginate_by(self, queryset):
+        return settings.POSTS_PER_PAGE
+
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        return search_posts(
+            self.query, Post.objects.select_related('author', 'group')
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.query
+        context['page_query'] = urlencode({'q': self.query}) + '&'
+        return context
+
+
+class PostDetailView(ConditionalGetMixin, AnonymousPageCacheMixin, LikedPostsMixin,
+                     DetailView, FormMixin):
     '''Вывод подробной информации о посте'''
     template_name = 'posts/post_detail.html'
     form_class = CommentForm
+    replica_reads = True
+
     def get_object(self):
-        post = get_object_or_404(Post.objects.annotate(num_likes=Count('liked')), pk=self.kwargs['post_id'])
+        # Число постов автора берется из готовой статистики тем же запросом
+        post = get_object_or_404(
+            Post.objects.select_related('author__stats', 'group'),
+            pk=self.kwargs['post_id']
+        )
         return post
         
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['comments'] = self.get_object().comments.select_related('author').all()
+        # Только первая страница комментариев, остальные - через CommentListView
+        context['comments'] = CursorPaginator(
+            self.object.comments.select_related('author'),
+            settings.COMMENTS_PER_PAGE
+        ).page()
         return context
+
+    def get_surrogate_keys(self):
+        # Ключи нужны до загрузки поста: автор и группа берутся по индексу
+        if not hasattr(self, '_surrogate_keys'):
+            post_id = self.kwargs['post_id']
+            row = Post.objects.filter(pk=post_id).values_list(
+                'author__username', 'group__slug'
+            ).first()
+            self._surrogate_keys = row and post_surrogate_keys(post_id, *row)
+        return self._surrogate_keys
     
 
+class CommentListView(ConditionalGetMixin, AnonymousPageCacheMixin, CursorPaginationMixin,
+                      ListView):
+    '''Фрагмент со следующей страницей комментариев к посту'''
+    template_name = 'posts/includes/comment_list.html'
+    replica_reads = True
+
+    def get_paginate_by(self, queryset):
+        return settings.COMMENTS_PER_PAGE
+
+    def get_queryset(self):
+        return Comment.objects.filter(
+            post_id=self.kwargs['post_id']
+        ).select_related('author')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Несуществующий пост - 404, как на странице поста. Пост
+        # проверяется только при пустой странице: у непустой он есть
+        if (not len(context['page_obj'])
+                and not Post.objects.filter(pk=self.kwargs['post_id']).exists()):
+            raise Http404('Пост не найден')
+        return context
+
+    def get_surrogate_keys(self):
+        return [f'post:{self.kwargs["post_id"]}']
+
+
     # Function view version
     # def post_detail(request, post_id):
     #     '''Вывод подробной информации о посте'''
@@ -122,6 +238,7 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         self.post = form.save(commit=False)
         self.post.author = self.request.user
         self.post.save()
+        schedule_post_thumbnail(self.post)
         return super().form_valid(form)
 
     # Function view version
@@ -137,7 +254,7 @@ class PostCreateView(LoginRequiredMixin, CreateView):
     #     return render(request, 'posts/create_post.html', {'form': form})
 
 
-class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, CachedObjectMixin, UpdateView):
     '''Страница редактирования поста'''
     template_name = 'posts/create_post.html'
     model = Post
@@ -146,7 +263,7 @@ class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     
     def test_func(self):
         obj = self.get_object()
-        return obj.author == self.request.user
+        return obj.author_id == self.request.user.pk
         
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
@@ -154,6 +271,12 @@ class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
             kwargs.update({'instance': self.object})
         return kwargs   
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        if 'image' in form.changed_data:
+            schedule_post_thumbnail(self.object)
+        return response
+
     # Function view version    
     # @login_required
     # def post_edit(request, post_id):
@@ -170,14 +293,14 @@ class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     #     return render(request, 'posts/create_post.html', {'form': form})
 
 
-class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, CachedObjectMixin, DeleteView):
     '''Страница удаления поста'''
     model = Post
     pk_url_kwarg = 'post_id'
     
     def test_func(self):
         obj = self.get_object()
-        return obj.author == self.request.user
+        return obj.author_id == self.request.user.pk
     
     def get_success_url(self):
         return reverse('posts:profile', kwargs={'username': self.request.user.username})
@@ -223,7 +346,7 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
     #     return redirect('posts:post_detail', post_id=post_id)
 
 
-class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, CachedObjectMixin, DeleteView):
     '''Удаление комментария'''
     model = Comment
     form_class = CommentForm
@@ -231,7 +354,7 @@ class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     
     def test_func(self):
         obj = self.get_object()
-        return obj.author == self.request.user
+        return obj.author_id == self.request.user.pk
     
     def get_success_url(self):
         return reverse('posts:post_detail', kwargs={'post_id': self.kwargs['post_id']})
@@ -251,10 +374,20 @@ class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 class FollowIndexListView(LoginRequiredMixin, IndexListView):
     '''Страница с постами авторов, на которых подписан пользователь'''
     template_name ='posts/follow.html'
+    defer_liked_posts = False
     def get_queryset(self):
-        queryset = (Post.objects.annotate(comments_count=Count('comments'), num_likes=Count('liked')).select_related('author', 'group')
+        # Используется только ссылками вида ?page=N
+        queryset = (Post.objects.select_related('author', 'group')
                 .filter(author__following__user=self.request.user))
         return queryset
+
+    def get_surrogate_keys(self):
+        # Любой новый пост сбрасывает 'index', подписки - ключ пользователя
+        return ['index', f'author:{self.request.user.username}', 'groups']
+
+    def get_cursor_paginator(self, queryset, page_size):
+        # Лента читается из заранее разосланных записей подписчика
+        return FollowFeedPaginator(self.request.user, page_size)
     
     # Function view version
     # @login_required
@@ -336,43 +469,82 @@ class GroupCreateView(LoginRequiredMixin, CreateView):
 #         return redirect('posts:group_list', slug=group.slug)
 #     return render(request, 'posts/group_create.html', {'form': form})
 
-class GroupDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class GroupDeleteView(LoginRequiredMixin, UserPassesTestMixin, CachedObjectMixin, DeleteView):
     '''Страница удаления группы'''
     model = Group
     
     def test_func(self):
         obj = self.get_object()
-        return obj.creator != self.request.user
+        return obj.creator_id == self.request.user.pk
     
     def get_success_url(self):
         return reverse('posts:profile', kwargs={'username': self.request.user.username})
 
 @login_required
 def like_unlike_post(request):
-    '''Создание и удаление лайка поста'''
+    '''
+    Создание и удаление лайка поста.
+    Лайк ставится и снимается через post.liked: счетчики, сброс страниц
+    и живые события обновляет сигнал m2m_changed (posts/signals.py).
+    Транзакция сразу берет блокировку записи, поэтому параллельные
+    клики выполняются по очереди и не считают один лайк дважды.
+    Необязательный параметр value ('Like' или 'Unlike') задает желаемое
+    состояние, и тогда повторный запрос ничего не меняет.
+    '''
+    if request.method != 'POST':
+        return redirect('posts:index')
+    try:
+        post_id = int(request.POST.get('post_id'))
+    except (TypeError, ValueError):
+        raise Http404('Пост не найден')
+    wanted = request.POST.get('value')
     user = request.user
-    if request.method == 'POST':
-        post_id = request.POST.get('post_id')
-        post_obj = Post.objects.get(id=post_id)
-        if user in post_obj.liked.all():
-            post_obj.liked.remove(user)
+    with immediate_atomic():
+        post = Post.objects.select_for_update().only('author_id').annotate(
+            is_liked=Exists(Post.liked.through.objects.filter(
+                post_id=OuterRef('pk'), user_id=user.pk
+            ))
+        ).filter(pk=post_id).order_by().first()
+        if post is None:
+            raise Http404('Пост не найден')
+        liked = post.is_liked
+        if wanted in ('Like', 'Unlike'):
+            like = wanted == 'Like'
         else:
-            post_obj.liked.add(user)
-        like, created = Like.objects.get_or_create(user=user, post_id=post_id)
-        if not created:
-            if like.value=='Like':
-                like.value='Unlike'
-            else:
-                like.value='Like'
-        else:
-            like.value='Like'
-
-            post_obj.save()
-            like.save()
-        data = {
-            'value': like.value,
-            'likes': post_obj.liked.all().count()
+            like = not liked
+        if like and not liked:
+            post.liked.add(user)
+        elif liked and not like:
+            post.liked.remove(user)
+        like_count = Post.objects.filter(pk=post_id).values_list(
+            'like_count', flat=True
+        ).get()
+    data = {
+        'value': 'Like' if like else 'Unlike',
+        'likes': like_count
+    }
+    return JsonResponse(data, safe=False)
+
+
+@require_GET
+def live_counts(request):
+    '''
+    Поток Server-Sent Events с изменениями числа лайков и комментариев
+    постов текущей страницы (параметр posts - id через запятую).
+    '''
+    try:
+        post_ids = {
+            int(post_id)
+            for post_id in request.GET.get('posts', '').split(',') if post_id
         }
-        return JsonResponse(data, safe=False)
-    return redirect('posts:index')
-        
\ No newline at end of file
+    except ValueError:
+        return HttpResponseBadRequest('Некорректный список постов')
+    if not post_ids or len(post_ids) > settings.LIVE_MAX_POSTS:
+        return HttpResponseBadRequest('Некорректный список постов')
+    response = StreamingHttpResponse(
+        event_stream(post_ids), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Не буферизовать поток на обратном прокси
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -53,12 +53,16 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
     'debug_toolbar',
     'django_cleanup.apps.CleanupConfig',
 ]
 
 MIDDLEWARE = [
+    'core.server_timing.ServerTimingMiddleware',
+    'core.slow_queries.SlowQueryContextMiddleware',
+    'core.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -101,9 +105,40 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        # Соединение живет между запросами: прагмы из SQLITE_* ставятся
+        # один раз на соединение, а не на каждый запрос
+        'CONN_MAX_AGE': 60,
+        # Тестовая база в файле: общая in-memory база SQLite не умеет
+        # ждать блокировок, и тесты конкурентной записи падают
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
+    },
+    # Реплика для чтения; локально - копия основной базы в отдельном
+    # файле, обновляется командой manage.py sync_replica
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db_replica.sqlite3'),
+        },
+    },
 }
 
+# Чтение лент и страницы поста уходит в реплики (core.db_router),
+# запись - в default. Алиасы реплик через запятую в переменной
+# окружения DATABASE_REPLICAS; пусто - все запросы идут в default
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+DATABASE_REPLICAS = [
+    alias for alias in os.environ.get('DATABASE_REPLICAS', '').split(',')
+    if alias
+]
+# После записи пользователь столько секунд читает из основной базы
+# (cookie REPLICA_PIN_COOKIE), чтобы видеть свои изменения
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = 'primary_pin'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -161,6 +196,119 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # Максимальное количество постов, отбражаемых паджинатором на странице
 POSTS_PER_PAGE = 10
+# Номеров страниц по обе стороны от текущей в постраничной навигации
+PAGINATOR_WINDOW = 3
+
+# Количество комментариев, подгружаемых на страницу поста за один раз
+COMMENTS_PER_PAGE = 20
+
+# Время жизни фрагментов ленты; актуальность обеспечивает поколение ленты,
+# которое меняется при записи постов, комментариев и лайков. Поколение
+# хранится в кэше, поэтому процессам нужен общий кэш (см. CACHES)
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Лента подписок: пост раскладывается подписчикам пачками после коммита;
+# авторов с числом подписчиков от FEED_FANOUT_MAX_FOLLOWERS лента читает
+# при запросе. Новый подписчик получает последние FEED_INBOX_BACKFILL постов
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_FANOUT_MAX_FOLLOWERS = 10000
+FEED_INBOX_BACKFILL = 500
+# Рассылка идет в фоновых потоках, запрос автора ее не ждет
+FEED_FANOUT_ASYNC = True
+FEED_FANOUT_WORKERS = 2
+
+# Время жизни закэшированных целиком страниц для анонимных читателей;
+# актуальность обеспечивает сброс по ключам страниц при записи. Сброс
+# доходит до всех процессов только через общий кэш (см. CACHES)
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+# Живые счетчики лайков и комментариев (Server-Sent Events).
+# LocalBroker работает в пределах процесса; при нескольких процессах
+# подключите posts.live.CacheBroker поверх общего кэша (memcached, redis).
+# Открытый поток держит обработчик сервера до LIVE_STREAM_TIMEOUT секунд:
+# на синхронном WSGI-сервере (gunicorn sync, runserver) каждый клиент
+# занимает рабочий процесс или поток. Такие серверы подходят только
+# для отладки; в бою запускайте gevent/eventlet-воркеры
+# (gunicorn -k gevent) и поднимайте LIVE_MAX_STREAMS под их число.
+# Сверх LIVE_MAX_STREAMS потоков на процесс клиент не занимает
+# обработчик, а опрашивает счетчики: каждое подключение отдает их текущие
+# значения и закрывается, следующее - через LIVE_BUSY_RETRY_MS
+LIVE_BROKER = 'posts.live.LocalBroker'
+LIVE_MAX_POSTS = 100
+LIVE_MAX_STREAMS = 4
+LIVE_HEARTBEAT = 20
+LIVE_STREAM_TIMEOUT = 60 * 5
+LIVE_RETRY_MS = 3000
+LIVE_BUSY_RETRY_MS = 10000
+LIVE_QUEUE_SIZE = 100
+LIVE_POLL_INTERVAL = 1
+LIVE_EVENT_TTL = 60
+
+# Количество групп в меню ленты и время жизни их кэша
+GROUPS_DIRECTORY_SIZE = 20
+GROUPS_DIRECTORY_TIMEOUT = 60 * 60
+
+# Эталонные замеры страниц (manage.py benchmark_views) и допустимый
+# прирост времени и размера страницы относительно них
+BENCHMARK_BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
+BENCHMARK_THRESHOLD = 0.2
+
+# Замеры запросов: доля замеряемых запросов, заголовок Server-Timing
+# и строка JSON в лог core.server_timing (уровень INFO). По умолчанию
+# замеры выключены и не пишут в stderr при разработке и в тестах;
+# включаются переменной окружения, например SERVER_TIMING_SAMPLE_RATE=0.1
+SERVER_TIMING_SAMPLE_RATE = float(
+    os.environ.get('SERVER_TIMING_SAMPLE_RATE', 0)
+)
+SERVER_TIMING_HEADER = True
+SERVER_TIMING_LOG = True
+
+# Без своего обработчика записи INFO отбрасываются корневым логгером
+# (уровень WARNING): строки замеров выводятся в stderr отдельно
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(asctime)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'server_timing': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'core.server_timing': {
+            'handlers': ['server_timing'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Журнал медленных запросов: запросы дольше порога и доля остальных
+# пишутся в файл с ротацией; разбор - manage.py slowqueries.
+# Пустой SLOW_QUERY_LOG_FILE отключает журнал
+SLOW_QUERY_LOG_FILE = os.path.join(BASE_DIR, 'logs', 'slow_queries.log')
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_SAMPLE_RATE = 0.001
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+# Параметры запросов к этим таблицам не пишутся даже у медленных
+# запросов: ключи и данные сессий, хэши паролей и почта пользователей
+SLOW_QUERY_REDACTED_TABLES = ('django_session', 'auth_user')
+
+# Прагмы каждого соединения с SQLite (core.sqlite); None - значение
+# SQLite по умолчанию. WAL: чтение не ждет запись; NORMAL: без fsync
+# на каждой фиксации; busy_timeout (мс): ждать блокировку вместо ошибки
+# "database is locked"; mmap_size и cache_size (КиБ при минусе) - память
+# под страницы базы; temp_store: временные таблицы и сортировки в памяти
+SQLITE_JOURNAL_MODE = 'WAL'
+SQLITE_SYNCHRONOUS = 'NORMAL'
+SQLITE_BUSY_TIMEOUT = 5000
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_CACHE_SIZE = -64 * 1024
+SQLITE_TEMP_STORE = 'MEMORY'
 
 # Функция, орабатывающая ошибку 403
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
@@ -169,7 +317,29 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-# Подключаем бекенд кеширования
+# Миниатюры картинок постов создаются в фоновых потоках после сохранения
+POST_THUMBNAILS_ASYNC = True
+POST_THUMBNAILS_WORKERS = 2
+
+# Обработка загружаемых картинок постов: предельные размеры и формат хранения
+# Предел пикселей JPEG высокий: draft() декодирует его уменьшенным.
+# Остальные форматы (PNG, WebP, GIF) декодируются целиком, и их предел
+# ограничивает память на картинку (16 Мп в RGBA - около 64 МБ);
+# у анимации он действует на кадр, а на все кадры вместе -
+# POST_IMAGE_MAX_ANIMATION_PIXELS
+POST_IMAGE_MAX_SIZE = (1920, 1920)
+POST_IMAGE_MAX_PIXELS = 60_000_000
+POST_IMAGE_MAX_DECODED_PIXELS = 16_000_000
+POST_IMAGE_MAX_ANIMATION_PIXELS = 30_000_000
+POST_IMAGE_FORMAT = 'WEBP'
+POST_IMAGE_QUALITY = 82
+
+# Подключаем бекенд кеширования. LocMemCache виден только своему
+# процессу: сброс страниц и ленты не дошел бы до остальных процессов,
+# поэтому при WEB_WORKERS > 1 нужен общий кэш (проверка core.E001).
+# WEB_WORKERS берется из WEB_CONCURRENCY - ее же читает gunicorn
+# как число рабочих процессов, так что задавайте их через нее, а не -w
+WEB_WORKERS = int(os.environ.get('WEB_CONCURRENCY', 1))
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',